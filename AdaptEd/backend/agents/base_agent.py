@@ -4,7 +4,14 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
+import functools
 import json
+import logging
+import time
+
+from utils.logger import get_logger
+from utils.metrics import AGENT_PROCESS_DURATION, AGENT_PROCESS_ERRORS
+from utils.tracing import get_tracer
 
 
 class AgentMessage(BaseModel):
@@ -16,14 +23,40 @@ class AgentMessage(BaseModel):
     timestamp: Optional[str] = None
 
 
+_tracer = get_tracer("agents")
+
+
+def _timed_process(process):
+    """Оборачивает process() агента: время выполнения, исключения и спан по имени агента"""
+    @functools.wraps(process)
+    def wrapper(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            with _tracer.start_as_current_span(f"agent.{self.name}.process"):
+                return process(self, input_data)
+        except Exception:
+            AGENT_PROCESS_ERRORS.inc(agent=self.name)
+            raise
+        finally:
+            AGENT_PROCESS_DURATION.observe(time.perf_counter() - started, agent=self.name)
+    return wrapper
+
+
 class BaseAgent(ABC):
     """
     Базовый класс для всех ИИ-агентов в системе
     """
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Каждый агент измеряется одинаково, без правок в самих агентах
+        if "process" in cls.__dict__:
+            cls.process = _timed_process(cls.__dict__["process"])
+    
     def __init__(self, name: str):
         self.name = name
         self.message_queue = []
+        self.logger = get_logger(f"agents.{name}")
     
     @abstractmethod
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -50,7 +83,7 @@ class BaseAgent(ABC):
             return self.message_queue.pop(0)
         return None
     
-    def log(self, message: str, level: str = "INFO"):
-        """Логирование действий агента"""
-        print(f"[{self.name}] [{level}] {message}")
+    def log(self, message: str, level: str = "DEBUG"):
+        """Логирование шагов агента; по умолчанию DEBUG — на каждый запрос, в проде отключено уровнем"""
+        self.logger.log(logging.getLevelName(level.upper()) if isinstance(level, str) else level, message)
 
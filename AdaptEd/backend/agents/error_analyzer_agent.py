@@ -2,11 +2,57 @@
 Агент анализа ошибок
 Анализирует ответы ученика и определяет тип ошибки
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from .base_agent import BaseAgent
-from models.cognitive_profile import ErrorTag, ErrorAnalysis
+from models.attempt_log import TEXTS, AttemptLog, ErrorLog, error_code, text_codes
+from models.cognitive_profile import CognitiveProfile, ErrorTag, ErrorAnalysis
+from services.question_features import QuestionFeatures, question_features
+from services.task_bank import get_task_bank
+import numpy as np
 import re
 
+# Правила классификации: (тип ошибки, обоснование). Номер правила — то, что возвращает
+# classify_error / ErrorAnalyzerAgent.classify_batch (-1 — ошибки нет)
+ERROR_RULES = (
+    (ErrorTag.CARELESSNESS, "Незначительная ошибка на единицу. Вероятно, описка в вычислении."),
+    (ErrorTag.LOGIC_GAP, "Существенная ошибка в логике решения."),
+    (ErrorTag.CARELESSNESS, "Ошибка в разряде числа."),
+    (ErrorTag.CALCULATION_ERROR, "Ошибка в арифметических вычислениях."),
+    (ErrorTag.CONCEPT_CONFUSION, "Неправильное понимание концепции задачи."),
+    (ErrorTag.NOT_ATTEMPTED, "Ответ не дан."),
+    # Ответ совпал с дистрактором задания банка
+    (ErrorTag.CARELESSNESS, "Ответ отличается на единицу или на десяток. Вероятно, описка в вычислении."),
+    (ErrorTag.CALCULATION_ERROR, "Ответ получается при ошибке в переносе или заёме разряда."),
+    (ErrorTag.MISSING_FORMULA, "Ответ получается, если нарушить порядок действий."),
+    (ErrorTag.CONCEPT_CONFUSION, "Ответ получается, если выполнить другое действие."),
+    (ErrorTag.LOGIC_GAP, "Типичная ошибка для этого задания."),
+)
+(RULE_OFF_BY_ONE, RULE_LOGIC_GAP, RULE_PLACE_VALUE, RULE_CALCULATION, RULE_CONCEPT, RULE_NOT_ATTEMPTED) = range(6)
+DISTRACTOR_RULES = {
+    ErrorTag.CARELESSNESS.value: 6,
+    ErrorTag.CALCULATION_ERROR.value: 7,
+    ErrorTag.MISSING_FORMULA.value: 8,
+    ErrorTag.CONCEPT_CONFUSION.value: 9,
+    ErrorTag.LOGIC_GAP.value: 10,
+}
+
+def classify_error(user_answer: Optional[int], correct_answer: int, operators: int) -> int:
+    """Номер правила ERROR_RULES для одной попытки (-1 — ответ верный); то же, что classify_batch"""
+    if user_answer is None:
+        return RULE_NOT_ATTEMPTED
+    if user_answer == correct_answer:
+        return -1
+    difference = abs(user_answer - correct_answer)
+    if difference == 1:
+        return RULE_OFF_BY_ONE
+    if difference > user_answer * 0.5:  # Большая разница
+        return RULE_LOGIC_GAP
+    if difference % 10 == 0:  # Ошибка в разряде
+        return RULE_PLACE_VALUE
+    if operators:  # Арифметическая ошибка
+        return RULE_CALCULATION
+    return RULE_CONCEPT
+
 
 class ErrorAnalyzerAgent(BaseAgent):
     """
@@ -15,6 +61,7 @@ class ErrorAnalyzerAgent(BaseAgent):
     
     def __init__(self):
         super().__init__("ErrorAnalyzer")
+        self._rule_columns: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
         # Шаблоны для определения типа ошибки
         self.error_patterns = {
             ErrorTag.MISSING_FORMULA: [
@@ -51,6 +98,7 @@ class ErrorAnalyzerAgent(BaseAgent):
         Input:
         - task_id: ID задания
         - question: текст вопроса
+        - features: признаки задания (QuestionFeatures); по умолчанию — из банка заданий по task_id
         - user_answer: ответ ученика
         - correct_answer: правильный ответ
         - task_category: категория задания
@@ -65,17 +113,19 @@ class ErrorAnalyzerAgent(BaseAgent):
         user_answer = input_data.get('user_answer')
         correct_answer = input_data.get('correct_answer')
         question = input_data.get('question', '')
+        features = input_data.get('features') or get_task_bank().features_for(input_data.get('task_id'), question)
         
         # Если ответ правильный - нет ошибки
-        if user_answer == correct_answer:
+        if user_answer is not None and user_answer == correct_answer:
             return {
                 "has_error": False,
                 "error_type": None,
                 "justification": "Правильный ответ"
             }
         
-        # Анализ ошибки
-        error_analysis = self._analyze_error_type(user_answer, correct_answer, question)
+        # Анализ ошибки: ответ, заранее известный для задания банка, или эвристика по разнице
+        error_analysis = self._match_distractor(input_data.get('task_id'), user_answer) \
+            or self._analyze_error_type(user_answer, correct_answer, features)
         
         # Генерация рекомендации
         suggestion = self._generate_suggestion(error_analysis['error_type'])
@@ -89,38 +139,109 @@ class ErrorAnalyzerAgent(BaseAgent):
         self.log(f"Error analysis complete: {result['error_type']}")
         return result
     
-    def _analyze_error_type(self, user_answer: int, correct_answer: int, question: str) -> Dict[str, Any]:
+    def _match_distractor(self, task_id: Optional[int], user_answer: int) -> Optional[Dict[str, Any]]:
+        """Тип ошибки по дистракторам задания банка (services/arithmetic_generator.py)"""
+        task = get_task_bank().get(task_id) if task_id is not None else None
+        error_type = task.distractors.get(user_answer) if task else None
+        if error_type is None:
+            return None
+        return self._rule_analysis(DISTRACTOR_RULES[error_type])
+    
+    def _analyze_error_type(self, user_answer: Optional[int], correct_answer: int, features: QuestionFeatures) -> Dict[str, Any]:
         """Определяет тип ошибки на основе разницы между ответами"""
-        
-        difference = abs(user_answer - correct_answer)
-        
-        # Анализ по разнице
-        if difference == 1:
-            error_type = ErrorTag.CARELESSNESS
-            justification = "Незначительная ошибка на единицу. Вероятно, описка в вычислении."
-        elif difference > user_answer * 0.5:  # Большая разница
-            error_type = ErrorTag.LOGIC_GAP
-            justification = "Существенная ошибка в логике решения."
-        elif difference % 10 == 0:  # Ошибка в разряде
-            error_type = ErrorTag.CARELESSNESS
-            justification = "Ошибка в разряде числа."
-        else:
-            # Проверка на арифметическую ошибку
-            if "+" in question or "-" in question or "*" in question or "/" in question:
-                error_type = ErrorTag.CALCULATION_ERROR
-                justification = "Ошибка в арифметических вычислениях."
-            elif "/" in question:
-                error_type = ErrorTag.MISSING_FORMULA
-                justification = "Не использована правильная формула или метод решения."
-            else:
-                error_type = ErrorTag.CONCEPT_CONFUSION
-                justification = "Неправильное понимание концепции задачи."
-        
+        return self._rule_analysis(classify_error(user_answer, correct_answer, features.operators))
+    
+    @staticmethod
+    def _rule_analysis(rule: int) -> Dict[str, Any]:
+        error_type, justification = ERROR_RULES[rule]
         return {
             "error_type": error_type.value,
             "justification": justification
         }
     
+    def classify_batch(self, user_answers: np.ndarray, correct_answers: np.ndarray, operators: np.ndarray,
+                       answered: Optional[np.ndarray] = None, task_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Векторная классификация многих попыток — то же, что process(), без создания словарей.
+        
+        user_answers, correct_answers — int64; operators — флаги операций вопросов (QuestionFeatures.operators);
+        answered — False там, где ответа нет (по умолчанию ответ есть везде);
+        task_ids — id заданий: для заданий банка с дистракторами тип берётся по дистрактору.
+        Возвращает номер правила ERROR_RULES для каждой попытки (int8), -1 — ответ верный.
+        """
+        user = np.asarray(user_answers, dtype=np.int64)
+        correct = np.asarray(correct_answers, dtype=np.int64)
+        answered = np.ones(len(user), dtype=bool) if answered is None else np.asarray(answered, dtype=bool)
+        difference = np.abs(user - correct)
+        rules = np.select(
+            [~answered, user == correct, difference == 1, difference > user * 0.5, difference % 10 == 0, np.asarray(operators) != 0],
+            [RULE_NOT_ATTEMPTED, -1, RULE_OFF_BY_ONE, RULE_LOGIC_GAP, RULE_PLACE_VALUE, RULE_CALCULATION],
+            RULE_CONCEPT,
+        ).astype(np.int8)
+        
+        if task_ids is not None:
+            bank = get_task_bank()
+            with_distractors = np.fromiter(bank.distractor_task_ids(), dtype=np.int64)
+            candidates = np.flatnonzero((rules >= 0) & answered & np.isin(task_ids, with_distractors))
+            for idx, task_id, answer in zip(candidates, np.asarray(task_ids)[candidates].tolist(), user[candidates].tolist()):
+                error_type = bank.get(task_id).distractors.get(answer)
+                if error_type is not None:
+                    rules[idx] = DISTRACTOR_RULES[error_type]
+        return rules
+    
+    def classify_logs(self, logs: List[AttemptLog]) -> np.ndarray:
+        """
+        classify_batch по истории попыток: колонки logs склеиваются, результат идёт подряд в порядке
+        logs. Верные попытки — -1; ответы, не поместившиеся в int64, классифицируются по одному.
+        """
+        if not logs:
+            return np.empty(0, dtype=np.int8)
+        
+        def stacked(name: str) -> np.ndarray:
+            return np.concatenate([log.column(name) for log in logs])
+        
+        user, correct = stacked("user_answer"), stacked("correct_answer")
+        questions, question_text = text_codes(logs, "question")
+        unique_questions, inverse = np.unique(questions, return_inverse=True)
+        operators = np.array(
+            [question_features(question_text(question) or "").operators for question in unique_questions.tolist()],
+            dtype=np.int8,
+        )[inverse.reshape(-1)]
+        
+        null = np.iinfo(np.int64).min
+        rules = self.classify_batch(user, correct, operators, answered=user != null, task_ids=stacked("task_id"))
+        rules[stacked("is_correct") != 0] = -1
+        # В колонке вместо большого числа — метка null + 1, само число хранится отдельно
+        bounds = np.cumsum([0] + [len(log) for log in logs])
+        for row in np.flatnonzero(((user == null + 1) | (correct == null + 1)) & (rules >= 0)).tolist():
+            owner = int(np.searchsorted(bounds, row, side="right")) - 1
+            log, offset = logs[owner], row - int(bounds[owner])
+            rules[row] = classify_error(log._get("user_answer", offset), log._get("correct_answer", offset), int(operators[row]))
+        return rules
+    
+    def rule_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Коды типов ошибок, номера обоснований и рекомендаций (TEXTS) по номеру правила;
+        последняя строка — для -1 (ответ верный), так что массив индексируется прямо результатом classify_*
+        """
+        if self._rule_columns is None:
+            self._rule_columns = (
+                np.array([error_code(tag) for tag, _ in ERROR_RULES] + [0], dtype=np.int8),
+                np.array([TEXTS.intern(text, pin=True) for _, text in ERROR_RULES] + [-1], dtype=np.int32),
+                np.array(
+                    [TEXTS.intern(self._generate_suggestion(tag.value), pin=True) for tag, _ in ERROR_RULES] + [-1],
+                    dtype=np.int32,
+                ),
+            )
+        return self._rule_columns
+    
+    def apply_rules(self, profile: CognitiveProfile, rules: np.ndarray):
+        """Записывает переразметку (номера правил по попыткам) в историю попыток и ошибок профиля"""
+        codes, justifications, remediations = self.rule_columns()
+        profile.task_history.set_errors(codes[rules], justifications[rules], remediations[rules])
+        profile.error_history = ErrorLog.from_attempts(profile.task_history)
+        profile.error_frequency = {ErrorTag(tag): count for tag, count in profile.task_history.error_counts().items()}
+    
     def _generate_suggestion(self, error_type: str) -> str:
         """Генерирует рекомендацию по исправлению ошибки"""
         suggestions = {
@@ -5,6 +5,7 @@
 from typing import Dict, Any, Optional
 from .base_agent import BaseAgent
 from models.cognitive_profile import CognitiveProfile, EmotionalState
+from services.question_features import QuestionFeatures
 
 
 class MentorAgent(BaseAgent):
@@ -24,6 +25,7 @@ class MentorAgent(BaseAgent):
         - user_id: ID ученика
         - profile: профиль ученика
         - task_result: результат выполнения задания (correct/wrong/timeout)
+        - task_features: признаки задания (QuestionFeatures) — для подсказки по шагам
         - context: дополнительный контекст
         
         Output:
@@ -47,7 +49,7 @@ class MentorAgent(BaseAgent):
         tone = self._determine_tone(task_result, emotional_state)
         
         # Генерируем предложения
-        suggestions = self._generate_suggestions(profile, task_result)
+        suggestions = self._generate_suggestions(profile, task_result, input_data.get('task_features'))
         
         return {
             "message": message,
@@ -115,7 +117,8 @@ class MentorAgent(BaseAgent):
         else:
             return "neutral"
     
-    def _generate_suggestions(self, profile: Optional[CognitiveProfile], task_result: str) -> list:
+    def _generate_suggestions(self, profile: Optional[CognitiveProfile], task_result: str,
+                              features: Optional[QuestionFeatures] = None) -> list:
         """Генерирует предложения помощи"""
         suggestions = []
         
@@ -123,7 +126,7 @@ class MentorAgent(BaseAgent):
             suggestions.append({
                 "type": "hint",
                 "title": "Получить подсказку",
-                "description": "Разобрать задачу по шагам"
+                "description": self._hint_description(features)
             })
             suggestions.append({
                 "type": "video",
@@ -158,6 +161,17 @@ class MentorAgent(BaseAgent):
         
         return suggestions
     
+    @staticmethod
+    def _hint_description(features: Optional[QuestionFeatures]) -> str:
+        """С чего начать разбор задания — по его признакам"""
+        if features is None or features.depth <= 1:
+            return "Разобрать задачу по шагам"
+        if features.parentheses:
+            return f"Разобрать задачу по шагам: сначала скобки, всего действий — {features.operand_count - 1}"
+        if features.mixed_precedence:
+            return f"Разобрать задачу по шагам: сначала умножение и деление, всего действий — {features.operand_count - 1}"
+        return f"Разобрать задачу по шагам: всего действий — {features.operand_count - 1}"
+    
     def _calculate_encouragement_level(self, profile: Optional[CognitiveProfile], task_result: str) -> int:
         """Вычисляет уровень поддержки (1-5)"""
         level = 3  # Нейтральный уровень
@@ -2,13 +2,24 @@
 Оркестратор агентов
 Координирует взаимодействие между агентами
 """
-from typing import Dict, Any, Optional
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 from .error_analyzer_agent import ErrorAnalyzerAgent
 from .profiler_agent import ProfilerAgent
 from .task_generator_agent import TaskGeneratorAgent
 from .mentor_agent import MentorAgent
 from .teacher_analytics_agent import TeacherAnalyticsAgent
-from models.cognitive_profile import TaskAttempt, ErrorTag
+from models.attempt_log import error_code
+from models.cognitive_profile import TaskAttempt, ErrorAnalysis, ErrorTag
+from services.class_analytics import get_class_analytics, split_cell_key
+from services.review_scheduler import get_review_scheduler
+from services.task_bank import get_task_bank
+from services.timeseries import get_time_series
+from utils.logger import get_logger
+from utils.tracing import traced
+
+logger = get_logger("agents.orchestrator")
 
 
 class AgentOrchestrator:
@@ -22,28 +33,33 @@ class AgentOrchestrator:
         self.task_generator = TaskGeneratorAgent()
         self.mentor = MentorAgent()
         self.teacher_analytics = TeacherAnalyticsAgent()
+        # Интервальное повторение заданий (services/review_scheduler.py)
+        self.reviews = get_review_scheduler()
+        # Материализованная аналитика классов для отчётов учителя (services/class_analytics.py)
+        self.class_analytics = get_class_analytics()
+        # Ряды успеваемости по часам, дням и неделям (services/timeseries.py)
+        self.time_series = get_time_series()
     
-    def process_task_submission(self, user_id: str, task_id: int, question: str, 
-                                user_answer: int, correct_answer: int) -> Dict[str, Any]:
-        """
-        Обрабатывает отправку задания учеником
-        
-        Returns:
-        - is_correct: правильность ответа
-        - error_analysis: анализ ошибки
-        - mentor_message: сообщение от наставника
-        - updated_profile: обновленный профиль
-        """
+    def _analyze_attempt(self, task_id: int, question: str, user_answer: int, correct_answer: int,
+                         topic: Optional[str] = None, **attempt_fields) -> Tuple[TaskAttempt, Optional[Dict[str, Any]]]:
+        """Попытка выполнения и анализ ошибки (None для верного ответа)"""
         # Проверяем ответ
         is_correct = user_answer == correct_answer
         
-        # Создаем попытку выполнения
+        # Время офлайн-попытки с часовым поясом (…Z) — в локальное без пояса, как все времена профиля и расписания
+        timestamp = attempt_fields.get('timestamp')
+        if timestamp is not None and timestamp.tzinfo is not None:
+            attempt_fields['timestamp'] = timestamp.astimezone().replace(tzinfo=None)
+        
+        # Создаем попытку выполнения (timestamp, time_spent_seconds — если переданы)
         task_attempt = TaskAttempt(
             task_id=task_id,
             question=question,
+            topic=topic,
             user_answer=user_answer,
             correct_answer=correct_answer,
-            is_correct=is_correct
+            is_correct=is_correct,
+            **{name: value for name, value in attempt_fields.items() if value is not None}
         )
         
         # Анализируем ошибку
@@ -53,37 +69,147 @@ class AgentOrchestrator:
                 'task_id': task_id,
                 'question': question,
                 'user_answer': user_answer,
-                'correct_answer': correct_answer
+                'correct_answer': correct_answer,
+                'features': get_task_bank().features_for(task_id, question)
             })
+            # Тип ошибки остаётся в истории попыток — по нему пересобирается расписание повторений
+            task_attempt.error_analysis = ErrorAnalysis(
+                error_type=error_analysis['error_type'],
+                justification=error_analysis.get('justification', ''),
+                suggested_remediation=error_analysis.get('suggested_remediation')
+            )
+        return task_attempt, error_analysis
+    
+    @traced("orchestrator.process_task_submission", "agents")
+    def process_task_submission(self, user_id: str, task_id: int, question: str, 
+                                user_answer: int, correct_answer: int,
+                                topic: Optional[str] = None, timestamp: Optional[datetime] = None,
+                                time_spent_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Обрабатывает отправку задания учеником
         
-        # Получаем профиль (создается автоматически если не существует)
-        profile = self.profiler.get_profile(user_id)
+        Returns:
+        - is_correct: правильность ответа
+        - error_analysis: анализ ошибки
+        - mentor_message: сообщение от наставника
+        - profile_changes: изменившиеся поля профиля (а не весь профиль)
+        - insights: выводы о прогрессе, если они изменились
+        """
+        task_attempt, error_analysis = self._analyze_attempt(
+            task_id, question, user_answer, correct_answer, topic,
+            timestamp=timestamp, time_spent_seconds=time_spent_seconds
+        )
+        is_correct = task_attempt.is_correct
         
-        # Обновляем профиль
+        # Обновляем профиль (создается автоматически если не существует); профиль читается из хранилища один раз
         profile_result = self.profiler.process({
             'user_id': user_id,
             'task_attempt': task_attempt,
             'error_analysis': error_analysis
         })
+        profile = profile_result['profile']
         
-        # Получаем обновленный профиль
-        profile = self.profiler.get_profile(user_id)
+        # Планируем повторение задания
+        review = self.reviews.record(
+            user_id, task_id, is_correct, topic=topic, question=question,
+            error_type=error_analysis.get('error_type') if error_analysis else None,
+            when=task_attempt.timestamp
+        )
+        
+        # Обновляем аналитику класса и ряды успеваемости
+        self.class_analytics.record(profile, [task_attempt])
+        self.time_series.record(user_id, [task_attempt])
         
         # Получаем сообщение от наставника
         mentor_message = self.mentor.process({
             'user_id': user_id,
             'profile': profile,
-            'task_result': 'correct' if is_correct else 'wrong'
+            'task_result': 'correct' if is_correct else 'wrong',
+            'task_features': get_task_bank().features_for(task_id, question)
         })
         
         return {
             'is_correct': is_correct,
             'error_analysis': error_analysis,
             'mentor_message': mentor_message,
-            'updated_profile': profile_result,
+            'profile_changes': profile_result['changes'],
+            'insights': profile_result['insights'],
+            'next_review': review.due,
             'correct_answer': correct_answer
         }
     
+    @traced("orchestrator.process_task_batch", "agents")
+    def process_task_batch(self, submissions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Пакетная обработка попыток одного или нескольких учеников (офлайн-синхронизация, импорт
+        результатов контрольной). Попытки каждого ученика обрабатываются по порядку на одном
+        загруженном профиле и расписании повторений, которые сохраняются один раз в конце.
+        
+        submissions — словари с полями TaskSubmission (user_id, task_id, question, user_answer,
+        correct_answer, topic, timestamp, time_spent_seconds).
+        Returns:
+        - results: по попытке в исходном порядке — is_correct, error_analysis, profile_changes,
+          next_review (или error, если попытку обработать не удалось)
+        """
+        by_user: Dict[str, List[int]] = {}
+        for idx, submission in enumerate(submissions):
+            by_user.setdefault(submission['user_id'], []).append(idx)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(submissions)
+        failed = 0
+        for user_id, indexes in by_user.items():
+            profile = self.profiler.get_profile(user_id)
+            processed: List[int] = []
+            reviewed = []
+            attempts: List[TaskAttempt] = []
+            for idx in indexes:
+                submission = submissions[idx]
+                try:
+                    task_attempt, error_analysis = self._analyze_attempt(
+                        submission['task_id'], submission['question'], submission['user_answer'],
+                        submission['correct_answer'], submission.get('topic'),
+                        timestamp=submission.get('timestamp'), time_spent_seconds=submission.get('time_spent_seconds')
+                    )
+                    profile_result = self.profiler.process({
+                        'user_id': user_id,
+                        'task_attempt': task_attempt,
+                        'error_analysis': error_analysis,
+                        'profile': profile,
+                        'save': False
+                    })
+                except Exception as e:
+                    logger.warning("batch attempt %d for user %s failed: %s", idx, user_id, e)
+                    results[idx] = {'user_id': user_id, 'task_id': submission.get('task_id'), 'error': str(e)}
+                    failed += 1
+                    continue
+                reviewed.append((task_attempt, error_analysis['error_type'] if error_analysis else None))
+                attempts.append(task_attempt)
+                processed.append(idx)
+                results[idx] = {
+                    'user_id': user_id,
+                    'task_id': task_attempt.task_id,
+                    'is_correct': task_attempt.is_correct,
+                    'error_analysis': error_analysis,
+                    'profile_changes': profile_result['changes'],
+                    'correct_answer': task_attempt.correct_answer
+                }
+            if not processed:
+                continue
+            # Одна запись профиля и одна запись расписания на ученика
+            for idx, due in zip(processed, self.reviews.record_many(user_id, reviewed)):
+                results[idx]['next_review'] = due
+            self.profiler.save_profile(profile)
+            self.class_analytics.record(profile, attempts)
+            self.time_series.record(user_id, attempts)
+        
+        return {
+            'processed': len(submissions) - failed,
+            'failed': failed,
+            'students': len(by_user),
+            'results': results
+        }
+    
+    @traced("orchestrator.generate_personalized_tasks", "agents")
     def generate_personalized_tasks(self, user_id: str, topic: str = "general", count: int = 3) -> Dict[str, Any]:
         """Генерирует персонализированные задания для ученика"""
         # Получаем профиль (создается автоматически если не существует)
@@ -98,6 +224,7 @@ class AgentOrchestrator:
         
         return tasks
     
+    @traced("orchestrator.get_student_dashboard", "agents")
     def get_student_dashboard(self, user_id: str) -> Dict[str, Any]:
         """Получает данные для дашборда ученика"""
         profile = self.profiler.get_profile(user_id)
@@ -121,13 +248,15 @@ class AgentOrchestrator:
                 'level': profile.level,
                 'points': profile.points,
                 'achievements': profile.achievements,
-                'current_emotional_state': profile.current_emotional_state.value if profile.current_emotional_state else None
+                'current_emotional_state': getattr(profile.current_emotional_state, 'value', profile.current_emotional_state)
             },
-            'recent_tasks': profile.task_history[-10:] if len(profile.task_history) > 10 else profile.task_history,
+            'recent_tasks': profile.task_history[-10:],
+            'topic_mastery': self.profiler.mastery.snapshot(profile),
             'error_patterns': dict(sorted(profile.error_frequency.items(), key=lambda x: x[1], reverse=True)[:5]),
             'mentor_message': mentor_message
         }
     
+    @traced("orchestrator.get_teacher_report", "agents")
     def get_teacher_report(self, class_id: str = None, report_type: str = 'summary') -> Dict[str, Any]:
         """Получает отчет для учителя"""
         # Здесь можно добавить логику для получения профилей класса
@@ -136,17 +265,157 @@ class AgentOrchestrator:
             'report_type': report_type
         })
     
+    @traced("orchestrator.recompute_profiles", "agents")
+    def recompute_profiles(self, user_ids: Optional[list] = None) -> Dict[str, Any]:
+        """
+        Пакетно пересчитывает статистику профилей по истории попыток; виды аналитики классов
+        (точность учеников) пересобираются — версии и ETag классов меняются
+        """
+        result = self.profiler.recompute_all(user_ids)
+        result["class_analytics"] = self.rebuild_class_analytics()
+        return result
+    
+    @traced("orchestrator.refit_mastery", "agents")
+    def refit_mastery(self, min_attempts: int = 200) -> Dict[str, Any]:
+        """
+        Пакетно подбирает параметры модели освоения тем и пересчитывает оценки; виды аналитики
+        классов (освоение тем учениками) пересобираются, как после retag_errors
+        """
+        result = self.profiler.refit_mastery(min_attempts)
+        result["class_analytics"] = self.rebuild_class_analytics()
+        return result
+    
+    @traced("orchestrator.get_review_queue", "agents")
+    def get_review_queue(self, user_id: str, limit: int = 20) -> Dict[str, Any]:
+        """Задания, которые ученику пора повторить"""
+        return self.reviews.queue(user_id, limit)
+    
+    @traced("orchestrator.recompute_reviews", "agents")
+    def recompute_reviews(self, user_ids: Optional[list] = None) -> Dict[str, Any]:
+        """Пакетно пересобирает расписания повторений по истории попыток"""
+        ids = list(self.profiler.profiles) if user_ids is None else list(user_ids)
+        profiles = [profile for profile in (self.profiler.profiles.get(user_id) for user_id in ids) if profile is not None]
+        return self.reviews.recompute(profiles)
+    
+    @traced("orchestrator.get_class_aggregates", "agents")
+    def get_class_aggregates(self, class_id: Optional[str] = None, weeks: int = 12) -> Dict[str, Any]:
+        """Недельные агрегаты класса (попытки, верные, время) по темам и типам ошибок"""
+        meta = self.class_analytics.get_meta(class_id)
+        return {
+            'class_id': class_id,
+            'version': meta.version,
+            'updated_at': meta.updated_at,
+            'rebuilt_at': meta.rebuilt_at,
+            'weeks': [
+                {
+                    'week': week.week,
+                    'cells': [
+                        {'topic': topic or None, 'error_type': error_type or None, **cell.dict()}
+                        for (topic, error_type), cell in sorted((split_cell_key(key), cell) for key, cell in week.cells.items())
+                    ]
+                }
+                for week in self.class_analytics.class_weeks(class_id, last=weeks)
+            ]
+        }
+    
+    @traced("orchestrator.rebuild_class_analytics", "agents")
+    def rebuild_class_analytics(self) -> Dict[str, Any]:
+        """Пересобирает аналитику классов по профилям всех учеников"""
+        profiles = [profile for profile in (self.profiler.profiles.get(user_id) for user_id in list(self.profiler.profiles)) if profile is not None]
+        return self.class_analytics.rebuild(profiles)
+    
+    @traced("orchestrator.get_time_series", "agents")
+    def get_time_series(self, scope: str, key: Optional[str] = None, **query) -> Dict[str, Any]:
+        """Ряд успеваемости ученика, класса или школы (аргументы — TimeSeries.query)"""
+        return self.time_series.query(scope, key or '', **query)
+    
+    @traced("orchestrator.rebuild_time_series", "agents")
+    def rebuild_time_series(self) -> Dict[str, Any]:
+        """Пересобирает ряды успеваемости по профилям всех учеников"""
+        profiles = [profile for profile in (self.profiler.profiles.get(user_id) for user_id in list(self.profiler.profiles)) if profile is not None]
+        return self.time_series.rebuild(profiles)
+    
+    @traced("orchestrator.retag_errors", "agents")
+    def retag_errors(self, user_ids: Optional[list] = None, dry_run: bool = False, chunk: int = 1000) -> Dict[str, Any]:
+        """
+        Переразмечает ошибки всех попыток текущими правилами анализатора (ErrorAnalyzerAgent.classify_logs)
+        и пересобирает error_history и error_frequency. Профили обрабатываются пачками по chunk.
+        dry_run — только подсчёт.
+        
+        Профиль, история которого изменилась за время прогона (ученик отправил задание), не перезаписывается —
+        он попадает в skipped, повторный запуск доразметит его. После записи пересобираются зависящие от
+        типов ошибок расписания повторений (переразмеченных учеников) и аналитика классов.
+        """
+        ids = list(self.profiler.profiles) if user_ids is None else list(user_ids)
+        codes = self.error_analyzer.rule_columns()[0]
+        totals = np.zeros(len(ErrorTag) + 1, dtype=np.int64)
+        result = {"profiles": 0, "attempts": 0, "errors": 0, "changed": 0, "skipped": 0, "dry_run": dry_run}
+        reviews = {"students": 0, "items": 0}
+        
+        for start in range(0, len(ids), max(1, chunk)):
+            profiles = [p for p in (self.profiler.profiles.get(user_id) for user_id in ids[start:start + chunk]) if p is not None]
+            if not profiles:
+                continue
+            lengths = [len(profile.task_history) for profile in profiles]
+            rules = self.error_analyzer.classify_logs([profile.task_history for profile in profiles])
+            new_codes = codes[rules]
+            old_codes = np.concatenate([profile.task_history.column("error_type") for profile in profiles])
+            result["changed"] += int(np.count_nonzero(new_codes != old_codes))
+            totals += np.bincount(new_codes, minlength=len(totals))
+            result["attempts"] += len(rules)
+            result["profiles"] += len(profiles)
+            if dry_run:
+                continue
+            
+            bounds = np.cumsum([0] + lengths)
+            retagged = []
+            for i, profile in enumerate(profiles):
+                stored = self.profiler.profiles.get(profile.user_id)
+                if stored is None or len(stored.task_history) != lengths[i]:
+                    result["skipped"] += 1
+                    continue
+                self.error_analyzer.apply_rules(profile, rules[bounds[i]:bounds[i + 1]])
+                self.profiler.save_profile(profile)
+                retagged.append(profile)
+            for key, value in self.reviews.recompute(retagged).items():
+                reviews[key] += value
+        
+        result["errors"] = int(totals[1:].sum())
+        result["by_type"] = {
+            tag.value: int(totals[error_code(tag)]) for tag in ErrorTag if totals[error_code(tag)]
+        }
+        if not dry_run:
+            result["reviews"] = reviews
+            result["class_analytics"] = self.rebuild_class_analytics()
+        logger.info("errors retagged: %d profiles, %d attempts, %d changed, %d skipped%s",
+                    result["profiles"], result["attempts"], result["changed"], result["skipped"],
+                    " (dry run)" if dry_run else "")
+        return result
+    
+    @traced("orchestrator.assign_task_to_student", "agents")
     def assign_task_to_student(self, user_id: str, topic: str, task_ids: list):
         """Назначает задания ученику"""
         profile = self.profiler.get_profile(user_id)
         
         if not profile:
-            profile = self.profiler.profiles[user_id] = self.profiler.process({'user_id': user_id})['profile']
+            profile = self.profiler.process({'user_id': user_id})['profile']
         
         if topic not in profile.assigned_tasks:
             profile.assigned_tasks[topic] = []
         
         profile.assigned_tasks[topic].extend(task_ids)
+        self.profiler.save_profile(profile)
         
         return {'status': 'tasks_assigned', 'assigned_tasks': profile.assigned_tasks}
 
+
+# Общий экземпляр для всех роутов; создаётся при первом обращении
+_orchestrator: Optional[AgentOrchestrator] = None
+
+
+def get_orchestrator() -> AgentOrchestrator:
+    """Получить или создать экземпляр AgentOrchestrator"""
+    global _orchestrator
+    if _orchestrator is None:
+        _orchestrator = AgentOrchestrator()
+    return _orchestrator
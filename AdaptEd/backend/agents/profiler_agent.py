@@ -2,8 +2,14 @@
 Агент профилирования ученика
 Отслеживает и обновляет когнитивный профиль ученика
 """
+from datetime import datetime
 from typing import Dict, Any, List, Optional
+
+import numpy as np
+
 from .base_agent import BaseAgent
+from utils.state_store import StateMap
+from utils.tracing import traced
 from models.cognitive_profile import (
     CognitiveProfile, 
     TaskAttempt, 
@@ -11,8 +17,11 @@ from models.cognitive_profile import (
     ErrorTag,
     LearningStyle,
     ContentPreference,
-    EmotionalState
+    EmotionalState,
+    POINTS_PER_CORRECT
 )
+from models.attempt_log import batch_statistics
+from services.mastery import DEFAULT_TOPIC, get_mastery_engine
 
 
 class ProfilerAgent(BaseAgent):
@@ -22,20 +31,32 @@ class ProfilerAgent(BaseAgent):
     
     def __init__(self):
         super().__init__("Profiler")
-        self.profiles: Dict[str, CognitiveProfile] = {}
+        # Общие для всех экземпляров и воркеров (см. utils/state_store.py)
+        self.profiles: Dict[str, CognitiveProfile] = StateMap("cognitive_profiles", CognitiveProfile)
+        self.mastery = get_mastery_engine()
+    
+    # Скалярные поля профиля, изменения которых попадают в changes
+    TRACKED_FIELDS = (
+        "total_tasks_completed", "correct_tasks_count", "accuracy_rate", "learning_style",
+        "current_emotional_state", "points", "level",
+    )
     
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Обновляет профиль ученика
+        Обновляет профиль ученика по одной попытке. Производные поля пересчитываются только
+        при изменении своих входных данных, статистика — инкрементально за O(1).
         
         Input:
         - user_id: ID ученика
         - task_attempt: TaskAttempt объект
         - error_analysis: анализ ошибки от ErrorAnalyzerAgent
+        - profile: уже загруженный профиль (необязательно; иначе читается из хранилища)
+        - save: сохранить профиль в хранилище (по умолчанию True; пакетная обработка сохраняет сама)
         
         Output:
-        - updated_profile: обновленный профиль
-        - insights: выводы о прогрессе
+        - profile: обновленный CognitiveProfile
+        - changes: изменившиеся поля профиля {поле: новое значение}
+        - insights: выводы о прогрессе или None, если они не изменились
         """
         user_id = input_data.get('user_id')
         task_attempt = input_data.get('task_attempt')
@@ -44,52 +65,103 @@ class ProfilerAgent(BaseAgent):
         self.log(f"Updating profile for user {user_id}")
         
         # Получаем или создаем профиль
-        if user_id not in self.profiles:
-            self.profiles[user_id] = CognitiveProfile(user_id=user_id)
+        profile = input_data.get('profile') or self.get_profile(user_id)
+        before = self._tracked(profile)
+        insight_inputs = self._insight_inputs(profile)
+        achievements = len(profile.achievements)
+        changes: Dict[str, Any] = {}
         
-        profile = self.profiles[user_id]
-        
-        # Добавляем попытку выполнения
         if task_attempt:
+            # Добавляем попытку выполнения
             profile.task_history.append(task_attempt)
-        
-        # Обновляем статистику
-        self._update_statistics(profile)
+            # Оценка освоения темы (BKT) — O(1) на попытку
+            mastery = self.mastery.update(profile, task_attempt.topic, task_attempt.is_correct)
+            changes["topic_mastery"] = {task_attempt.topic or DEFAULT_TOPIC: round(mastery.mastery, 4)}
+            # Статистика, стиль обучения и эмоциональное состояние зависят только от истории попыток
+            self._apply_attempt_statistics(profile, task_attempt)
+            self._detect_learning_style(profile)
+            self._update_emotional_state(profile)
         
         # Обновляем историю ошибок
-        if error_analysis:
+        if error_analysis and error_analysis.get('error_type'):
             self._update_error_patterns(profile, error_analysis)
+            error_type = error_analysis['error_type']
+            changes["error_frequency"] = {getattr(error_type, 'value', error_type): profile.error_frequency[error_type]}
         
-        # Определяем стиль обучения
-        self._detect_learning_style(profile)
-        
-        # Обновляем эмоциональное состояние
-        self._update_emotional_state(profile)
+        # Очки, уровень и достижения меняются только после новой попытки
+        if task_attempt:
+            self._update_motivation(profile)
         
-        # Управляем мотивацией
-        self._update_motivation(profile)
+        after = self._tracked(profile)
+        changes.update({field: value for field, value in after.items() if before[field] != value})
+        if len(profile.achievements) > achievements:
+            changes["new_achievements"] = profile.achievements[achievements:]
         
-        # Генерируем инсайты
-        insights = self._generate_insights(profile)
+        # Инсайты пересчитываются, только если изменились их входные данные
+        insights = self._generate_insights(profile) if self._insight_inputs(profile) != insight_inputs else None
         
-        self.profiles[user_id] = profile
+        if changes:
+            profile.last_updated = datetime.now()
+        if input_data.get('save', True):
+            self.profiles[user_id] = profile
         
         return {
-            "profile": profile.dict(),
+            "profile": profile,
+            "changes": changes,
             "insights": insights
         }
     
+    def _tracked(self, profile: CognitiveProfile) -> Dict[str, Any]:
+        return {
+            field: getattr(getattr(profile, field), 'value', getattr(profile, field))
+            for field in self.TRACKED_FIELDS
+        }
+    
+    @staticmethod
+    def _insight_inputs(profile: CognitiveProfile) -> tuple:
+        """Всё, от чего зависит _generate_insights"""
+        most_common_error = max(profile.error_frequency.items(), key=lambda x: x[1])[0] if profile.error_frequency else None
+        accuracy = round(profile.accuracy_rate, 1) if profile.accuracy_rate > 70 else None
+        return most_common_error, accuracy, profile.level if profile.level > 1 else None
+    
     def get_profile(self, user_id: str) -> Optional[CognitiveProfile]:
         """Получить профиль ученика"""
-        if user_id not in self.profiles:
+        profile = self.profiles.get(user_id)
+        if profile is None:
             # Создаем новый профиль если его нет
-            self.profiles[user_id] = CognitiveProfile(user_id=user_id)
-        return self.profiles.get(user_id)
+            profile = CognitiveProfile(user_id=user_id)
+            self.profiles[user_id] = profile
+        return profile
+    
+    @traced("storage.save_profile", "storage")
+    def save_profile(self, profile: CognitiveProfile):
+        """Сохраняет изменённый профиль в общее хранилище"""
+        self.profiles[profile.user_id] = profile
+    
+    @traced("profiler.refit_mastery", "agents")
+    def refit_mastery(self, min_attempts: int = 200) -> Dict[str, Any]:
+        """Подбирает параметры BKT по истории всех учеников и пересчитывает оценки освоения тем"""
+        profiles = [profile for profile in (self.profiles.get(user_id) for user_id in list(self.profiles)) if profile is not None]
+        result = self.mastery.refit(profiles, min_attempts=min_attempts)
+        for profile in profiles:
+            if profile.task_history:
+                self.save_profile(profile)
+        return result
+    
+    def _apply_attempt_statistics(self, profile: CognitiveProfile, task_attempt: TaskAttempt):
+        """Статистика после одной новой попытки — O(1); полный пересчёт, если счётчики отстали от истории"""
+        if profile.total_tasks_completed != len(profile.task_history) - 1:
+            self._update_statistics(profile)
+            return
+        profile.total_tasks_completed += 1
+        if task_attempt.is_correct:
+            profile.correct_tasks_count += 1
+        profile.accuracy_rate = profile.correct_tasks_count / profile.total_tasks_completed * 100
     
     def _update_statistics(self, profile: CognitiveProfile):
         """Обновление статистики"""
         profile.total_tasks_completed = len(profile.task_history)
-        correct_count = sum(1 for attempt in profile.task_history if attempt.is_correct)
+        correct_count = profile.task_history.correct_count()
         profile.correct_tasks_count = correct_count
         profile.accuracy_rate = (correct_count / profile.total_tasks_completed * 100) if profile.total_tasks_completed > 0 else 0
     
@@ -116,8 +188,7 @@ class ProfilerAgent(BaseAgent):
         
         # Простая эвристика: если ученик быстро усваивает - визуальный
         # Если медленно но стабильно - текст
-        recent_tasks = profile.task_history[-10:]
-        avg_accuracy = sum(1 for t in recent_tasks if t.is_correct) / len(recent_tasks) if recent_tasks else 0
+        avg_accuracy = profile.task_history.accuracy(last=10)
         
         if avg_accuracy > 0.7 and profile.task_history:
             profile.learning_style = LearningStyle.VISUAL
@@ -126,11 +197,10 @@ class ProfilerAgent(BaseAgent):
     
     def _update_emotional_state(self, profile: CognitiveProfile):
         """Обновляет эмоциональное состояние"""
-        recent_tasks = profile.task_history[-5:] if len(profile.task_history) >= 5 else profile.task_history
-        if not recent_tasks:
+        if not profile.task_history:
             return
         
-        recent_accuracy = sum(1 for t in recent_tasks if t.is_correct) / len(recent_tasks)
+        recent_accuracy = profile.task_history.accuracy(last=5)
         
         if recent_accuracy >= 0.8:
             profile.current_emotional_state = EmotionalState.CONFIDENT
@@ -141,13 +211,61 @@ class ProfilerAgent(BaseAgent):
         else:
             profile.current_emotional_state = EmotionalState.NEUTRAL
     
+    @traced("profiler.recompute_all", "agents")
+    def recompute_all(self, user_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Пакетный пересчёт статистики, стиля обучения и эмоционального состояния всех учеников
+        (или только user_ids) — для аналитических задач и после изменения эвристик.
+        Истории обрабатываются векторно одним вызовом batch_statistics; пороги те же, что в
+        _detect_learning_style и _update_emotional_state. Сохраняются только изменившиеся профили.
+        """
+        ids = list(self.profiles) if user_ids is None else list(user_ids)
+        profiles = [profile for profile in (self.profiles.get(user_id) for user_id in ids) if profile is not None]
+        stats = batch_statistics([profile.task_history for profile in profiles], windows=(5, 10))
+        
+        style = np.where(stats["accuracy_last_10"] > 0.7, LearningStyle.VISUAL.value, LearningStyle.READING.value)
+        recent = stats["accuracy_last_5"]
+        emotion = np.select(
+            [recent >= 0.8, recent >= 0.6, recent < 0.3],
+            [EmotionalState.CONFIDENT.value, EmotionalState.MOTIVATED.value, EmotionalState.FRUSTRATED.value],
+            EmotionalState.NEUTRAL.value,
+        )
+        
+        updated = 0
+        for i, profile in enumerate(profiles):
+            before = (profile.total_tasks_completed, profile.correct_tasks_count, profile.accuracy_rate,
+                      profile.learning_style, profile.current_emotional_state)
+            total = int(stats["total"][i])
+            profile.total_tasks_completed = total
+            profile.correct_tasks_count = int(stats["correct"][i])
+            profile.accuracy_rate = float(stats["accuracy"][i] * 100)
+            if total >= 5:
+                profile.learning_style = LearningStyle(str(style[i]))
+            if total:
+                profile.current_emotional_state = EmotionalState(str(emotion[i]))
+            after = (profile.total_tasks_completed, profile.correct_tasks_count, profile.accuracy_rate,
+                     profile.learning_style, profile.current_emotional_state)
+            if after != before:
+                self.save_profile(profile)
+                updated += 1
+        
+        self.log(f"Recomputed {len(profiles)} profiles, {updated} changed", level="INFO")
+        active = stats["total"] > 0
+        return {
+            "profiles": len(profiles),
+            "updated": updated,
+            "total_attempts": int(stats["total"].sum()),
+            "average_accuracy": round(float(stats["accuracy"][active].mean() * 100), 2) if active.any() else 0.0,
+            "improving": int((stats["trend"] > 0).sum()),
+            "declining": int((stats["trend"] < 0).sum()),
+        }
+    
     def _update_motivation(self, profile: CognitiveProfile):
         """Обновляет систему мотивации"""
         # Начисляем очки за правильные ответы
         if profile.task_history:
-            last_task = profile.task_history[-1]
-            if last_task.is_correct:
-                profile.points += 10
+            if profile.task_history.is_correct[-1]:
+                profile.points += POINTS_PER_CORRECT
         
         # Определяем уровень
         profile.level = min(profile.points // 100 + 1, 10)
@@ -5,6 +5,9 @@
 from typing import Dict, Any, List
 from .base_agent import BaseAgent
 from models.cognitive_profile import CognitiveProfile, ErrorTag
+from services.mastery import get_mastery_engine
+from services.question_features import OP_ADD, OP_DIV, OP_MUL, OP_SUB, QuestionFeatures
+from services.task_bank import get_task_bank
 
 
 class TaskGeneratorAgent(BaseAgent):
@@ -12,10 +15,13 @@ class TaskGeneratorAgent(BaseAgent):
     Генерирует персонализированные задания для ученика
     """
     
+    # Минимум попыток по теме, с которого сложность выбирается по оценке освоения, а не по точности
+    MASTERY_MIN_ATTEMPTS = 3
+    
     def __init__(self):
         super().__init__("TaskGenerator")
-        # База заданий по темам
-        self.task_bank = self._initialize_task_bank()
+        # Общий банк заданий (services/task_bank.py)
+        self.task_bank = get_task_bank()
     
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -37,59 +43,40 @@ class TaskGeneratorAgent(BaseAgent):
         count = input_data.get('count', 3)
         
         # Определяем уровень сложности на основе профиля
-        difficulty = self._determine_difficulty(profile)
+        difficulty = self._determine_difficulty(profile, topic)
         
         # Получаем типичные ошибки ученика
         common_errors = self._get_common_errors(profile)
         
         # Генерируем задания
-        tasks = self._generate_personalized_tasks(topic, difficulty, common_errors, count)
+        tasks = self._generate_personalized_tasks(topic, difficulty, common_errors, count, input_data.get('user_id'))
+        
+        mastery = get_mastery_engine().estimate(profile, topic) if profile else None
         
         return {
             "tasks": tasks,
             "difficulty": difficulty,
+            "mastery": {"mastery": round(mastery.mastery, 4), "uncertainty": round(mastery.uncertainty, 4),
+                        "attempts": mastery.attempts} if mastery else None,
             "reasoning": f"Сгенерировано {len(tasks)} заданий уровня {difficulty} с учетом типичных ошибок ученика"
         }
     
-    def _initialize_task_bank(self) -> Dict[str, List[Dict]]:
-        """Инициализация базы заданий"""
-        return {
-            "addition": [
-                {"question": "15 + 8", "answer": 23, "level": "beginner"},
-                {"question": "47 + 56", "answer": 103, "level": "intermediate"},
-                {"question": "234 + 567", "answer": 801, "level": "advanced"},
-            ],
-            "subtraction": [
-                {"question": "20 - 7", "answer": 13, "level": "beginner"},
-                {"question": "85 - 29", "answer": 56, "level": "intermediate"},
-                {"question": "1000 - 345", "answer": 655, "level": "advanced"},
-            ],
-            "multiplication": [
-                {"question": "6 × 7", "answer": 42, "level": "beginner"},
-                {"question": "13 × 5", "answer": 65, "level": "intermediate"},
-                {"question": "23 × 15", "answer": 345, "level": "advanced"},
-            ],
-            "division": [
-                {"question": "24 ÷ 4", "answer": 6, "level": "beginner"},
-                {"question": "81 ÷ 9", "answer": 9, "level": "intermediate"},
-                {"question": "156 ÷ 12", "answer": 13, "level": "advanced"},
-            ],
-            "mixed": [
-                {"question": "15 + 8 - 5", "answer": 18, "level": "intermediate"},
-                {"question": "6 × 3 + 10", "answer": 28, "level": "intermediate"},
-                {"question": "(10 + 5) × 2", "answer": 30, "level": "advanced"},
-                {"question": "50 - (20 + 10)", "answer": 20, "level": "advanced"},
-            ],
-        }
-    
-    def _determine_difficulty(self, profile: CognitiveProfile) -> str:
+    def _determine_difficulty(self, profile: CognitiveProfile, topic: str = None) -> str:
         """Определяет уровень сложности для ученика"""
         if not profile.task_history:
             return "beginner"
         
+        # По оценке освоения темы (BKT), если по ней достаточно попыток
+        mastery = get_mastery_engine().estimate(profile, topic)
+        if mastery.attempts >= self.MASTERY_MIN_ATTEMPTS:
+            if mastery.mastery >= 0.85:
+                return "advanced"
+            elif mastery.mastery >= 0.6:
+                return "intermediate"
+            return "beginner"
+        
         # Анализируем последние задачи
-        recent_tasks = profile.task_history[-10:] if len(profile.task_history) >= 10 else profile.task_history
-        accuracy = sum(1 for t in recent_tasks if t.is_correct) / len(recent_tasks) if recent_tasks else 0
+        accuracy = profile.task_history.accuracy(last=10)
         
         if accuracy >= 0.8:
             return "advanced"
@@ -107,49 +94,30 @@ class TaskGeneratorAgent(BaseAgent):
         sorted_errors = sorted(profile.error_frequency.items(), key=lambda x: x[1], reverse=True)
         return [error[0] for error in sorted_errors[:3]]
     
-    def _generate_personalized_tasks(self, topic: str, difficulty: str, common_errors: List[str], count: int) -> List[Dict]:
+    def _generate_personalized_tasks(self, topic: str, difficulty: str, common_errors: List[str], count: int,
+                                     user_id: str = None) -> List[Dict]:
         """Генерирует персонализированные задания"""
-        tasks = []
-        
         # Выбираем категорию заданий
-        category = topic if topic in self.task_bank else "mixed"
-        
-        # Фильтруем по уровню сложности
-        available_tasks = [
-            task for task in self.task_bank.get(category, [])
-            if task["level"] == difficulty
-        ]
+        category = topic if topic in self.task_bank.categories() else "mixed"
         
-        # Если нет задач нужного уровня, берем ближайший
-        if not available_tasks:
-            for level in ["beginner", "intermediate", "advanced"]:
-                available_tasks = [
-                    task for task in self.task_bank.get(category, [])
-                    if task["level"] == level
-                ]
-                if available_tasks:
-                    break
+        # Без повторов для ученика; в первую очередь — задания на его типичные ошибки
+        selected_tasks = self.task_bank.sample(user_id or "anonymous", category, difficulty, count, error_tags=common_errors)
         
-        # Генерируем задания
-        import random
-        selected_tasks = random.sample(available_tasks, min(count, len(available_tasks)))
-        
-        # Добавляем ID и другие метаданные
-        for i, task in enumerate(selected_tasks):
-            tasks.append({
-                "id": len(tasks) + 1000,  # Генерируем ID
-                "question": task["question"],
-                "correct_answer": task["answer"],
+        return [
+            {
+                "id": task.id,
+                "question": task.question,
+                "correct_answer": task.answer,
                 "category": category,
-                "difficulty": difficulty,
+                "difficulty": task.level,
                 "targeted_errors": common_errors,
-                "hint": self._generate_hint(task["question"], common_errors)
-            })
-        
-        return tasks
+                "hint": self._generate_hint(self.task_bank.features(task.id), common_errors)
+            }
+            for task in selected_tasks
+        ]
     
-    def _generate_hint(self, question: str, common_errors: List[str]) -> str:
-        """Генерирует подсказку с учетом типичных ошибок"""
+    def _generate_hint(self, features: QuestionFeatures, common_errors: List[str]) -> str:
+        """Генерирует подсказку с учетом типичных ошибок и признаков задания (из банка заданий)"""
         hints = {
             ErrorTag.CARELESSNESS: "Будьте внимательны при вычислениях. Проверьте ответ.",
             ErrorTag.CALCULATION_ERROR: "Выполняйте вычисления пошагово.",
@@ -158,8 +126,24 @@ class TaskGeneratorAgent(BaseAgent):
             ErrorTag.LOGIC_GAP: "Подумайте о логике задачи. Что нужно найти? Как связаны данные?"
         }
         
-        if common_errors and common_errors[0] in hints:
+        # Подсказка про порядок действий — только если в задании он важен
+        if common_errors and common_errors[0] in hints and (
+            common_errors[0] != ErrorTag.MISSING_FORMULA or features.mixed_precedence or features.parentheses
+        ):
             return hints[common_errors[0]]
         
+        if features.parentheses:
+            return "Сначала выполните действия в скобках."
+        if features.mixed_precedence:
+            return hints[ErrorTag.MISSING_FORMULA]
+        if features.has(OP_DIV):
+            return "Проверьте деление умножением: частное, умноженное на делитель, равно делимому."
+        if features.max_digits >= 2 and features.has(OP_SUB):
+            return "Вычитайте по разрядам, начиная с единиц. Не забудьте про заём из старшего разряда."
+        if features.max_digits >= 2 and features.has(OP_ADD):
+            return "Складывайте по разрядам, начиная с единиц. Не забудьте про перенос в старший разряд."
+        if features.has(OP_MUL):
+            return "Вспомните таблицу умножения и проверьте ответ сложением."
+        
         return "Решайте задачу внимательно и проверяйте свой ответ."
 
@@ -1,10 +1,14 @@
 """
 Агент аналитики для учителя
 Агрегирует данные класса и формирует отчеты
+
+Отчёты строятся по материализованным видам классов (services/class_analytics.py), а не по профилям,
+и кэшируются до следующего изменения класса (ключ — ETag вида).
 """
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from .base_agent import BaseAgent
-from models.cognitive_profile import CognitiveProfile
+from services.class_analytics import ClassWeek, StudentSummary, get_class_analytics, split_cell_key
 
 
 class TeacherAnalyticsAgent(BaseAgent):
@@ -12,9 +16,15 @@ class TeacherAnalyticsAgent(BaseAgent):
     Генерирует аналитику для учителя
     """
     
+    # Сколько готовых отчётов держать в памяти и за сколько последних недель показывать динамику
+    REPORT_CACHE_SIZE = 256
+    REPORT_WEEKS = 8
+    
     def __init__(self):
         super().__init__("TeacherAnalytics")
-        self.class_profiles: Dict[str, List[CognitiveProfile]] = {}  # class_id -> [profiles]
+        self.analytics = get_class_analytics()
+        # (класс, тип отчёта) -> (ETag, отчёт); последние REPORT_CACHE_SIZE отчётов
+        self._reports: "OrderedDict[Tuple[str, str], Tuple[str, Dict[str, Any]]]" = OrderedDict()
     
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -34,7 +44,15 @@ class TeacherAnalyticsAgent(BaseAgent):
         class_id = input_data.get('class_id')
         user_ids = input_data.get('user_ids', [])
         
-        # Собираем данные профилей
+        # Готовый отчёт, если класс не менялся
+        etag, _ = self.analytics.validators(class_id, report_type)
+        cache_key = (self.analytics.view_key(class_id), report_type)
+        cached = self._reports.get(cache_key)
+        if cached is not None and cached[0] == etag and not user_ids:
+            self._reports.move_to_end(cache_key)
+            return cached[1]
+        
+        # Собираем данные учеников
         profiles = self._collect_profiles(class_id, user_ids)
         
         if not profiles:
@@ -42,23 +60,30 @@ class TeacherAnalyticsAgent(BaseAgent):
         
         # Генерируем отчет в зависимости от типа
         if report_type == 'summary':
-            report = self._generate_summary_report(profiles)
+            report = self._generate_summary_report(profiles, class_id)
         elif report_type == 'detailed':
-            report = self._generate_detailed_report(profiles)
+            report = self._generate_detailed_report(profiles, class_id)
         elif report_type == 'struggling':
             report = self._generate_struggling_students_report(profiles)
         else:
-            report = self._generate_summary_report(profiles)
+            report = self._generate_summary_report(profiles, class_id)
         
+        if not user_ids:
+            self._reports[cache_key] = (etag, report)
+            self._reports.move_to_end(cache_key)
+            while len(self._reports) > self.REPORT_CACHE_SIZE:
+                self._reports.popitem(last=False)
         return report
     
-    def _collect_profiles(self, class_id: str = None, user_ids: List[str] = []) -> List[CognitiveProfile]:
-        """Собирает профили учеников"""
-        # В реальной реализации здесь будет запрос к базе данных
-        # Сейчас возвращаем заглушку
-        return []
+    def _collect_profiles(self, class_id: str = None, user_ids: List[str] = []) -> List[StudentSummary]:
+        """Собирает строки учеников класса (все ученики, если класс не задан) из аналитики классов"""
+        students = self.analytics.class_students(class_id)
+        if user_ids:
+            wanted = set(user_ids)
+            students = [student for student in students if student.user_id in wanted]
+        return students
     
-    def _generate_summary_report(self, profiles: List[CognitiveProfile]) -> Dict[str, Any]:
+    def _generate_summary_report(self, profiles: List[StudentSummary], class_id: Optional[str] = None) -> Dict[str, Any]:
         """Генерирует сводный отчет по классу"""
         total_students = len(profiles)
         
@@ -78,6 +103,9 @@ class TeacherAnalyticsAgent(BaseAgent):
         # Распределение достижений
         most_common_errors = self._get_class_common_errors(profiles)
         
+        # Недельные агрегаты класса
+        weeks = self.analytics.class_weeks(class_id, last=self.REPORT_WEEKS)
+        
         return {
             "report_type": "summary",
             "class_statistics": {
@@ -87,12 +115,15 @@ class TeacherAnalyticsAgent(BaseAgent):
                 "level_distribution": level_distribution
             },
             "common_challenges": most_common_errors,
+            "topic_mastery": self._get_class_topic_mastery(profiles),
+            "weekly_activity": self._get_weekly_activity(weeks),
+            "topic_errors": self._get_topic_errors(weeks),
             "recommendations": self._generate_class_recommendations(profiles)
         }
     
-    def _generate_detailed_report(self, profiles: List[CognitiveProfile]) -> Dict[str, Any]:
+    def _generate_detailed_report(self, profiles: List[StudentSummary], class_id: Optional[str] = None) -> Dict[str, Any]:
         """Генерирует детальный отчет"""
-        summary = self._generate_summary_report(profiles)
+        summary = self._generate_summary_report(profiles, class_id)
         
         # Добавляем индивидуальные профили
         individual_profiles = []
@@ -105,7 +136,8 @@ class TeacherAnalyticsAgent(BaseAgent):
                 "points": profile.points,
                 "achievements": profile.achievements,
                 "most_common_errors": dict(sorted(profile.error_frequency.items(), key=lambda x: x[1], reverse=True)[:3]),
-                "current_emotional_state": profile.current_emotional_state.value if profile.current_emotional_state else None
+                "topic_mastery": profile.mastery,
+                "current_emotional_state": profile.current_emotional_state
             })
         
         return {
@@ -113,7 +145,7 @@ class TeacherAnalyticsAgent(BaseAgent):
             "individual_profiles": individual_profiles
         }
     
-    def _generate_struggling_students_report(self, profiles: List[CognitiveProfile]) -> Dict[str, Any]:
+    def _generate_struggling_students_report(self, profiles: List[StudentSummary]) -> Dict[str, Any]:
         """Выявляет отстающих учеников"""
         struggling_students = []
         
@@ -121,7 +153,7 @@ class TeacherAnalyticsAgent(BaseAgent):
             # Критерии отставания
             is_struggling = (
                 profile.accuracy_rate < 50 or  # Низкая точность
-                len(profile.task_history) > 10 and profile.total_tasks_completed < 5 or  # Мало выполненных заданий
+                profile.history_length > 10 and profile.total_tasks_completed < 5 or  # Мало выполненных заданий
                 any(count > 5 for count in profile.error_frequency.values())  # Частые ошибки
             )
             
@@ -140,7 +172,7 @@ class TeacherAnalyticsAgent(BaseAgent):
             "intervention_suggestions": self._generate_intervention_suggestions(struggling_students)
         }
     
-    def _get_class_common_errors(self, profiles: List[CognitiveProfile]) -> Dict[str, int]:
+    def _get_class_common_errors(self, profiles: List[StudentSummary]) -> Dict[str, int]:
         """Получает самые частые ошибки в классе"""
         class_errors = {}
         for profile in profiles:
@@ -149,7 +181,48 @@ class TeacherAnalyticsAgent(BaseAgent):
         
         return dict(sorted(class_errors.items(), key=lambda x: x[1], reverse=True)[:5])
     
-    def _generate_class_recommendations(self, profiles: List[CognitiveProfile]) -> List[Dict[str, Any]]:
+    def _get_class_topic_mastery(self, profiles: List[StudentSummary]) -> Dict[str, Dict[str, float]]:
+        """Средняя оценка освоения тем по классу; уверенные оценки (меньше неопределённость) весят больше"""
+        totals: Dict[str, List[float]] = {}  # topic -> [сумма весов, взвешенная сумма, учеников]
+        for profile in profiles:
+            for topic, state in profile.mastery.items():
+                weight = 1.0 - state["uncertainty"]
+                entry = totals.setdefault(topic, [0.0, 0.0, 0])
+                entry[0] += weight
+                entry[1] += weight * state["mastery"]
+                entry[2] += 1
+        return {
+            topic: {"mastery": round(weighted / weights, 4) if weights else 0.0, "students": students}
+            for topic, (weights, weighted, students) in sorted(totals.items())
+        }
+    
+    def _get_weekly_activity(self, weeks: List[ClassWeek]) -> List[Dict[str, Any]]:
+        """Попытки, точность и среднее время по неделям"""
+        activity = []
+        for week in weeks:
+            attempts = sum(cell.attempts for cell in week.cells.values())
+            correct = sum(cell.correct for cell in week.cells.values())
+            timed = sum(cell.timed for cell in week.cells.values())
+            activity.append({
+                "week": week.week.isoformat(),
+                "attempts": attempts,
+                "accuracy": round(correct / attempts * 100, 2) if attempts else 0.0,
+                "average_time_seconds": round(sum(cell.time_spent_seconds for cell in week.cells.values()) / timed, 1) if timed else None
+            })
+        return activity
+    
+    def _get_topic_errors(self, weeks: List[ClassWeek]) -> Dict[str, Dict[str, int]]:
+        """Ошибки по темам и типам за последние недели: {тема: {тип ошибки: число}}"""
+        errors: Dict[str, Dict[str, int]] = {}
+        for week in weeks:
+            for key, cell in week.cells.items():
+                topic, error_type = split_cell_key(key)
+                if error_type:
+                    by_type = errors.setdefault(topic or "без темы", {})
+                    by_type[error_type] = by_type.get(error_type, 0) + cell.attempts
+        return {topic: dict(sorted(by_type.items(), key=lambda x: x[1], reverse=True)) for topic, by_type in sorted(errors.items())}
+    
+    def _generate_class_recommendations(self, profiles: List[StudentSummary]) -> List[Dict[str, Any]]:
         """Генерирует рекомендации для класса"""
         recommendations = []
         
@@ -172,7 +245,7 @@ class TeacherAnalyticsAgent(BaseAgent):
         
         return recommendations
     
-    def _generate_student_recommendations(self, profile: CognitiveProfile) -> List[str]:
+    def _generate_student_recommendations(self, profile: StudentSummary) -> List[str]:
         """Генерирует рекомендации для конкретного ученика"""
         recommendations = []
         
@@ -183,7 +256,7 @@ class TeacherAnalyticsAgent(BaseAgent):
             top_error = max(profile.error_frequency.items(), key=lambda x: x[1])
             recommendations.append(f"Частая ошибка: {top_error[0]}. Требуется дополнительная практика.")
         
-        if profile.task_history and len(profile.task_history) < 10:
+        if 0 < profile.history_length < 10:
             recommendations.append("Недостаточно практики. Рекомендуется больше заданий.")
         
         return recommendations
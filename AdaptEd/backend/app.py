@@ -1,7 +1,12 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import lessons, users, agents, auth
-from routes import assistant, homework, tests
+
+from utils.logger import get_logger, setup_logging
+
+logger = get_logger("app")
 
 try:
 	from dotenv import load_dotenv  # type: ignore
@@ -9,25 +14,93 @@ try:
 	# Загружаем .env из папки backend
 	env_path = os.path.join(os.path.dirname(__file__), '.env')
 	load_dotenv(env_path)
-	print(f"[App] Загружен .env из: {env_path}")
-	print(f"[App] ASSISTANT_PROVIDER={os.getenv('ASSISTANT_PROVIDER', 'не установлен')}")
-	print(f"[App] OLLAMA_URL={os.getenv('OLLAMA_URL', 'не установлен')}")
-	print(f"[App] OLLAMA_MODEL={os.getenv('OLLAMA_MODEL', 'не установлен')}")
-	
-	# Инициализируем assistant_service после загрузки .env
-	from services.assistant import get_assistant_service
-	get_assistant_service()  # Создаем экземпляр с правильными настройками
-	print(f"[App] AssistantService инициализирован")
+	setup_logging()  # после .env — уровни и формат могут задаваться там
+	logger.info("Загружен .env из: %s", env_path)
+	logger.info(
+		"ASSISTANT_PROVIDER=%s OLLAMA_URL=%s OLLAMA_MODEL=%s",
+		os.getenv('ASSISTANT_PROVIDER', 'не установлен'),
+		os.getenv('OLLAMA_URL', 'не установлен'),
+		os.getenv('OLLAMA_MODEL', 'не установлен'),
+	)
 except Exception as e:
 	def load_dotenv():
 		return None
-	print(f"[App] Ошибка загрузки .env: {e}")
+	setup_logging()
+	logger.warning("Ошибка загрузки .env: %s", e)
+
+# Маршруты импортируются после .env: модули читают настройки (TRACING, PROFILING, ...) при импорте
+from routes import lessons, users, agents, auth
+from routes import assistant, homework, tests, metrics, admin
+from utils.tracing import RequestIdMiddleware
+from utils.profiling import install_profiling
+
+
+def _warm_up():
+    """Тяжёлая инициализация после старта: схема БД, сервисы, документы, админ по умолчанию"""
+    from utils.db import init_db
+    from services.assistant import get_assistant_service
+    from agents.orchestrator import get_orchestrator
+    from utils.auth_service import auth_service
+
+    init_db()
+    auth_service.ensure_default_admin()
+    get_orchestrator()
+    get_assistant_service().warm_up()  # создаётся после загрузки .env — с правильными настройками
+    logger.info("Прогрев завершён")
 
-from utils.db import init_db
 
-init_db()
+async def _daily(at: str, name: str, job):
+    """
+    Каждый день в at ("HH:MM", локальное время) выполняет job в отдельном потоке.
 
-app = FastAPI()
+    Таймер заводит каждый воркер gunicorn, но состояние у них общее: запуск за день занимается
+    в хранилище состояния (StateStore.claim), и задание выполняет только занявший его воркер.
+    """
+    from datetime import date
+    from services.review_scheduler import seconds_until
+    from utils.state_store import get_state_store
+    while True:
+        await asyncio.sleep(seconds_until(at))
+        if not get_state_store().claim("scheduled_jobs", name, date.today().isoformat()):
+            logger.info("%s: уже выполняется другим воркером", name)
+            continue
+        try:
+            result = await asyncio.to_thread(job)
+            logger.info("%s: %s", name, result)
+        except Exception:
+            logger.exception("%s failed", name)
+
+
+def _scheduled_jobs() -> list:
+    """Ежедневные пакетные пересчёты, включённые в .env: (время, имя, функция)"""
+    from agents.orchestrator import get_orchestrator
+    from services.class_analytics import CLASS_ANALYTICS_REBUILD_AT
+    from services.review_scheduler import REVIEW_RECOMPUTE_AT
+    from services.timeseries import TIMESERIES_REBUILD_AT
+
+    jobs = []
+    if REVIEW_RECOMPUTE_AT:
+        jobs.append((REVIEW_RECOMPUTE_AT, "review schedules recompute", lambda: get_orchestrator().recompute_reviews()))
+    if CLASS_ANALYTICS_REBUILD_AT:
+        jobs.append((CLASS_ANALYTICS_REBUILD_AT, "class analytics rebuild", lambda: get_orchestrator().rebuild_class_analytics()))
+    if TIMESERIES_REBUILD_AT:
+        jobs.append((TIMESERIES_REBUILD_AT, "time series rebuild", lambda: get_orchestrator().rebuild_time_series()))
+    return jobs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Сервер начинает принимать запросы сразу; всё, что не успело прогреться,
+    # инициализируется лениво при первом обращении
+    warm_up = asyncio.create_task(asyncio.to_thread(_warm_up))
+    scheduled = [asyncio.create_task(_daily(at, name, job)) for at, name, job in _scheduled_jobs()]
+    yield
+    for task in [warm_up, *scheduled]:
+        if not task.done():
+            task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,6 +109,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 # API routes - без префикса для обратной совместимости
 app.include_router(auth.router, tags=["Auth"])
@@ -45,6 +119,11 @@ app.include_router(agents.router, tags=["Agents"])
 app.include_router(assistant.router, tags=["Assistant"])
 app.include_router(homework.router, tags=["Homework"])
 app.include_router(tests.router, tags=["Tests"])
+app.include_router(metrics.router, tags=["Metrics"])
+app.include_router(admin.router, tags=["Admin"])
+
+install_profiling(app)  # после роутеров: оборачивает синхронные эндпоинты (при PROFILING=1)
+app.add_middleware(RequestIdMiddleware)  # последним, самый внешний: request ID виден в метриках, логах, спанах и профилях
 
 @app.get("/")
 def read_root():
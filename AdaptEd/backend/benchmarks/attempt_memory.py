@@ -0,0 +1,98 @@
+"""
+Память истории попыток: список pydantic TaskAttempt против колоночного AttemptLog (models/attempt_log.py).
+
+Запуск из папки backend:
+    python benchmarks/attempt_memory.py                  # 1 000 000 попыток
+    python benchmarks/attempt_memory.py --attempts 200000 --questions 5000
+
+Попытки синтетические, как их создаёт оркестратор: новая строка вопроса на каждую попытку,
+~30% ошибок с анализом, обоснования — из шаблонов ErrorAnalyzerAgent. Память меряется через
+tracemalloc отдельно для каждого представления (включая пулы строк для AttemptLog).
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+JUSTIFICATIONS = [
+	"Незначительная ошибка на единицу. Вероятно, описка в вычислении.",
+	"Существенная ошибка в логике решения.",
+	"Ошибка в разряде числа.",
+	"Ошибка в арифметических вычислениях.",
+	"Не использована правильная формула или метод решения.",
+	"Неправильное понимание концепции задачи.",
+]
+
+
+def _attempts(n: int, questions: int, seed: int):
+	"""Генератор попыток: модели создаются по одной, чтобы не держать вход в памяти"""
+	from models.cognitive_profile import TaskAttempt, ErrorAnalysis, ErrorTag
+	rng = random.Random(seed)
+	tags = list(ErrorTag)
+	started = datetime.now() - timedelta(days=365)
+	for i in range(n):
+		q = rng.randrange(questions)
+		a, b = q // 100 + 2, q % 100 + 2
+		correct = rng.random() < 0.7
+		yield TaskAttempt(
+			task_id=q, question=f"{a} + {b}", user_answer=a + b if correct else a + b + rng.randint(1, 5),
+			correct_answer=a + b, is_correct=correct, time_spent_seconds=rng.randint(5, 300),
+			error_analysis=None if correct else ErrorAnalysis(
+				error_type=rng.choice(tags), justification=rng.choice(JUSTIFICATIONS),
+				suggested_remediation="Повторите материал по теме",
+			),
+			timestamp=started + timedelta(seconds=30 * i),
+		)
+
+
+def _measure(build):
+	gc.collect()
+	tracemalloc.start()
+	started = time.perf_counter()
+	value = build()
+	elapsed = time.perf_counter() - started
+	gc.collect()
+	current, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return value, current, elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--attempts", type=int, default=1_000_000)
+	parser.add_argument("--questions", type=int, default=2_000, help="число различных вопросов")
+	parser.add_argument("--seed", type=int, default=42)
+	args = parser.parse_args()
+
+	from models.attempt_log import AttemptLog
+
+	n = args.attempts
+	print(f"{n} attempts, {args.questions} distinct questions")
+
+	models, models_bytes, models_s = _measure(lambda: list(_attempts(n, args.questions, args.seed)))
+	del models
+	log, log_bytes, log_s = _measure(lambda: AttemptLog(_attempts(n, args.questions, args.seed)))
+
+	print(f"{'representation':<22}{'MiB':>10}{'bytes/attempt':>16}{'build, s':>10}")
+	print(f"{'list[TaskAttempt]':<22}{models_bytes / 2**20:>10.1f}{models_bytes / n:>16.0f}{models_s:>10.1f}")
+	print(f"{'AttemptLog':<22}{log_bytes / 2**20:>10.1f}{log_bytes / n:>16.0f}{log_s:>10.1f}")
+	print(f"AttemptLog columns: {log.nbytes() / 2**20:.1f} MiB, reduction x{models_bytes / max(1, log_bytes):.1f}")
+
+	started = time.perf_counter()
+	accuracy = log.accuracy()
+	recent = log.accuracy(last=10)
+	print(f"accuracy over history {accuracy:.3f} / last 10 {recent:.2f}: {(time.perf_counter() - started) * 1000:.1f} ms")
+	started = time.perf_counter()
+	log[-10:]
+	print(f"materialize last 10 as TaskAttempt: {(time.perf_counter() - started) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+	main()
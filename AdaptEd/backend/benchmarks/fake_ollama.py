@@ -0,0 +1,270 @@
+"""
+Заглушка Ollama для нагрузочного тестирования и бенчмарков — без модели и GPU.
+
+Поддерживает /api/chat, /api/generate (обычный и потоковый NDJSON-режим), /api/embeddings, /api/tags.
+Время ответа = задержка до первого токена (распределение --latency) + токены / --tokens-per-sec.
+На промпты с просьбой создать тест отвечает готовым JSON-тестом (формат /tests/generate).
+
+Отдельный процесс:
+    python benchmarks/fake_ollama.py --port 11435 --latency lognormal:300:0.5 --tokens-per-sec 40
+    python benchmarks/fake_ollama.py --error-rate 0.05 --error-codes 500,503 --hang-rate 0.01
+    OLLAMA_URL=http://127.0.0.1:11435 python run_backend.py
+
+Распределения задержки (мс): fixed:200 | uniform:100:400 | normal:250:50 | lognormal:<медиана>:<sigma>
+
+Из кода бенчмарка:
+    from fake_ollama import start_fake_ollama
+    server, url = start_fake_ollama(latency_ms=50)
+    server.stats  # счётчики запросов, ошибок и отданных токенов
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+CANNED_REPLY = "Хорошая попытка! Проверь порядок действий: сначала умножение и деление, затем сложение и вычитание."
+
+CANNED_TEST = {
+	"title": "Порядок действий",
+	"topic": "арифметика",
+	"difficulty": "medium",
+	"questions": [
+		{
+			"question": f"Чему равно {a} + {b} * {c}?",
+			"options": [str(a + b * c), str((a + b) * c), str(a * b + c), str(a + b + c)],
+			# correct_index — формат routes/tests.py, correct_answer — routes/homework.py
+			"correct_index": 0,
+			"correct_answer": 0,
+			"explanation": "Сначала умножение, затем сложение.",
+		}
+		for a, b, c in [(2, 3, 4), (5, 2, 6), (7, 3, 3), (1, 8, 2), (9, 4, 5)]
+	],
+}
+
+EMBEDDING_DIM = 384
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+	"""'lognormal:300:0.5' -> функция, возвращающая задержку в секундах."""
+	kind, *params = spec.split(":")
+	values = [float(p) for p in params]
+	if kind == "fixed":
+		return lambda: values[0] / 1000.0
+	if kind == "uniform":
+		low, high = values
+		return lambda: random.uniform(low, high) / 1000.0
+	if kind == "normal":
+		mean, std = values
+		return lambda: max(0.0, random.gauss(mean, std)) / 1000.0
+	if kind == "lognormal":
+		median, sigma = values
+		mu = math.log(max(median, 1e-3))
+		return lambda: random.lognormvariate(mu, sigma) / 1000.0
+	raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def _embedding(text: str):
+	"""Детерминированный псевдо-эмбеддинг единичной длины: одинаковый текст — одинаковый вектор."""
+	seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+	rng = random.Random(seed)
+	vector = [rng.gauss(0.0, 1.0) for _ in range(EMBEDDING_DIM)]
+	norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+	return [v / norm for v in vector]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+	server_version = "FakeOllama/0.2"
+	protocol_version = "HTTP/1.1"
+
+	def log_message(self, format, *args):  # noqa: A002 — сигнатура BaseHTTPRequestHandler
+		pass
+
+	def _send_json(self, status: int, body: dict):
+		payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json; charset=utf-8")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def _read_json(self) -> dict:
+		length = int(self.headers.get("Content-Length") or 0)
+		raw = self.rfile.read(length) if length else b""
+		try:
+			return json.loads(raw or b"{}")
+		except ValueError:
+			return {}
+
+	def do_GET(self):
+		if self.path == "/api/tags":
+			self._send_json(200, {"models": [{"name": self.server.model}]})
+		else:
+			self._send_json(404, {"error": "not found"})
+
+	def do_POST(self):
+		body = self._read_json()
+		server = self.server
+		server.count("requests")
+
+		if self.path == "/api/embeddings":
+			time.sleep(server.latency())
+			self._send_json(200, {"embedding": _embedding(body.get("prompt") or body.get("input") or "")})
+			return
+		if self.path not in ("/api/chat", "/api/generate"):
+			self._send_json(404, {"error": "not found"})
+			return
+
+		# Внедрение ошибок: HTTP-ошибка или зависание дольше таймаута клиента
+		roll = random.random()
+		if roll < server.hang_rate:
+			server.count("hangs")
+			time.sleep(server.hang_s)
+			self._send_json(500, {"error": "fake hang"})
+			return
+		if roll < server.hang_rate + server.error_rate:
+			server.count("errors")
+			self._send_json(random.choice(server.error_codes), {"error": "fake injected error"})
+			return
+
+		prompt = body.get("prompt") or " ".join(m.get("content", "") for m in body.get("messages") or [])
+		text = self._reply_for(prompt)
+		chat = self.path == "/api/chat"
+		if body.get("stream", True):
+			self._stream(body, text, chat)
+		else:
+			self._respond(body, text, chat)
+
+	def _reply_for(self, prompt: str) -> str:
+		lowered = prompt.lower()
+		if "тест" in lowered and "json" in lowered:
+			return json.dumps(CANNED_TEST, ensure_ascii=False)
+		return CANNED_REPLY
+
+	def _tokens(self, text: str):
+		# Грубая токенизация по словам с сохранением пробелов — достаточно для темпа и счётчиков
+		words = text.split(" ")
+		return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+	def _timings(self, started: float, ttft: float, tokens: int) -> dict:
+		total_ns = int((time.perf_counter() - started) * 1e9)
+		ttft_ns = int(ttft * 1e9)
+		return {
+			"total_duration": total_ns,
+			"load_duration": 0,
+			"prompt_eval_duration": ttft_ns,
+			"eval_count": tokens,
+			"eval_duration": max(1, total_ns - ttft_ns),
+		}
+
+	def _chunk(self, body: dict, content: str, chat: bool, done: bool) -> dict:
+		chunk = {
+			"model": body.get("model", self.server.model),
+			"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+			"done": done,
+		}
+		if chat:
+			chunk["message"] = {"role": "assistant", "content": content}
+		else:
+			chunk["response"] = content
+		return chunk
+
+	def _respond(self, body: dict, text: str, chat: bool):
+		started = time.perf_counter()
+		ttft = self.server.latency()
+		tokens = self._tokens(text)
+		time.sleep(ttft + len(tokens) * self.server.token_interval)
+		self.server.count("tokens", len(tokens))
+		self._send_json(200, {**self._chunk(body, text, chat, True), **self._timings(started, ttft, len(tokens))})
+
+	def _stream(self, body: dict, text: str, chat: bool):
+		started = time.perf_counter()
+		ttft = self.server.latency()
+		tokens = self._tokens(text)
+		self.send_response(200)
+		self.send_header("Content-Type", "application/x-ndjson")
+		self.send_header("Transfer-Encoding", "chunked")
+		self.end_headers()
+
+		def write(obj: dict):
+			data = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+			self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+			self.wfile.flush()
+
+		time.sleep(ttft)
+		for token in tokens:
+			write(self._chunk(body, token, chat, False))
+			time.sleep(self.server.token_interval)
+		write({**self._chunk(body, "", chat, True), **self._timings(started, ttft, len(tokens))})
+		self.wfile.write(b"0\r\n\r\n")
+		self.server.count("tokens", len(tokens))
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+	daemon_threads = True
+
+	def __init__(self, address, latency: Callable[[], float], tokens_per_sec: float = 0.0, error_rate: float = 0.0,
+				 error_codes=(500,), hang_rate: float = 0.0, hang_s: float = 150.0, model: str = "llama3.2"):
+		super().__init__(address, FakeOllamaHandler)
+		self.latency = latency
+		self.token_interval = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+		self.error_rate = error_rate
+		self.error_codes = list(error_codes)
+		self.hang_rate = hang_rate
+		self.hang_s = hang_s
+		self.model = model
+		self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "hangs": 0, "tokens": 0}
+		self._stats_lock = threading.Lock()
+
+	def count(self, key: str, amount: int = 1):
+		with self._stats_lock:
+			self.stats[key] += amount
+
+
+def start_fake_ollama(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 50.0, jitter_ms: float = 0.0,
+					  model: str = "llama3.2", latency: Optional[str] = None, tokens_per_sec: float = 0.0,
+					  error_rate: float = 0.0, error_codes=(500,), hang_rate: float = 0.0):
+	"""Запускает заглушку в фоновом потоке; возвращает (server, base_url). Остановка — server.shutdown().
+
+	latency — спецификация распределения ("lognormal:300:0.5"); без неё — latency_ms + равномерно до jitter_ms.
+	"""
+	latency_fn = parse_latency(latency) if latency else parse_latency(f"uniform:{latency_ms}:{latency_ms + jitter_ms}")
+	server = FakeOllamaServer(
+		(host, port), latency_fn, tokens_per_sec=tokens_per_sec, error_rate=error_rate,
+		error_codes=error_codes, hang_rate=hang_rate, model=model,
+	)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=11435)
+	parser.add_argument("--latency", default="fixed:200", help="распределение задержки до первого токена, мс")
+	parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="темп генерации; 0 — мгновенно")
+	parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов с HTTP-ошибкой")
+	parser.add_argument("--error-codes", default="500", help="коды ошибок через запятую")
+	parser.add_argument("--hang-rate", type=float, default=0.0, help="доля запросов, зависающих дольше таймаута клиента")
+	parser.add_argument("--model", default="llama3.2")
+	args = parser.parse_args()
+
+	server, url = start_fake_ollama(
+		args.host, args.port, model=args.model, latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+		error_rate=args.error_rate, error_codes=[int(c) for c in args.error_codes.split(",")], hang_rate=args.hang_rate,
+	)
+	print(f"Fake Ollama on {url}: latency {args.latency} ms, {args.tokens_per_sec or 'instant'} tokens/s, "
+		  f"errors {args.error_rate:.0%}, hangs {args.hang_rate:.0%}")
+	try:
+		threading.Event().wait()
+	except KeyboardInterrupt:
+		server.shutdown()
+		print(f"Stats: {server.stats}")
+
+
+if __name__ == "__main__":
+	main()
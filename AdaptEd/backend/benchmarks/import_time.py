@@ -0,0 +1,58 @@
+"""
+Время холодного импорта приложения (`import app`) — то, что платит каждый воркер при старте.
+
+Запуск из папки backend:
+    python benchmarks/import_time.py --runs 5 --top 15 --budget 1.0
+
+Каждый прогон — отдельный процесс с `python -X importtime`, чтобы кэш модулей не влиял на результат.
+Печатается медиана общего времени и самые дорогие модули (cumulative) из медианного прогона.
+С --budget скрипт завершается с кодом 1, если медиана превышает бюджет (в секундах).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _run_once() -> tuple:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative_us), name.strip()))
+    total = next(us for us, name in reversed(modules) if name == "app")
+    return total / 1e6, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", type=float, default=None, help="допустимая медиана, секунды")
+    args = parser.parse_args()
+
+    runs = sorted((_run_once() for _ in range(args.runs)), key=lambda r: r[0])
+    median_total, modules = runs[len(runs) // 2]
+    print(f"import app: median {median_total:.3f}s  (min {runs[0][0]:.3f}s, max {runs[-1][0]:.3f}s, runs={args.runs})")
+    print(f"{'cumulative, ms':>15}  module")
+    for us, name in sorted(modules, reverse=True)[: args.top]:
+        print(f"{us / 1000:>15.1f}  {name}")
+
+    if args.budget is not None and median_total > args.budget:
+        print(f"FAIL: {median_total:.3f}s > budget {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
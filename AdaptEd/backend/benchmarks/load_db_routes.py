@@ -0,0 +1,142 @@
+"""
+Нагрузочный прогон эндпоинтов тестов/ДЗ в разных режимах работы с БД:
+- legacy: синхронная сессия, SQLite с NullPool и настройками по умолчанию (SQLITE_PROFILE=legacy)
+- sync: синхронная сессия в threadpool, SQLite с пулом, WAL и PRAGMA-настройками
+- async: AsyncSession (DB_ASYNC=1)
+
+Запуск из папки backend:
+    python benchmarks/load_db_routes.py --requests 2000 --concurrency 50
+
+Каждый режим выполняется в отдельном процессе (настройки читаются при создании engine),
+приложение обслуживает запросы in-process через httpx.ASGITransport, так что сеть не влияет на цифры.
+Для режима async нужен aiosqlite (pip install aiosqlite).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# (метод, путь, тело); одна запись на пять чтений
+ENDPOINTS = [
+	("GET", "/tests?limit=50", None),
+	("GET", "/tests/1", None),
+	("GET", "/homeworks?user_id=student_001", None),
+	("GET", "/homeworks/1/submissions", None),
+	("GET", "/tests?topic=topic_3", None),
+	("POST", "/homeworks", {"title": "Повторение", "assigned_to": "student_002"}),
+]
+
+MODES = {
+	"legacy": {"DB_ASYNC": "0", "SQLITE_PROFILE": "legacy"},
+	"sync": {"DB_ASYNC": "0", "SQLITE_PROFILE": "tuned"},
+	"async": {"DB_ASYNC": "1", "SQLITE_PROFILE": "tuned"},
+}
+
+
+def _seed(db_url: str, tests: int, students: int):
+	"""Заполняет БД синтетическими тестами и ДЗ"""
+	from utils import db as db_module
+	from models.test import Test, TestQuestion
+	from models.homework import HomeworkTemplate, Homework
+
+	db_module.init_db()
+	sess = db_module.get_db()
+	try:
+		for i in range(tests):
+			test = Test(title=f"Тест {i}", topic=f"topic_{i % 10}", source="manual", creator_id="teacher_001")
+			test.questions = [
+				TestQuestion(question=f"{i} + {j} = ?", options=[str(i + j), "0", "1", "2"], correct_index=0)
+				for j in range(10)
+			]
+			sess.add(test)
+		template = HomeworkTemplate(title="Дроби", description="Решить задачи 1-10", subject="math")
+		sess.add_all([Homework(template=template, assigned_to=f"student_{s:03d}", status="new") for s in range(students)])
+		sess.commit()
+	finally:
+		sess.close()
+
+
+async def _drive(app, total: int, concurrency: int) -> dict:
+	import httpx
+
+	latencies = []
+	counter = iter(range(total))
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		async def worker():
+			for i in counter:
+				method, path, body = ENDPOINTS[i % len(ENDPOINTS)]
+				start = time.perf_counter()
+				resp = await client.request(method, path, json=body)
+				latencies.append(time.perf_counter() - start)
+				if resp.status_code != 200:
+					raise RuntimeError(f"{path} -> {resp.status_code}: {resp.text[:200]}")
+
+		started = time.perf_counter()
+		await asyncio.gather(*[worker() for _ in range(concurrency)])
+		elapsed = time.perf_counter() - started
+
+	latencies.sort()
+	return {
+		"requests": total,
+		"concurrency": concurrency,
+		"elapsed_s": round(elapsed, 3),
+		"rps": round(total / elapsed, 1),
+		"p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+		"p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+	}
+
+
+def run_single(args):
+	"""Один режим в текущем процессе; результат печатается JSON-строкой"""
+	sys.path.insert(0, BACKEND_DIR)
+	os.chdir(BACKEND_DIR)
+	_seed(os.environ["DATABASE_URL"], args.tests, args.students)
+	from app import app
+
+	result = asyncio.run(_drive(app, args.requests, args.concurrency))
+	result["mode"] = os.environ["BENCH_MODE"]
+	print(json.dumps(result))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--requests", type=int, default=2000)
+	parser.add_argument("--concurrency", type=int, default=50)
+	parser.add_argument("--tests", type=int, default=200)
+	parser.add_argument("--students", type=int, default=500)
+	parser.add_argument("--modes", default="legacy,sync,async")
+	parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.single:
+		run_single(args)
+		return
+
+	results = []
+	for mode in args.modes.split(","):
+		with tempfile.TemporaryDirectory() as tmp:
+			env = dict(os.environ)
+			env["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+			env.update(MODES[mode])
+			env["BENCH_MODE"] = mode
+			cmd = [sys.executable, os.path.abspath(__file__), "--single"] + sys.argv[1:]
+			out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+			lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+			if out.returncode != 0 or not lines:
+				print(f"[{mode}] failed:\n{out.stderr[-2000:]}")
+				continue
+			results.append(json.loads(lines[-1]))
+
+	for r in results:
+		print(f"{r['mode']:>6}: {r['rps']:>8} req/s  p50={r['p50_ms']}ms  p95={r['p95_ms']}ms  ({r['requests']} req, c={r['concurrency']})")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,188 @@
+"""
+Нагрузка на LLM-зависимые эндпоинты при работе через заглушку Ollama (benchmarks/fake_ollama.py).
+
+Запуск из папки backend:
+    python benchmarks/load_llm.py --duration 30 --concurrency 32 --latency lognormal:300:0.5 --tokens-per-sec 40
+    python benchmarks/load_llm.py --workers 4 --error-rate 0.05
+    python benchmarks/load_llm.py --base-url http://127.0.0.1:8000   # уже запущенный backend (с OLLAMA_URL на заглушку)
+
+Без --base-url скрипт сам поднимает заглушку и backend (run_backend_prod.py) с временной SQLite-базой.
+Смесь запросов (--mix): /assistant/chat, /tests/generate, /homeworks/{id}/submit. Для сдачи ДЗ
+заранее создаются задания через POST /homeworks. В конце — RPS, ошибки и p50/p95/p99 по каждому эндпоинту.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+LAUNCHER = os.path.join(os.path.dirname(BACKEND_DIR), "run_backend_prod.py")
+STUDENTS = 50
+
+
+def _free_port() -> int:
+	with socket.socket() as s:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+
+
+def _wait_ready(base_url: str, timeout: float = 60.0):
+	import httpx
+	deadline = time.time() + timeout
+	while time.time() < deadline:
+		try:
+			if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+				return
+		except Exception:
+			pass
+		time.sleep(0.3)
+	raise RuntimeError("backend did not start")
+
+
+def _percentile(values, q: float) -> float:
+	if not values:
+		return 0.0
+	values = sorted(values)
+	return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _seed_homeworks(client, count: int) -> list:
+	homeworks = []
+	for i in range(count):
+		user_id = f"load_{i % STUDENTS:03d}"
+		resp = await client.post("/homeworks", json={
+			"title": f"ДЗ {i}", "description": "Реши примеры на порядок действий", "subject": "математика",
+			"assigned_to": user_id, "created_by": "load_teacher",
+		})
+		resp.raise_for_status()
+		homeworks.append((resp.json()["id"], user_id))
+	return homeworks
+
+
+def _request_factory(kind: str, homeworks: list, rng: random.Random):
+	user_id = f"load_{rng.randrange(STUDENTS):03d}"
+	if kind == "chat":
+		return "/assistant/chat", "/assistant/chat", {
+			"messages": [{"role": "user", "content": "Объясни, как складывать дроби"}], "user_id": user_id,
+		}
+	if kind == "generate":
+		return "/tests/generate", "/tests/generate", {
+			"user_id": user_id, "topic": "порядок действий", "difficulty": "medium", "question_count": 5,
+		}
+	homework_id, owner = rng.choice(homeworks)
+	return "/homeworks/{id}/submit", f"/homeworks/{homework_id}/submit", {
+		"user_id": owner, "answer_text": "2 + 3 * 4 = 14",
+	}
+
+
+async def _drive(base_url: str, duration: float, concurrency: int, mix: dict, seed: int, timeout: float) -> dict:
+	import httpx
+
+	rng = random.Random(seed)
+	kinds = list(itertools.chain.from_iterable([kind] * weight for kind, weight in mix.items()))
+	latencies = {}
+	errors = {}
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+	async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+		homeworks = await _seed_homeworks(client, 200) if "submit" in mix else []
+		deadline = time.perf_counter() + duration
+
+		async def worker():
+			while time.perf_counter() < deadline:
+				name, path, body = _request_factory(rng.choice(kinds), homeworks, rng)
+				started = time.perf_counter()
+				try:
+					resp = await client.post(path, json=body)
+					ok = resp.status_code == 200
+				except httpx.HTTPError:
+					ok = False
+				elapsed = time.perf_counter() - started
+				if ok:
+					latencies.setdefault(name, []).append(elapsed)
+				else:
+					errors[name] = errors.get(name, 0) + 1
+
+		started = time.perf_counter()
+		await asyncio.gather(*[worker() for _ in range(concurrency)])
+		elapsed = time.perf_counter() - started
+	return {"elapsed": elapsed, "latencies": latencies, "errors": errors}
+
+
+def _report(result: dict):
+	total_ok = sum(len(v) for v in result["latencies"].values())
+	total_err = sum(result["errors"].values())
+	print(f"\n{total_ok + total_err} requests in {result['elapsed']:.1f}s: {total_ok / result['elapsed']:.1f} ok req/s, {total_err} errors")
+	print(f"{'endpoint':<26}{'ok':>7}{'err':>6}{'p50, ms':>10}{'p95, ms':>10}{'p99, ms':>10}")
+	for name in sorted(set(result["latencies"]) | set(result["errors"])):
+		values = result["latencies"].get(name, [])
+		print(
+			f"{name:<26}{len(values):>7}{result['errors'].get(name, 0):>6}"
+			f"{_percentile(values, 0.5) * 1000:>10.0f}{_percentile(values, 0.95) * 1000:>10.0f}{_percentile(values, 0.99) * 1000:>10.0f}"
+		)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--base-url", default=None, help="уже запущенный backend; без него поднимается свой")
+	parser.add_argument("--workers", type=int, default=1)
+	parser.add_argument("--duration", type=float, default=20.0)
+	parser.add_argument("--concurrency", type=int, default=32)
+	parser.add_argument("--mix", default="chat=4,generate=1,submit=3", help="веса видов запросов")
+	parser.add_argument("--timeout", type=float, default=180.0, help="таймаут клиента, с")
+	parser.add_argument("--seed", type=int, default=42)
+	# Параметры заглушки
+	parser.add_argument("--latency", default="lognormal:300:0.5")
+	parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+	parser.add_argument("--error-rate", type=float, default=0.0)
+	parser.add_argument("--hang-rate", type=float, default=0.0)
+	args = parser.parse_args()
+
+	mix = {k: int(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+
+	if args.base_url:
+		_report(asyncio.run(_drive(args.base_url, args.duration, args.concurrency, mix, args.seed, args.timeout)))
+		return
+
+	sys.path.insert(0, BENCH_DIR)
+	from fake_ollama import start_fake_ollama
+	fake, ollama_url = start_fake_ollama(
+		latency=args.latency, tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate,
+		error_codes=(500, 503), hang_rate=args.hang_rate,
+	)
+	port = _free_port()
+	base_url = f"http://127.0.0.1:{port}"
+	with tempfile.TemporaryDirectory() as tmp:
+		env = dict(os.environ)
+		env.update({
+			"OLLAMA_URL": ollama_url,
+			"ASSISTANT_PROVIDER": "ollama",
+			"DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'load.db')}",
+			"STATE_BACKEND": "sqlite",
+			"STATE_DB_PATH": os.path.join(tmp, "state.db"),
+			"LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+		})
+		proc = subprocess.Popen(
+			[sys.executable, LAUNCHER, "--workers", str(args.workers), "--port", str(port), "--host", "127.0.0.1"],
+			env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+		)
+		try:
+			_wait_ready(base_url)
+			print(f"backend: {args.workers} worker(s), fake Ollama: latency {args.latency} ms, {args.tokens_per_sec} tokens/s")
+			result = asyncio.run(_drive(base_url, args.duration, args.concurrency, mix, args.seed, args.timeout))
+		finally:
+			proc.terminate()
+			proc.wait(timeout=30)
+			fake.shutdown()
+	_report(result)
+	print(f"fake Ollama: {fake.stats}")
+
+
+if __name__ == "__main__":
+	main()
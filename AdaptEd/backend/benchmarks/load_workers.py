@@ -0,0 +1,123 @@
+"""
+Масштабирование не-LLM эндпоинтов по числу воркеров (run_backend_prod.py + общее SQLite-состояние).
+
+Запуск из папки backend:
+    python benchmarks/load_workers.py --workers 1,2,4 --requests 4000 --concurrency 64
+
+Для каждого числа воркеров поднимается отдельный сервер на свободном порту с чистым state.db,
+нагрузка идёт по HTTP. В конце проверяется согласованность: число попыток в профиле ученика
+должно совпасть с числом отправленных submit-task, через какой бы воркер они ни прошли.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LAUNCHER = os.path.join(os.path.dirname(BACKEND_DIR), "run_backend_prod.py")
+STUDENTS = 50
+
+
+def _request_for(i: int):
+	user_id = f"bench_{i % STUDENTS:03d}"
+	kind = i % 4
+	if kind == 0:
+		return "GET", "/tasks?difficulty=intermediate", None
+	if kind == 1:
+		return "POST", "/agents/submit-task", {
+			"user_id": user_id, "task_id": i, "question": "24 / 4 + 3", "user_answer": 9 if i % 3 else 8, "correct_answer": 9,
+		}
+	if kind == 2:
+		return "GET", f"/agents/dashboard/{user_id}", None
+	return "POST", "/agents/generate-tasks", {"user_id": user_id, "topic": "mixed", "count": 3}
+
+
+def _free_port() -> int:
+	with socket.socket() as s:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+
+
+def _wait_ready(port: int, timeout: float = 60.0):
+	import httpx
+	deadline = time.time() + timeout
+	while time.time() < deadline:
+		try:
+			if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+				return
+		except Exception:
+			pass
+		time.sleep(0.3)
+	raise RuntimeError("server did not start")
+
+
+async def _drive(port: int, total: int, concurrency: int) -> dict:
+	import httpx
+
+	counter = iter(range(total))
+	submitted = {}
+	errors = 0
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+	async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+		async def worker():
+			nonlocal errors
+			for i in counter:
+				method, path, body = _request_for(i)
+				resp = await client.request(method, path, json=body)
+				if resp.status_code != 200:
+					errors += 1
+				elif path == "/agents/submit-task":
+					submitted[body["user_id"]] = submitted.get(body["user_id"], 0) + 1
+
+		started = time.perf_counter()
+		await asyncio.gather(*[worker() for _ in range(concurrency)])
+		elapsed = time.perf_counter() - started
+
+		# Согласованность общего состояния между воркерами
+		mismatched = 0
+		for user_id, count in submitted.items():
+			dash = (await client.get(f"/agents/dashboard/{user_id}")).json()
+			if dash.get("profile", {}).get("total_tasks_completed") != count:
+				mismatched += 1
+
+	return {"rps": round(total / elapsed, 1), "elapsed_s": round(elapsed, 2), "errors": errors, "inconsistent_profiles": mismatched}
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--workers", default="1,2,4")
+	parser.add_argument("--requests", type=int, default=4000)
+	parser.add_argument("--concurrency", type=int, default=64)
+	args = parser.parse_args()
+
+	baseline = None
+	for workers in [int(w) for w in args.workers.split(",")]:
+		port = _free_port()
+		with tempfile.TemporaryDirectory() as tmp:
+			env = dict(os.environ)
+			env.pop("DATABASE_URL", None)
+			env.update({"STATE_BACKEND": "sqlite", "STATE_DB_PATH": os.path.join(tmp, "state.db")})
+			proc = subprocess.Popen(
+				[sys.executable, LAUNCHER, "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+				env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+			)
+			try:
+				_wait_ready(port)
+				result = asyncio.run(_drive(port, args.requests, args.concurrency))
+			finally:
+				proc.terminate()
+				proc.wait(timeout=30)
+		baseline = baseline or result["rps"]
+		print(
+			f"workers={workers}: {result['rps']:>8} req/s  x{result['rps'] / baseline:.2f}  "
+			f"errors={result['errors']}  inconsistent_profiles={result['inconsistent_profiles']}"
+		)
+	print(f"CPU cores: {os.cpu_count()} (масштабирование ограничено числом ядер)")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,484 @@
+"""
+Набор бенчмарков горячих путей backend с синтетическими данными и заглушкой Ollama.
+
+Запуск из папки backend:
+    python benchmarks/suite.py                              # все кейсы, результат в benchmarks/results/
+    python benchmarks/suite.py --quick --only login,submit  # маленькие объёмы, выбранные кейсы
+    python benchmarks/suite.py --compare benchmarks/results/baseline.json --threshold 0.2
+
+Всё выполняется в одном процессе во временной папке: своя SQLite-база, свой data.json,
+LLM — заглушка benchmarks/fake_ollama.py с задержкой --llm-latency-ms.
+Результат — JSON с медианой, p95 и min по каждому кейсу; --compare печатает отношение к базовому
+файлу и завершается с кодом 1, если какой-то кейс стал медленнее больше чем на --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+# (обычный объём, --quick)
+SIZES = {
+	"users": (20000, 2000),
+	"history": (2000, 200),
+	"documents": (5000, 500),
+	"storage_items": (20000, 2000),
+	"questions": (50, 10),
+	"class_size": (500, 50),
+	"students": (2000, 200),
+	"bank_tasks": (50000, 5000),
+	"review_items": (20000, 2000),
+}
+
+
+def _size(name: str, quick: bool) -> int:
+	return SIZES[name][1 if quick else 0]
+
+
+def _measure(fn, repeat: int, warmup: int = 1) -> dict:
+	for _ in range(warmup):
+		fn()
+	timings = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		fn()
+		timings.append(time.perf_counter() - started)
+	timings.sort()
+	median = statistics.median(timings)
+	return {
+		"repeat": repeat,
+		"min_ms": round(timings[0] * 1000, 3),
+		"median_ms": round(median * 1000, 3),
+		"p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000, 3),
+		"mean_ms": round(statistics.fmean(timings) * 1000, 3),
+		"ops_per_s": round(1 / median, 1) if median else None,
+	}
+
+
+# --- генераторы синтетических данных ---
+
+def _users(n: int, hash_password) -> dict:
+	password = hash_password("bench-password")
+	users = {}
+	for i in range(n):
+		user_id = f"student_{i:06d}"
+		users[user_id] = {
+			"user_id": user_id, "email": f"student{i}@bench.local", "password": password,
+			"full_name": f"Ученик {i}", "role": "student", "class_id": f"class_{i % 40}",
+			"is_active": True, "created_at": datetime.now().isoformat(),
+		}
+	return users
+
+
+BENCH_TOPICS = ("addition", "subtraction", "multiplication", "division")
+
+
+def _attempts(n: int, rng: random.Random):
+	from models.cognitive_profile import TaskAttempt, ErrorAnalysis, ErrorTag
+	tags = list(ErrorTag)
+	started = datetime.now() - timedelta(days=90)
+	attempts = []
+	for i in range(n):
+		a, b = rng.randint(2, 50), rng.randint(2, 50)
+		correct = rng.random() < 0.7
+		attempts.append(TaskAttempt(
+			task_id=i, question=f"{a} + {b}", topic=BENCH_TOPICS[i % len(BENCH_TOPICS)], user_answer=a + b if correct else a + b + rng.randint(1, 5),
+			correct_answer=a + b, is_correct=correct,
+			error_analysis=None if correct else ErrorAnalysis(error_type=rng.choice(tags), justification="synthetic"),
+			timestamp=started + timedelta(minutes=i),
+		))
+	return attempts
+
+
+def _profile(user_id: str, history: int, rng: random.Random):
+	from models.cognitive_profile import CognitiveProfile
+	attempts = _attempts(history, rng)
+	correct = sum(a.is_correct for a in attempts)
+	errors = {}
+	for a in attempts:
+		if a.error_analysis:
+			tag = a.error_analysis.error_type
+			errors[tag] = errors.get(tag, 0) + 1
+	return CognitiveProfile(
+		user_id=user_id, task_history=attempts, error_history=[a.error_analysis for a in attempts if a.error_analysis],
+		error_frequency=errors, total_tasks_completed=len(attempts), correct_tasks_count=correct,
+		accuracy_rate=100.0 * correct / max(1, len(attempts)), points=correct * 10, level=1 + correct // 100,
+	)
+
+
+def _text(rng: random.Random, words: int) -> str:
+	vocabulary = ["дробь", "уравнение", "сложение", "умножение", "деление", "процент", "площадь", "периметр",
+		"степень", "корень", "функция", "график", "задача", "ответ", "пример", "число", "угол", "треугольник"]
+	return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+# --- кейсы ---
+
+def bench_login(quick: bool, rng: random.Random) -> dict:
+	from utils.auth_service import auth_service
+	from utils.persistent_storage import persistent_storage
+	n = _size("users", quick)
+	users = _users(n, auth_service.hash_password)
+	users.update(persistent_storage.get("users", {}))
+	persistent_storage.set("users", users)
+	last_email = f"student{n - 1}@bench.local"
+
+	def run():
+		assert auth_service.authenticate_user(last_email, "bench-password")
+	return {"params": {"users": n}, **_measure(run, repeat=20 if quick else 50)}
+
+
+def bench_submit(quick: bool, rng: random.Random) -> dict:
+	from agents.orchestrator import get_orchestrator
+	orchestrator = get_orchestrator()
+	history = _size("history", quick)
+	orchestrator.profiler.save_profile(_profile("bench_long", history, rng))
+
+	def run():
+		a, b = rng.randint(2, 50), rng.randint(2, 50)
+		orchestrator.process_task_submission("bench_long", rng.randint(1, 10_000), f"{a} * {b}", a * b + 1, a * b)
+	return {"params": {"history": history}, **_measure(run, repeat=20 if quick else 50)}
+
+
+def bench_submit_batch(quick: bool, rng: random.Random) -> dict:
+	from agents.orchestrator import get_orchestrator
+	orchestrator = get_orchestrator()
+	students = 10 if quick else 50
+
+	def run():
+		batch = []
+		for _ in range(200):
+			a, b = rng.randint(2, 50), rng.randint(2, 50)
+			batch.append({
+				"user_id": f"batch_{rng.randrange(students)}", "task_id": rng.randint(1, 10_000), "question": f"{a} * {b}",
+				"user_answer": a * b + rng.choice((0, 0, 1)), "correct_answer": a * b, "topic": rng.choice(BENCH_TOPICS),
+			})
+		orchestrator.process_task_batch(batch)
+	return {"params": {"attempts_per_batch": 200, "students": students}, **_measure(run, repeat=5 if quick else 20)}
+
+
+def bench_retrieve_context(quick: bool, rng: random.Random) -> dict:
+	from models.document import Document
+	from services.assistant import get_assistant_service
+	from utils.db import get_db
+	n = _size("documents", quick)
+	sess = get_db()
+	try:
+		sess.add_all(Document(title=f"Документ {i}", content=_text(rng, 300)) for i in range(n))
+		sess.commit()
+	finally:
+		sess.close()
+	assistant = get_assistant_service()
+
+	def run():
+		assistant.retrieve_context("уравнение", top_k=3)
+	return {"params": {"documents": n, "words_per_document": 300}, **_measure(run, repeat=10 if quick else 20)}
+
+
+def bench_storage_set(quick: bool, rng: random.Random) -> dict:
+	from utils.persistent_storage import persistent_storage
+	n = _size("storage_items", quick)
+	history = {f"student_{i:06d}": [{"task_id": j, "ok": bool(j % 3)} for j in range(5)] for i in range(n)}
+
+	def run():
+		persistent_storage.set("task_history", history)
+	return {"params": {"items": n, "backend": os.getenv("STATE_BACKEND", "memory")}, **_measure(run, repeat=5 if quick else 10)}
+
+
+def bench_test_submission(quick: bool, rng: random.Random, client) -> dict:
+	from models.test import Test, TestQuestion
+	from utils.db import get_db
+	n = _size("questions", quick)
+	sess = get_db()
+	try:
+		test = Test(title="Бенчмарк", topic="арифметика", difficulty="medium", creator_id="bench")
+		test.questions = [
+			TestQuestion(question=f"Вопрос {i}: {_text(rng, 12)}", options=["1", "2", "3", "4"], correct_index=i % 4, explanation="-")
+			for i in range(n)
+		]
+		sess.add(test)
+		sess.commit()
+		test_id = test.id
+	finally:
+		sess.close()
+	answers = [rng.randint(0, 3) for _ in range(n)]
+
+	def run():
+		resp = client.post(f"/tests/{test_id}/submit", json={"user_id": "bench_student", "answers": answers})
+		assert resp.status_code == 200, resp.text
+	return {"params": {"questions": n, "includes_llm_feedback": True}, **_measure(run, repeat=10 if quick else 30)}
+
+
+def bench_teacher_report(quick: bool, rng: random.Random) -> dict:
+	from agents.orchestrator import get_orchestrator
+	agent = get_orchestrator().teacher_analytics
+	n = _size("class_size", quick)
+	students = [agent.analytics.summarize(_profile(f"class_student_{i}", 100, rng), "bench") for i in range(n)]
+
+	def run():
+		agent._generate_detailed_report(students)
+		agent._generate_struggling_students_report(students)
+	return {"params": {"students": n, "history_per_student": 100}, **_measure(run, repeat=10 if quick else 30)}
+
+
+def bench_teacher_report_cached(quick: bool, rng: random.Random) -> dict:
+	"""Повторный отчёт по неизменившемуся классу: проверка версии вида и готовый отчёт из кэша"""
+	from agents.orchestrator import get_orchestrator
+	orchestrator = get_orchestrator()
+	n = _size("class_size", quick)
+	profiles = [_profile(f"cached_class_student_{i}", 100, rng) for i in range(n)]
+	for profile in profiles:
+		orchestrator.profiler.save_profile(profile)
+	orchestrator.class_analytics.rebuild(profiles)
+	orchestrator.get_teacher_report(report_type="detailed")
+
+	def run():
+		orchestrator.class_analytics.validators(None, "detailed")
+		orchestrator.get_teacher_report(report_type="detailed")
+	return {"params": {"students": n, "history_per_student": 100}, **_measure(run, repeat=20 if quick else 100)}
+
+
+def bench_timeseries_query(quick: bool, rng: random.Random) -> dict:
+	"""Графики ученика и школы за всю историю: чтение счётчиков по корзинам и прореживание LTTB до 200 точек"""
+	from agents.orchestrator import get_orchestrator
+	orchestrator = get_orchestrator()
+	n, history = _size("class_size", quick), _size("history", quick)
+	profiles = [_profile(f"timeseries_student_{i}", history, rng) for i in range(n)]
+	orchestrator.time_series.rebuild(profiles)
+
+	def run():
+		orchestrator.get_time_series("student", profiles[0].user_id, points=200)
+		orchestrator.get_time_series("school", points=200)
+	return {"params": {"students": n, "history_per_student": history}, **_measure(run, repeat=20 if quick else 100)}
+
+
+def bench_batch_recompute(quick: bool, rng: random.Random) -> dict:
+	from agents.orchestrator import get_orchestrator
+	profiler = get_orchestrator().profiler
+	n = _size("students", quick)
+	user_ids = [f"batch_student_{i}" for i in range(n)]
+	for user_id in user_ids:
+		profiler.save_profile(_profile(user_id, 100, rng))
+
+	def run():
+		profiler.recompute_all(user_ids)
+	return {"params": {"students": n, "history_per_student": 100}, **_measure(run, repeat=5 if quick else 10)}
+
+
+def bench_error_retag(quick: bool, rng: random.Random) -> dict:
+	from agents.orchestrator import get_orchestrator
+	orchestrator = get_orchestrator()
+	n = _size("students", quick)
+	user_ids = [f"retag_student_{i}" for i in range(n)]
+	for user_id in user_ids:
+		orchestrator.profiler.save_profile(_profile(user_id, 100, rng))
+
+	def run():
+		orchestrator.retag_errors(user_ids, dry_run=True)
+	return {"params": {"students": n, "history_per_student": 100}, **_measure(run, repeat=5 if quick else 10)}
+
+
+def bench_mastery_refit(quick: bool, rng: random.Random) -> dict:
+	from services.mastery import get_mastery_engine
+	n = _size("class_size", quick)
+	profiles = [_profile(f"mastery_student_{i}", 100, rng) for i in range(n)]
+	engine = get_mastery_engine()
+
+	def run():
+		engine.refit(profiles, min_attempts=1000)
+	return {"params": {"students": n, "history_per_student": 100, "topics": len(BENCH_TOPICS)}, **_measure(run, repeat=3 if quick else 5)}
+
+
+def bench_task_sampling(quick: bool, rng: random.Random) -> dict:
+	from services.task_bank import LEVELS, BankTask, TaskBank
+	from models.cognitive_profile import ErrorTag
+	n = _size("bank_tasks", quick)
+	tags = [tag.value for tag in ErrorTag]
+	bank = TaskBank(
+		BankTask(
+			id=i, question=f"{i} + {i % 97}", answer=i + i % 97, category=rng.choice(BENCH_TOPICS),
+			level=rng.choice(LEVELS), error_tags=[rng.choice(tags)],
+		)
+		for i in range(n)
+	)
+
+	def run():
+		for i in range(100):
+			bank.sample(f"bench_student_{i}", rng.choice(BENCH_TOPICS), rng.choice(LEVELS), 5, [rng.choice(tags)], rng=rng)
+	return {"params": {"tasks": n, "samples_per_run": 100, "count": 5}, **_measure(run, repeat=20 if quick else 50)}
+
+
+def bench_task_generation(quick: bool, rng: random.Random) -> dict:
+	from services.arithmetic_generator import ArithmeticGenerator
+	per_pool = 20 if quick else 100
+	seeds = iter(range(10**6))
+
+	def run():
+		ArithmeticGenerator(next(seeds)).fill(per_pool)
+	return {"params": {"per_category_level": per_pool, "categories": 6, "levels": 3}, **_measure(run, repeat=10 if quick else 20)}
+
+
+def bench_review_queue(quick: bool, rng: random.Random) -> dict:
+	from services.review_scheduler import ReviewSchedule, ReviewScheduler
+	n = _size("review_items", quick)
+	scheduler = ReviewScheduler()
+	schedule = ReviewSchedule(user_id="bench_student")
+	started = datetime.now() - timedelta(days=60)
+	for i in range(n * 3):
+		scheduler._apply(schedule, rng.randrange(n), "addition", None, rng.choice((4, 4, 2, 1)), started + timedelta(minutes=i))
+		scheduler._compact(schedule)
+	scheduler.schedules["bench_student"] = schedule
+
+	def run():
+		scheduler.record("bench_student", rng.randrange(n), rng.random() < 0.7, topic="addition")
+		scheduler.queue("bench_student", limit=20)
+	return {"params": {"items": len(schedule.items), "limit": 20}, **_measure(run, repeat=50 if quick else 200)}
+
+
+def bench_assistant_chat(quick: bool, rng: random.Random, client) -> dict:
+	body = {"messages": [{"role": "user", "content": "Как решать уравнения с дробями?"}], "user_id": "bench_student"}
+
+	def run():
+		resp = client.post("/assistant/chat", json=body)
+		assert resp.status_code == 200, resp.text
+	return {"params": {"llm": "fake_ollama"}, **_measure(run, repeat=10 if quick else 30)}
+
+
+CASES = {
+	"login": bench_login,
+	"submit": bench_submit,
+	"submit_batch": bench_submit_batch,
+	"retrieve_context": bench_retrieve_context,
+	"storage_set": bench_storage_set,
+	"test_submission": bench_test_submission,
+	"teacher_report": bench_teacher_report,
+	"teacher_report_cached": bench_teacher_report_cached,
+	"timeseries_query": bench_timeseries_query,
+	"batch_recompute": bench_batch_recompute,
+	"error_retag": bench_error_retag,
+	"mastery_refit": bench_mastery_refit,
+	"task_sampling": bench_task_sampling,
+	"task_generation": bench_task_generation,
+	"review_queue": bench_review_queue,
+	"assistant_chat": bench_assistant_chat,
+}
+NEEDS_CLIENT = {"test_submission", "assistant_chat"}
+
+
+def _git_revision() -> str:
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+	except Exception:
+		return ""
+
+
+def _compare(results: dict, baseline_path: str, threshold: float) -> bool:
+	with open(baseline_path, encoding="utf-8") as f:
+		baseline = json.load(f)["results"]
+	ok = True
+	print(f"\n{'case':<20}{'baseline, ms':>14}{'now, ms':>12}{'ratio':>8}")
+	for name, result in results.items():
+		base = baseline.get(name)
+		if not base:
+			continue
+		ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+		flag = "  REGRESSION" if ratio > 1 + threshold else ""
+		ok = ok and not flag
+		print(f"{name:<20}{base['median_ms']:>14.3f}{result['median_ms']:>12.3f}{ratio:>8.2f}{flag}")
+	return ok
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--only", default="", help="кейсы через запятую: " + ",".join(CASES))
+	parser.add_argument("--quick", action="store_true", help="маленькие объёмы данных")
+	parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+	parser.add_argument("--seed", type=int, default=42)
+	parser.add_argument("--out", default=None, help="путь к JSON (по умолчанию benchmarks/results/<время>.json)")
+	parser.add_argument("--compare", default=None, help="базовый JSON для сравнения")
+	parser.add_argument("--threshold", type=float, default=0.2, help="допустимое замедление медианы, доля")
+	args = parser.parse_args()
+
+	selected = [c.strip() for c in args.only.split(",") if c.strip()] or list(CASES)
+	unknown = set(selected) - set(CASES)
+	if unknown:
+		parser.error(f"неизвестные кейсы: {', '.join(sorted(unknown))}")
+
+	# Пути из аргументов — относительно текущей папки, до перехода во временную
+	out = os.path.abspath(args.out) if args.out else os.path.join(BENCH_DIR, "results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+	baseline = os.path.abspath(args.compare) if args.compare else None
+
+	sys.path.insert(0, BENCH_DIR)
+	sys.path.insert(0, BACKEND_DIR)
+	from fake_ollama import start_fake_ollama
+	server, ollama_url = start_fake_ollama(latency_ms=args.llm_latency_ms)
+
+	workdir = tempfile.mkdtemp(prefix="adapted-bench-")
+	os.chdir(workdir)  # data.json и прочие файлы — во временной папке
+	os.environ.update({
+		"DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+		"ASSISTANT_PROVIDER": "ollama",
+		"OLLAMA_URL": ollama_url,
+		"LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+	})
+	os.environ.setdefault("STATE_BACKEND", "memory")
+
+	from utils.logger import setup_logging
+	from utils.db import init_db
+	from utils.persistent_storage import persistent_storage
+	# data.json по умолчанию лежит рядом с кодом — бенчмарк не должен трогать рабочие данные
+	persistent_storage.data_file = os.path.join(workdir, "data.json")
+	setup_logging()
+	init_db()
+
+	client = None
+	if NEEDS_CLIENT & set(selected):
+		from fastapi.testclient import TestClient
+		import app as app_module
+		client = TestClient(app_module.app)
+
+	results = {}
+	for name in selected:
+		rng = random.Random(args.seed)
+		fn = CASES[name]
+		result = fn(args.quick, rng, client) if name in NEEDS_CLIENT else fn(args.quick, rng)
+		results[name] = result
+		print(f"{name:<20} median {result['median_ms']:>10.3f} ms   p95 {result['p95_ms']:>10.3f} ms   {result['params']}")
+	server.shutdown()
+	os.chdir(BACKEND_DIR)
+	shutil.rmtree(workdir, ignore_errors=True)
+
+	report = {
+		"meta": {
+			"timestamp": datetime.now().isoformat(timespec="seconds"),
+			"git_revision": _git_revision(),
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"cpu_count": os.cpu_count(),
+			"quick": args.quick,
+			"llm_latency_ms": args.llm_latency_ms,
+			"seed": args.seed,
+		},
+		"results": results,
+	}
+	os.makedirs(os.path.dirname(out), exist_ok=True)
+	with open(out, "w", encoding="utf-8") as f:
+		json.dump(report, f, ensure_ascii=False, indent=2)
+	print(f"\nРезультаты: {out}")
+
+	if baseline and not _compare(results, baseline, args.threshold):
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,19 @@
+"""
+Конфигурация gunicorn для production-запуска (см. run_backend_prod.py):
+    gunicorn app:app -c gunicorn.conf.py
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+# LLM-запросы могут идти долго (таймаут Ollama — 120 с)
+timeout = 180
+graceful_timeout = 30
+keepalive = 5
+accesslog = None
+
+# Воркеры должны видеть общее состояние
+raw_env = [
+	f"STATE_BACKEND={os.getenv('STATE_BACKEND', 'sqlite')}",
+]
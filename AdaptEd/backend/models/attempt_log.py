@@ -0,0 +1,595 @@
+"""
+Компактное хранение истории попыток и ошибок ученика.
+
+CognitiveProfile.task_history и error_history — не списки pydantic-моделей, а колонки (растущие
+numpy-массивы) на профиль: номера интернированных строк вместо текста вопросов, тем и обоснований,
+тип ошибки — маленькое целое, время — микросекунды в int64. Одна попытка занимает ~60 байт вместо
+~1 КБ у TaskAttempt.
+
+Модели TaskAttempt / ErrorAnalysis создаются только на границе API: при чтении элемента или среза
+(history[-10:]), итерации и сериализации профиля (.dict()). Это копии — изменение такой модели
+не меняет историю; новая запись добавляется через append(). Статистика (точность, скользящие окна,
+тренд, ошибки и темы) считается векторно по колонкам — методами AttemptLog и batch_statistics()
+для всех учеников сразу.
+
+Пулы строк общие для процесса и ограничены (QUESTION_POOL_LIMIT, TOPIC_POOL_LIMIT, TEXT_POOL_LIMIT —
+по умолчанию 100 000 / 10 000 / 10 000 строк, ~200 байт на строку): вопросы банка заданий, его
+категории и шаблоны анализатора ошибок закрепляются в пуле вне лимита, остальное интернируется, пока
+лимит не исчерпан. Строка, не попавшая в пул, хранится в журнале (номер INLINE, текст в _wide) —
+так присланные клиентами вопросы не растят память процесса бесконечно.
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+# Номер строки, не попавшей в пул: текст лежит в _wide журнала
+INLINE = -2
+
+
+class StringPool:
+    """
+    Таблица интернирования: каждая строка хранится один раз, в колонках — её номер (-1 — None).
+    Незакреплённых строк — не больше limit; сверх лимита intern() возвращает INLINE.
+    """
+
+    __slots__ = ("_ids", "_values", "_lock", "limit", "_unpinned")
+
+    def __init__(self, limit: int):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+        self.limit = limit
+        self._unpinned = 0
+
+    def intern(self, value: Optional[str], pin: bool = False) -> int:
+        """Номер строки; pin=True — строка из справочника (банк заданий, шаблоны), добавляется вне лимита"""
+        if value is None:
+            return -1
+        idx = self._ids.get(value)
+        if idx is None:
+            with self._lock:
+                idx = self._ids.get(value)
+                if idx is None:
+                    if not pin and self._unpinned >= self.limit:
+                        return INLINE
+                    self._unpinned += not pin
+                    idx = len(self._values)
+                    self._values.append(value)
+                    self._ids[value] = idx
+        return idx
+
+    def get(self, idx: int) -> Optional[str]:
+        return None if idx < 0 else self._values[idx]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+# Общие для процесса пулы: тексты вопросов, темы и обоснования/рекомендации анализатора ошибок
+# (последних — несколько десятков шаблонов на всю систему)
+QUESTIONS = StringPool(int(os.getenv("QUESTION_POOL_LIMIT", "100000") or 0))
+TOPICS = StringPool(int(os.getenv("TOPIC_POOL_LIMIT", "10000") or 0))
+TEXTS = StringPool(int(os.getenv("TEXT_POOL_LIMIT", "10000") or 0))
+# Строковые колонки журналов -> их пул
+_POOLS = {"question": QUESTIONS, "topic": TOPICS, "justification": TEXTS, "remediation": TEXTS}
+
+_error_tags: Optional[tuple] = None
+_error_codes: Optional[Dict[str, int]] = None
+
+
+def _models():
+    # Ленивый импорт: cognitive_profile импортирует этот модуль при объявлении CognitiveProfile
+    from models.cognitive_profile import ErrorAnalysis, ErrorTag, TaskAttempt
+    return TaskAttempt, ErrorAnalysis, ErrorTag
+
+
+def error_code(error_type: Any) -> int:
+    """ErrorTag или его значение -> код 1..N (0 — ошибки нет)"""
+    global _error_tags, _error_codes
+    if _error_codes is None:
+        _error_tags = tuple(_models()[2])
+        _error_codes = {tag.value: code for code, tag in enumerate(_error_tags, start=1)}
+    if error_type is None:
+        return 0
+    return _error_codes[getattr(error_type, "value", error_type)]
+
+
+def error_tag(code: int):
+    """Код из error_code() -> ErrorTag (None для 0)"""
+    if _error_tags is None:
+        error_code(None)
+    return _error_tags[code - 1] if code > 0 else None
+
+
+class Column:
+    """
+    Растущий numpy-массив: амортизированное O(1) добавление, values — view на заполненную часть.
+    Минимальное значение типа означает None, следующее — "не влезло в тип" (значение в _wide журнала).
+    """
+
+    __slots__ = ("data", "size", "null", "wide")
+
+    def __init__(self, dtype: Any, capacity: int = 16):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+        self.null = int(np.iinfo(self.data.dtype).min)
+        self.wide = self.null + 1
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    def append(self, value: int):
+        if self.size == len(self.data):
+            grown = np.empty(max(16, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size] = value  # OverflowError до увеличения size — колонка остаётся целой
+        self.size += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, idx: int) -> int:
+        if idx < 0:
+            idx += self.size
+        if not 0 <= idx < self.size:
+            raise IndexError("column index out of range")
+        return int(self.data[idx])
+
+    def __getstate__(self):
+        return self.values.copy()
+
+    def __setstate__(self, values: np.ndarray):
+        self.data = values
+        self.size = len(values)
+        self.null = int(np.iinfo(values.dtype).min)
+        self.wide = self.null + 1
+
+
+class _ColumnarLog(ABC):
+    """
+    Общая часть колоночных журналов: колонки Column, последовательность моделей на чтение,
+    pydantic-схема (список моделей на входе и выходе).
+    """
+
+    __slots__ = ("_wide",)
+    # (имя колонки, dtype)
+    _COLUMNS: Tuple[Tuple[str, Any], ...] = ()
+
+    def __init__(self, records: Iterable[Any] = ()):
+        for name, dtype in self._COLUMNS:
+            setattr(self, name, Column(dtype))
+        # Значения, не поместившиеся в колонку (например, ответ > 2**63) или в пул строк:
+        # (колонка, строка) -> значение
+        self._wide: Dict[Tuple[str, int], Any] = {}
+        for record in records:
+            self.append(record)
+
+    # --- запись / чтение колонок ---
+
+    def _put(self, name: str, value: Optional[int]):
+        column = getattr(self, name)
+        if value is None:
+            column.append(column.null)
+            return
+        try:
+            column.append(value)
+        except OverflowError:
+            self._wide[(name, len(column))] = value
+            column.append(column.wide)
+
+    def _get(self, name: str, idx: int) -> Optional[int]:
+        column = getattr(self, name)
+        value = column[idx]
+        if value == column.null:
+            return None
+        if value == column.wide:
+            return self._wide.get((name, idx), value)
+        return value
+
+    def _list(self, name: str) -> List[Optional[int]]:
+        """Колонка целиком как список Python-значений (None и большие числа восстановлены)"""
+        column = getattr(self, name)
+        values = column.values.tolist()
+        if len(values) and column.values.min() <= column.wide:
+            values = [
+                None if v == column.null else self._wide.get((name, i), v) if v == column.wide else v
+                for i, v in enumerate(values)
+            ]
+        return values
+
+    def _put_text(self, name: str, value: Optional[str]):
+        column = getattr(self, name)
+        idx = _POOLS[name].intern(value)
+        if idx == INLINE:
+            self._wide[(name, len(column))] = value
+        column.append(idx)
+
+    def _text(self, name: str, idx: int) -> Optional[str]:
+        value = getattr(self, name)[idx]
+        return self._wide[(name, idx)] if value == INLINE else _POOLS[name].get(value)
+
+    def texts(self, name: str) -> List[Optional[str]]:
+        """Строковая колонка (question, topic, justification, remediation) целиком как список текстов"""
+        pool = _POOLS[name]
+        return [
+            self._wide[(name, i)] if v == INLINE else pool.get(v)
+            for i, v in enumerate(getattr(self, name).values.tolist())
+        ]
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Колонка целиком (view, только для чтения) — для векторных агрегатов без создания моделей.
+        В строковых колонках — номера пула (INLINE — текст в журнале; см. text_codes())
+        """
+        return getattr(self, name).values
+
+    # --- интерфейс последовательности ---
+
+    @abstractmethod
+    def append(self, record: Any):
+        pass
+
+    @abstractmethod
+    def _record(self, idx: int) -> Any:
+        pass
+
+    @abstractmethod
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Список словарей в формате model.dict() — то, что уходит в ответ API и в хранилище"""
+
+    def __len__(self) -> int:
+        return len(getattr(self, self._COLUMNS[0][0]))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._record(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"{type(self).__name__} index out of range")
+        return self._record(idx)
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, type(self)):
+            return self.to_dicts() == other.to_dicts()
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} len={len(self)}>"
+
+    def nbytes(self) -> int:
+        """Объём заполненной части колонок в байтах (без общих пулов строк и запаса ёмкости)"""
+        return sum(getattr(self, name).values.nbytes for name, _ in self._COLUMNS)
+
+    # --- граница API ---
+
+    @classmethod
+    @abstractmethod
+    def _model(cls):
+        pass
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any):
+        from pydantic_core import core_schema
+        from_list = core_schema.no_info_after_validator_function(
+            cls, core_schema.list_schema(handler.generate_schema(cls._model())),
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_list,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_list]),
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda log: log.to_dicts()),
+        )
+
+
+def _put_error(log: _ColumnarLog, analysis: Any):
+    if analysis is None:
+        log.error_type.append(0)
+        log.justification.append(-1)
+        log.remediation.append(-1)
+        log.similar_errors_count.append(0)
+        return
+    log.error_type.append(error_code(analysis.error_type))
+    log._put_text("justification", analysis.justification)
+    log._put_text("remediation", analysis.suggested_remediation)
+    log._put("similar_errors_count", analysis.similar_errors_count)
+
+
+def _error_dict(code: int, justification: Optional[str], remediation: Optional[str], similar: Optional[int]) -> Dict[str, Any]:
+    return {
+        "error_type": error_tag(code),
+        "justification": justification,
+        "similar_errors_count": similar,
+        "suggested_remediation": remediation,
+    }
+
+
+def _error_dicts(log: _ColumnarLog) -> List[Optional[Dict[str, Any]]]:
+    return [
+        _error_dict(code, justification, remediation, similar) if code else None
+        for code, justification, remediation, similar in zip(
+            log.error_type.values.tolist(), log.texts("justification"),
+            log.texts("remediation"), log._list("similar_errors_count"),
+        )
+    ]
+
+
+def _error_at(log: _ColumnarLog, idx: int) -> Optional[Dict[str, Any]]:
+    code = log.error_type[idx]
+    if not code:
+        return None
+    return _error_dict(
+        code, log._text("justification", idx), log._text("remediation", idx), log._get("similar_errors_count", idx),
+    )
+
+
+class ErrorLog(_ColumnarLog):
+    """История ошибок (CognitiveProfile.error_history): тип, обоснование, рекомендация"""
+
+    __slots__ = ("error_type", "justification", "remediation", "similar_errors_count")
+    _COLUMNS = (("error_type", np.int8), ("justification", np.int32), ("remediation", np.int32), ("similar_errors_count", np.int32))
+
+    @classmethod
+    def _model(cls):
+        return _models()[1]
+
+    def append(self, record: Any):
+        _put_error(self, record)
+
+    def _record(self, idx: int):
+        return self._model().model_construct(**_error_at(self, idx))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return _error_dicts(self)
+
+    @classmethod
+    def from_attempts(cls, attempts: "AttemptLog") -> "ErrorLog":
+        """История ошибок по error_analysis попыток (в порядке попыток) — после переразметки"""
+        has_error = attempts.error_type.values != 0
+        log = cls()
+        for name, _ in cls._COLUMNS:
+            getattr(log, name).__setstate__(getattr(attempts, name).values[has_error])
+        rows = np.flatnonzero(has_error).tolist()
+        log._wide = {
+            (name, i): attempts._wide[(name, row)]
+            for name in ("justification", "remediation", "similar_errors_count")
+            for i, row in enumerate(rows) if (name, row) in attempts._wide
+        }
+        return log
+
+
+class AttemptLog(_ColumnarLog):
+    """История попыток (CognitiveProfile.task_history)"""
+
+    __slots__ = (
+        "task_id", "question", "topic", "user_answer", "correct_answer", "is_correct", "time_spent_seconds",
+        "attempts_count", "timestamp", "error_type", "justification", "remediation", "similar_errors_count",
+    )
+    _COLUMNS = (
+        ("task_id", np.int64), ("question", np.int32), ("topic", np.int32), ("user_answer", np.int64),
+        ("correct_answer", np.int64), ("is_correct", np.int8), ("time_spent_seconds", np.int32),
+        ("attempts_count", np.int32), ("timestamp", np.int64),
+        # error_analysis попытки; error_type = 0 — анализа нет
+        ("error_type", np.int8), ("justification", np.int32), ("remediation", np.int32), ("similar_errors_count", np.int32),
+    )
+    _INT_FIELDS = ("task_id", "user_answer", "correct_answer", "time_spent_seconds", "attempts_count")
+
+    @classmethod
+    def _model(cls):
+        return _models()[0]
+
+    def append(self, record: Any):
+        self._put("task_id", record.task_id)
+        self._put_text("question", record.question)
+        self._put_text("topic", record.topic)
+        self._put("user_answer", record.user_answer)
+        self._put("correct_answer", record.correct_answer)
+        self.is_correct.append(1 if record.is_correct else 0)
+        self._put("time_spent_seconds", record.time_spent_seconds)
+        self._put("attempts_count", record.attempts_count)
+        timestamp = record.timestamp
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        self.timestamp.append((timestamp - _EPOCH) // _MICROSECOND)
+        _put_error(self, record.error_analysis)
+
+    def _record_dict(self, idx: int) -> Dict[str, Any]:
+        return {
+            "task_id": self._get("task_id", idx),
+            "question": self._text("question", idx),
+            "topic": self._text("topic", idx),
+            "user_answer": self._get("user_answer", idx),
+            "correct_answer": self._get("correct_answer", idx),
+            "is_correct": bool(self.is_correct[idx]),
+            "time_spent_seconds": self._get("time_spent_seconds", idx),
+            "attempts_count": self._get("attempts_count", idx),
+            "error_analysis": _error_at(self, idx),
+            "timestamp": _EPOCH + self.timestamp[idx] * _MICROSECOND,
+        }
+
+    def _record(self, idx: int):
+        TaskAttempt, ErrorAnalysis, _ = _models()
+        fields = self._record_dict(idx)
+        if fields["error_analysis"] is not None:
+            fields["error_analysis"] = ErrorAnalysis.model_construct(**fields["error_analysis"])
+        return TaskAttempt.model_construct(**fields)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        columns = {name: self._list(name) for name in self._INT_FIELDS}
+        questions = self.texts("question")
+        topics = self.texts("topic")
+        errors = _error_dicts(self)
+        timestamps = self.timestamp.values.tolist()
+        is_correct = self.is_correct.values.tolist()
+        return [
+            {
+                "task_id": columns["task_id"][i],
+                "question": questions[i],
+                "topic": topics[i],
+                "user_answer": columns["user_answer"][i],
+                "correct_answer": columns["correct_answer"][i],
+                "is_correct": bool(is_correct[i]),
+                "time_spent_seconds": columns["time_spent_seconds"][i],
+                "attempts_count": columns["attempts_count"][i],
+                "error_analysis": errors[i],
+                "timestamp": _EPOCH + timestamps[i] * _MICROSECOND,
+            }
+            for i in range(len(self))
+        ]
+
+    def task_ids(self) -> List[Optional[int]]:
+        return self._list("task_id")
+
+    def timestamps(self) -> List[datetime]:
+        return [_EPOCH + value * _MICROSECOND for value in self.timestamp.values.tolist()]
+
+    def set_errors(self, error_type: np.ndarray, justification: np.ndarray, remediation: np.ndarray):
+        """
+        Перезаписывает анализ ошибок всех попыток (переразметка): коды error_code(), номера TEXTS
+        обоснований и рекомендаций (закреплённые, без INLINE); error_type = 0 — анализа нет.
+        similar_errors_count не меняется.
+        """
+        if not len(error_type) == len(justification) == len(remediation) == len(self):
+            raise ValueError("error columns must match the log length")
+        if (justification == INLINE).any() or (remediation == INLINE).any():
+            raise ValueError("error texts must be interned in TEXTS")
+        self._wide = {key: value for key, value in self._wide.items() if key[0] not in ("justification", "remediation")}
+        self.error_type.values[:] = error_type
+        self.justification.values[:] = justification
+        self.remediation.values[:] = remediation
+
+    # --- векторные агрегаты по колонкам ---
+
+    def correct_count(self, last: Optional[int] = None) -> int:
+        """Число верных ответов во всей истории или в последних last попытках"""
+        values = self.is_correct.values
+        if last is not None:
+            values = values[len(values) - min(max(last, 0), len(values)):]
+        return int(np.count_nonzero(values))
+
+    def accuracy(self, last: Optional[int] = None) -> float:
+        """Доля верных ответов (0..1) во всей истории или в последних last попытках; 0 для пустой"""
+        total = len(self) if last is None else min(max(last, 0), len(self))
+        return self.correct_count(last) / total if total else 0.0
+
+    def rolling_accuracy(self, window: int) -> np.ndarray:
+        """Точность в скользящем окне: элемент i — доля верных среди попыток i..i+window-1"""
+        values = self.is_correct.values
+        if window <= 0 or len(values) < window:
+            return np.empty(0)
+        cumsum = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        return (cumsum[window:] - cumsum[:-window]) / window
+
+    def accuracy_trend(self, window: int = 10) -> float:
+        """Изменение точности: последние window попыток против предыдущих window (0, если истории мало)"""
+        values = self.is_correct.values
+        if len(values) < 2 * window or window <= 0:
+            return 0.0
+        return float(values[-window:].mean() - values[-2 * window:-window].mean())
+
+    def mean_time_spent(self, last: Optional[int] = None) -> Optional[float]:
+        """Среднее время на задание, с (попытки без времени не учитываются); None, если данных нет"""
+        values = self.time_spent_seconds.values
+        if last is not None:
+            values = values[len(values) - min(max(last, 0), len(values)):]
+        values = values[values > self.time_spent_seconds.wide]
+        return float(values.mean()) if len(values) else None
+
+    def error_counts(self) -> Dict[str, int]:
+        """Число попыток с анализом ошибки по типам: {"logic_gap": 3, ...}"""
+        counts = np.bincount(self.error_type.values, minlength=1)
+        return {error_tag(code).value: int(n) for code, n in enumerate(counts) if code and n}
+
+    def topic_accuracy(self) -> Dict[str, Dict[str, float]]:
+        """Попытки и точность по темам: {"дроби": {"attempts": 12, "accuracy": 0.75}}"""
+        topics, topic_text = text_codes([self], "topic")
+        known = topics != -1
+        if not known.any():
+            return {}
+        ids, inverse = np.unique(topics[known], return_inverse=True)
+        attempts = np.bincount(inverse)
+        correct = np.bincount(inverse, weights=self.is_correct.values[known])
+        return {
+            topic_text(int(topic_id)): {"attempts": int(n), "accuracy": float(c / n)}
+            for topic_id, n, c in zip(ids, attempts, correct)
+        }
+
+
+def text_codes(logs: Sequence[_ColumnarLog], name: str) -> Tuple[np.ndarray, Callable[[int], Optional[str]]]:
+    """
+    Строковая колонка name журналов logs подряд (int64) и функция код -> текст — для группировки
+    по вопросам или темам. Коды >= 0 — номера пула, -1 — None; строкам вне пула выдаются коды
+    < -1, общие для одинакового текста в пределах вызова.
+    """
+    codes = np.concatenate([log.column(name) for log in logs] or [np.empty(0, np.int32)]).astype(np.int64)
+    inline: Dict[str, int] = {}
+    offset = 0
+    for log in logs:
+        for (column, row), text in log._wide.items():
+            if column == name:
+                codes[offset + row] = -2 - inline.setdefault(text, len(inline))
+        offset += len(log)
+    texts = list(inline)
+    pool = _POOLS[name]
+
+    def text(code: int) -> Optional[str]:
+        return texts[-2 - code] if code < -1 else pool.get(code)
+    return codes, text
+
+
+def batch_statistics(logs: Sequence[AttemptLog], windows: Sequence[int] = (5, 10)) -> Dict[str, np.ndarray]:
+    """
+    Статистика сразу по многим ученикам: колонки всех журналов склеиваются, агрегаты — bincount
+    по номеру ученика. Массивы в результате выровнены с порядком logs:
+    total, correct, accuracy, accuracy_last_<w> для каждого окна, trend (последние max(windows)
+    попыток против предыдущих), mean_time_spent (NaN — нет данных), last_timestamp (мкс, -1 — нет попыток).
+    """
+    count = len(logs)
+    lengths = np.fromiter((len(log) for log in logs), dtype=np.int64, count=count)
+    owner = np.repeat(np.arange(count), lengths)
+    is_correct = np.concatenate([log.is_correct.values for log in logs] or [np.empty(0, np.int8)]).astype(np.float64)
+    # Позиция попытки от конца истории своего ученика: 0 — последняя
+    from_end = np.repeat(np.cumsum(lengths), lengths) - np.arange(len(owner)) - 1
+
+    def per_student(mask: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        return np.bincount(owner[mask], weights=weights[mask], minlength=count)
+
+    def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        return np.divide(numerator, denominator, out=np.zeros(count), where=denominator > 0)
+
+    everything = np.ones(len(owner), dtype=bool)
+    correct = per_student(everything, is_correct)
+    result = {"total": lengths, "correct": correct.astype(np.int64), "accuracy": ratio(correct, lengths)}
+    for window in windows:
+        result[f"accuracy_last_{window}"] = ratio(per_student(from_end < window, is_correct), np.minimum(lengths, window))
+
+    window = max(windows)
+    recent = ratio(per_student(from_end < window, is_correct), np.full(count, window))
+    previous = ratio(per_student((from_end >= window) & (from_end < 2 * window), is_correct), np.full(count, window))
+    result["trend"] = np.where(lengths >= 2 * window, recent - previous, 0.0)
+
+    time_spent = np.concatenate([log.time_spent_seconds.values for log in logs] or [np.empty(0, np.int32)])
+    known = time_spent > np.iinfo(np.int32).min + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["mean_time_spent"] = per_student(known, time_spent.astype(np.float64)) / np.bincount(owner[known], minlength=count)
+
+    last = np.full(count, -1, dtype=np.int64)
+    filled = lengths > 0
+    last[filled] = [log.timestamp.values[-1] for log, has in zip(logs, filled) if has]
+    result["last_timestamp"] = last
+    return result
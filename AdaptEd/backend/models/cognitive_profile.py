@@ -6,6 +6,11 @@ from typing import List, Dict, Optional, Literal
 from datetime import datetime
 from enum import Enum
 
+from models.attempt_log import AttemptLog, ErrorLog
+
+# Очки за верный ответ (ProfilerAgent._update_motivation)
+POINTS_PER_CORRECT = 10
+
 
 class ErrorTag(str, Enum):
     """Типы ошибок ученика"""
@@ -54,6 +59,7 @@ class TaskAttempt(BaseModel):
     """Попытка выполнения задания"""
     task_id: int
     question: str
+    topic: Optional[str] = None
     user_answer: Optional[int]
     correct_answer: int
     is_correct: bool
@@ -63,15 +69,27 @@ class TaskAttempt(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
+class TopicMastery(BaseModel):
+    """Оценка освоения темы (BKT, см. services/mastery.py)"""
+    mastery: float  # вероятность, что тема освоена (0.0 - 1.0)
+    uncertainty: float  # стандартное отклонение этой оценки (0.0 - 0.5)
+    attempts: int = 0
+    correct: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
 class CognitiveProfile(BaseModel):
     """Полный когнитивный профиль ученика"""
     user_id: str
     
-    # Знания по темам (0.0 - 1.0)
+    # Знания по темам (0.0 - 1.0); для тем из попыток — оценка BKT из mastery
     topic_mastery: Dict[str, float] = Field(default_factory=dict)
     
-    # История ошибок
-    error_history: List[ErrorAnalysis] = Field(default_factory=list)
+    # Состояние оценки освоения по темам (services/mastery.py)
+    mastery: Dict[str, TopicMastery] = Field(default_factory=dict)
+    
+    # История ошибок (колонки, см. models/attempt_log.py; наружу — список ErrorAnalysis)
+    error_history: ErrorLog = Field(default_factory=ErrorLog)
     
     # Статистика ошибок по типам
     error_frequency: Dict[ErrorTag, int] = Field(default_factory=dict)
@@ -85,8 +103,8 @@ class CognitiveProfile(BaseModel):
     # Текущее эмоциональное состояние
     current_emotional_state: EmotionalState = EmotionalState.NEUTRAL
     
-    # История заданий
-    task_history: List[TaskAttempt] = Field(default_factory=list)
+    # История заданий (колонки, см. models/attempt_log.py; наружу — список TaskAttempt)
+    task_history: AttemptLog = Field(default_factory=AttemptLog)
     
     # Прогресс
     total_tasks_completed: int = 0
@@ -7,28 +7,55 @@ from sqlalchemy.orm import relationship
 from utils.db import Base
 
 
-class Homework(Base):  # type: ignore
-	__tablename__ = "homeworks"
+class HomeworkTemplate(Base):  # type: ignore
+	"""Общее содержание ДЗ: один шаблон на все назначения ученикам"""
+	__tablename__ = "homework_templates"
 
 	id = Column(Integer, primary_key=True, autoincrement=True)
 	title = Column(String(255), nullable=False)
 	description = Column(Text, nullable=True)
 	subject = Column(String(100), nullable=True)
+	created_by = Column(String(64), nullable=True)  # teacher_id
+	created_at = Column(DateTime, default=datetime.utcnow)
+
+	assignments = relationship("Homework", back_populates="template")
+
+
+class Homework(Base):  # type: ignore
+	"""Назначение шаблона ДЗ конкретному ученику"""
+	__tablename__ = "homeworks"
+
+	id = Column(Integer, primary_key=True, autoincrement=True)
+	template_id = Column(Integer, ForeignKey("homework_templates.id"), nullable=False, index=True)
 	due_date = Column(DateTime, nullable=True)
-	status = Column(String(50), default="new")  # new | in_progress | submitted | checked
-	assigned_to = Column(String(64), nullable=False)  # user_id ученика
+	status = Column(String(50), default="new", index=True)  # new | in_progress | submitted | checked
+	assigned_to = Column(String(64), nullable=False, index=True)  # user_id ученика
 	created_by = Column(String(64), nullable=True)  # teacher_id
 	created_at = Column(DateTime, default=datetime.utcnow)
 	updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+	template = relationship("HomeworkTemplate", back_populates="assignments")
 	submissions = relationship("HomeworkSubmission", back_populates="homework")
 
+	# Поля шаблона доступны как раньше (hw.title и т.п.) — для API и промптов
+	@property
+	def title(self) -> Optional[str]:
+		return self.template.title if self.template else None
+
+	@property
+	def description(self) -> Optional[str]:
+		return self.template.description if self.template else None
+
+	@property
+	def subject(self) -> Optional[str]:
+		return self.template.subject if self.template else None
+
 
 class HomeworkSubmission(Base):  # type: ignore
 	__tablename__ = "homework_submissions"
 
 	id = Column(Integer, primary_key=True, autoincrement=True)
-	homework_id = Column(Integer, ForeignKey("homeworks.id"), nullable=False)
+	homework_id = Column(Integer, ForeignKey("homeworks.id"), nullable=False, index=True)
 	user_id = Column(String(64), nullable=False)
 	answer_text = Column(Text, nullable=True)
 	feedback = Column(Text, nullable=True)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 
 from utils.db import Base
@@ -12,13 +12,14 @@ class Test(Base):  # type: ignore
 
 	id = Column(Integer, primary_key=True, autoincrement=True)
 	title = Column(String(255), nullable=False)
-	topic = Column(String(255), nullable=True)
+	topic = Column(String(255), nullable=True, index=True)
 	difficulty = Column(String(50), nullable=True)
 	source = Column(String(50), default="manual")  # manual | ai
-	creator_id = Column(String(64), nullable=True)
+	creator_id = Column(String(64), nullable=True, index=True)
 	created_at = Column(DateTime, default=datetime.utcnow)
 
-	questions = relationship("TestQuestion", back_populates="test", cascade="all, delete-orphan")
+	# Порядок вопросов важен: ответы при сдаче сопоставляются по позиции
+	questions = relationship("TestQuestion", back_populates="test", cascade="all, delete-orphan", order_by="TestQuestion.id")
 	submissions = relationship("TestSubmission", back_populates="test", cascade="all, delete-orphan")
 
 
@@ -26,7 +27,7 @@ class TestQuestion(Base):  # type: ignore
 	__tablename__ = "test_questions"
 
 	id = Column(Integer, primary_key=True, autoincrement=True)
-	test_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
+	test_id = Column(Integer, ForeignKey("tests.id"), nullable=False, index=True)
 	question = Column(Text, nullable=False)
 	options = Column(JSON, nullable=False)  # list of str
 	correct_index = Column(Integer, nullable=False)
@@ -37,6 +38,9 @@ class TestQuestion(Base):  # type: ignore
 
 class TestSubmission(Base):  # type: ignore
 	__tablename__ = "test_submissions"
+	__table_args__ = (
+		Index("ix_test_submissions_test_user", "test_id", "user_id"),
+	)
 
 	id = Column(Integer, primary_key=True, autoincrement=True)
 	test_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
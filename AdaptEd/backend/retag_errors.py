@@ -0,0 +1,47 @@
+"""
+Переразметка ошибок в истории попыток всех учеников текущими правилами ErrorAnalyzerAgent
+(векторная классификация classify_batch) и пересборка error_history / error_frequency.
+
+Запускать после изменения правил анализатора, из папки backend, с тем же хранилищем, что у сервера.
+Сервер на время прогона лучше остановить: профиль перезаписывается целиком, и ученики, отправившие
+задание во время прогона, пропускаются (skipped в выводе) — их доразметит повторный запуск.
+
+    STATE_BACKEND=sqlite STATE_DB_PATH=./state.db python retag_errors.py --dry-run
+    STATE_BACKEND=sqlite STATE_DB_PATH=./state.db python retag_errors.py
+
+После записи пересобираются расписания повторений переразмеченных учеников и аналитика классов.
+То же без консоли — POST /admin/retag-errors.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from dotenv import load_dotenv  # type: ignore
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+except ImportError:
+    pass
+
+from agents.orchestrator import get_orchestrator  # noqa: E402
+from utils.logger import setup_logging  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Переразметка ошибок в истории попыток")
+    parser.add_argument("--users", nargs="*", help="только эти ученики (по умолчанию все)")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать изменения, не сохранять")
+    parser.add_argument("--chunk", type=int, default=1000, help="профилей в одной пачке")
+    args = parser.parse_args()
+
+    setup_logging()
+    if os.getenv("STATE_BACKEND", "memory") == "memory":
+        print("STATE_BACKEND=memory: профили живут только в памяти сервера, переразмечать нечего.", file=sys.stderr)
+    result = get_orchestrator().retag_errors(args.users or None, dry_run=args.dry_run, chunk=args.chunk)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
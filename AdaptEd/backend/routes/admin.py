@@ -0,0 +1,103 @@
+"""
+Служебные маршруты администратора: профили медленных запросов (см. utils/profiling.py)
+и пакетный пересчёт профилей учеников, оценок освоения тем, разметки ошибок и аналитики классов
+"""
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from agents.orchestrator import get_orchestrator
+from routes.auth import require_admin
+from utils import profiling
+
+router = APIRouter()
+
+
+@router.get("/admin/profiles", response_model=Dict[str, Any])
+def list_request_profiles(limit: int = Query(50, ge=1, le=1000), _admin: dict = Depends(require_admin)):
+    """Список сохранённых профилей запросов, новые первыми"""
+    profiles: List[Dict[str, Any]] = profiling.list_profiles()
+    return {
+        "enabled": profiling.PROFILING,
+        "sample_rate": profiling.PROFILE_SAMPLE_RATE,
+        "slow_ms": profiling.PROFILE_SLOW_MS,
+        "total": len(profiles),
+        "profiles": profiles[:limit],
+    }
+
+
+@router.get("/admin/profiles/{name}", response_class=PlainTextResponse)
+def get_request_profile(
+    name: str,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    limit: int = Query(40, ge=1, le=500),
+    _admin: dict = Depends(require_admin),
+):
+    """Текстовый отчёт pstats по профилю"""
+    summary = profiling.profile_summary(name, limit=limit, sort=sort)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
+
+
+@router.get("/admin/profiles/{name}/download")
+def download_request_profile(name: str, _admin: dict = Depends(require_admin)):
+    """Исходный .prof для snakeviz / python -m pstats"""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{name}.prof")
+
+
+@router.post("/admin/recompute-profiles", response_model=Dict[str, Any])
+def recompute_student_profiles(
+    user_ids: Optional[List[str]] = Query(None, description="только эти ученики; по умолчанию все"),
+    _admin: dict = Depends(require_admin),
+):
+    """Пересчитывает статистику, стиль обучения и эмоциональное состояние по истории попыток"""
+    return get_orchestrator().recompute_profiles(user_ids)
+
+
+@router.post("/admin/refit-mastery", response_model=Dict[str, Any])
+def refit_topic_mastery(
+    min_attempts: int = Query(200, ge=1, description="минимум попыток по теме для собственных параметров"),
+    _admin: dict = Depends(require_admin),
+):
+    """Подбирает параметры BKT по истории попыток и пересчитывает оценки освоения тем"""
+    return get_orchestrator().refit_mastery(min_attempts)
+
+
+@router.post("/admin/recompute-reviews", response_model=Dict[str, Any])
+def recompute_review_schedules(
+    user_ids: Optional[List[str]] = Query(None, description="только эти ученики; по умолчанию все"),
+    _admin: dict = Depends(require_admin),
+):
+    """Пересобирает расписания интервального повторения по истории попыток"""
+    return get_orchestrator().recompute_reviews(user_ids)
+
+
+@router.post("/admin/retag-errors", response_model=Dict[str, Any])
+def retag_attempt_errors(
+    user_ids: Optional[List[str]] = Query(None, description="только эти ученики; по умолчанию все"),
+    dry_run: bool = Query(False, description="только посчитать, сколько разметок изменится"),
+    _admin: dict = Depends(require_admin),
+):
+    """
+    Переразмечает ошибки в истории попыток текущими правилами и пересобирает счётчики ошибок,
+    расписания повторений и аналитику классов. Ученики, отправившие задание во время прогона,
+    пропускаются (skipped) — их доразметит повторный вызов.
+    """
+    return get_orchestrator().retag_errors(user_ids, dry_run=dry_run)
+
+
+@router.post("/admin/rebuild-class-analytics", response_model=Dict[str, Any])
+def rebuild_class_analytics(_admin: dict = Depends(require_admin)):
+    """Пересобирает аналитику классов (отчёты учителя) по профилям всех учеников"""
+    return get_orchestrator().rebuild_class_analytics()
+
+
+@router.post("/admin/rebuild-timeseries", response_model=Dict[str, Any])
+def rebuild_timeseries(_admin: dict = Depends(require_admin)):
+    """Пересобирает ряды успеваемости (ученики, классы, школа) по профилям всех учеников"""
+    return get_orchestrator().rebuild_time_series()
@@ -7,13 +7,14 @@ import os
 # Добавляем путь к backend для импорта
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from datetime import datetime
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from agents.orchestrator import AgentOrchestrator
+from agents.orchestrator import get_orchestrator
+from utils.http_cache import cache_headers, is_not_modified, not_modified
 
 router = APIRouter()
-orchestrator = AgentOrchestrator()
 
 
 class TaskSubmission(BaseModel):
@@ -23,6 +24,19 @@ class TaskSubmission(BaseModel):
     question: str
     user_answer: int
     correct_answer: int
+    topic: Optional[str] = None
+    # Для офлайн-синхронизации: когда ученик отвечал и сколько думал
+    timestamp: Optional[datetime] = None
+    time_spent_seconds: Optional[int] = None
+
+
+# Максимум попыток в одном пакете /agents/submit-tasks
+MAX_BATCH_SUBMISSIONS = 5000
+
+
+class TaskBatchSubmission(BaseModel):
+    """Пакет попыток одного или нескольких учеников"""
+    submissions: List[TaskSubmission] = Field(..., min_length=1, max_length=MAX_BATCH_SUBMISSIONS)
 
 
 class TaskGenerationRequest(BaseModel):
@@ -40,35 +54,53 @@ class TaskAssignment(BaseModel):
 
 
 @router.post("/agents/submit-task", response_model=Dict[str, Any])
-async def submit_task(submission: TaskSubmission):
+def submit_task(submission: TaskSubmission):
     """
     Отправка задания учеником
     
     Возвращает:
     - Анализ ошибки (если есть)
     - Сообщение от наставника
-    - Обновленный профиль ученика
+    - Изменения профиля ученика (только изменившиеся поля)
     """
     try:
-        result = orchestrator.process_task_submission(
+        result = get_orchestrator().process_task_submission(
             user_id=submission.user_id,
             task_id=submission.task_id,
             question=submission.question,
             user_answer=submission.user_answer,
-            correct_answer=submission.correct_answer
+            correct_answer=submission.correct_answer,
+            topic=submission.topic,
+            timestamp=submission.timestamp,
+            time_spent_seconds=submission.time_spent_seconds
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/agents/submit-tasks", response_model=Dict[str, Any])
+def submit_tasks(batch: TaskBatchSubmission):
+    """
+    Пакетная отправка заданий (офлайн-практика, импорт результатов класса)
+    
+    Возвращает результат по каждой попытке в исходном порядке: анализ ошибки,
+    изменения профиля и срок следующего повторения. Профиль каждого ученика
+    сохраняется один раз на пакет.
+    """
+    try:
+        return get_orchestrator().process_task_batch([submission.dict() for submission in batch.submissions])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/agents/generate-tasks", response_model=Dict[str, Any])
-async def generate_tasks(request: TaskGenerationRequest):
+def generate_tasks(request: TaskGenerationRequest):
     """
     Генерация персонализированных заданий для ученика
     """
     try:
-        result = orchestrator.generate_personalized_tasks(
+        result = get_orchestrator().generate_personalized_tasks(
             user_id=request.user_id,
             topic=request.topic,
             count=request.count
@@ -79,24 +111,35 @@ async def generate_tasks(request: TaskGenerationRequest):
 
 
 @router.get("/agents/dashboard/{user_id}", response_model=Dict[str, Any])
-async def get_student_dashboard(user_id: str):
+def get_student_dashboard(user_id: str):
     """
     Получение данных для дашборда ученика
     """
     try:
-        result = orchestrator.get_student_dashboard(user_id)
+        result = get_orchestrator().get_student_dashboard(user_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/agents/review-queue/{user_id}", response_model=Dict[str, Any])
+def get_review_queue(user_id: str, limit: int = Query(20, ge=1, le=200)):
+    """
+    Задания, которые ученику пора повторить (интервальное повторение)
+    """
+    try:
+        return get_orchestrator().get_review_queue(user_id, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/agents/assign-tasks", response_model=Dict[str, Any])
-async def assign_tasks(assignment: TaskAssignment):
+def assign_tasks(assignment: TaskAssignment):
     """
     Назначение заданий ученику учителем
     """
     try:
-        result = orchestrator.assign_task_to_student(
+        result = get_orchestrator().assign_task_to_student(
             user_id=assignment.user_id,
             topic=assignment.topic,
             task_ids=assignment.task_ids
@@ -107,7 +150,9 @@ async def assign_tasks(assignment: TaskAssignment):
 
 
 @router.get("/agents/teacher-report", response_model=Dict[str, Any])
-async def get_teacher_report(
+def get_teacher_report(
+    request: Request,
+    response: Response,
     report_type: str = "summary",
     class_id: Optional[str] = None
 ):
@@ -115,24 +160,82 @@ async def get_teacher_report(
     Получение отчета для учителя
     
     report_type: summary, detailed, struggling
+    
+    Отчёт строится по аналитике классов и отдаётся с ETag / Last-Modified: если класс не менялся,
+    на запрос с If-None-Match ответ — 304 без тела.
     """
     try:
+        orchestrator = get_orchestrator()
+        etag, last_modified = orchestrator.class_analytics.validators(class_id, report_type)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
         result = orchestrator.get_teacher_report(
             class_id=class_id,
             report_type=report_type
         )
+        response.headers.update(cache_headers(etag, last_modified))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/agents/class-analytics", response_model=Dict[str, Any])
+def get_class_analytics(
+    request: Request,
+    response: Response,
+    class_id: Optional[str] = Query(None, description="класс; по умолчанию все ученики"),
+    weeks: int = Query(12, ge=1, le=520, description="последних недель")
+):
+    """
+    Недельные агрегаты класса по темам и типам ошибок (с ETag / Last-Modified, как teacher-report)
+    """
+    try:
+        orchestrator = get_orchestrator()
+        etag, last_modified = orchestrator.class_analytics.validators(class_id, f"weeks={weeks}")
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        result = orchestrator.get_class_aggregates(class_id, weeks)
+        response.headers.update(cache_headers(etag, last_modified))
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/agents/timeseries/{scope}", response_model=Dict[str, Any])
+def get_time_series(
+    scope: str,
+    id: Optional[str] = Query(None, description="ученик (scope=student) или класс (scope=class)"),
+    metric: str = Query("accuracy", description="accuracy, attempts, correct, points — по ней прореживается ряд"),
+    start: Optional[datetime] = Query(None, description="по умолчанию — начало ряда"),
+    end: Optional[datetime] = Query(None, description="по умолчанию — сейчас"),
+    resolution: str = Query("auto", description="auto, hour, day, week"),
+    points: int = Query(200, ge=3, le=2000, description="максимум точек в ответе")
+):
+    """
+    Ряд успеваемости: попытки, верные ответы, точность и очки по времени
+
+    scope: student, class, school (все ученики). Ряд читается из почасовых/дневных/недельных
+    счётчиков и прореживается LTTB до points точек — время ответа не зависит от длины истории.
+    """
+    if scope == "student" and not id:
+        raise HTTPException(status_code=400, detail="Укажите id ученика")
+    try:
+        return get_orchestrator().get_time_series(
+            scope, id, start=start, end=end, resolution=resolution, points=points, metric=metric
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/agents/profile/{user_id}", response_model=Dict[str, Any])
-async def get_user_profile(user_id: str):
+def get_user_profile(user_id: str):
     """
     Получение полного профиля ученика
     """
     try:
-        profiler = orchestrator.profiler
+        profiler = get_orchestrator().profiler
         profile = profiler.get_profile(user_id)  # Создается автоматически
         
         return profile.dict()
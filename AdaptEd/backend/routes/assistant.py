@@ -37,7 +37,7 @@ class DocumentUpload(BaseModel):
 
 
 @router.post("/assistant/chat", response_model=Dict[str, Any])
-async def assistant_chat(req: ChatRequest):
+def assistant_chat(req: ChatRequest):
 	try:
 		assistant_service = get_assistant_service()
 		messages = [m.dict() for m in req.messages]
@@ -46,16 +46,15 @@ async def assistant_chat(req: ChatRequest):
 		student_weaknesses = None
 		if req.user_id:
 			# Получаем профиль когнитивный для слабых мест
-			from agents.orchestrator import AgentOrchestrator
-			orchestrator = AgentOrchestrator()
-			profile = orchestrator.profiler.get_profile(req.user_id)
+			from agents.orchestrator import get_orchestrator
+			profile = get_orchestrator().profiler.get_profile(req.user_id)
 			if profile:
 				# Извлекаем слабые места из профиля
 				weaknesses = []
 				# Самые частые ошибки
 				if profile.error_frequency:
 					top_errors = sorted(profile.error_frequency.items(), key=lambda x: x[1], reverse=True)[:3]
-					weaknesses.extend([str(err[0].value) for err in top_errors])
+					weaknesses.extend([str(getattr(err[0], "value", err[0])) for err in top_errors])
 				# Низкая точность по темам
 				for topic, mastery in profile.topic_mastery.items():
 					if mastery < 0.5:
@@ -95,7 +94,7 @@ async def assistant_chat(req: ChatRequest):
 
 
 @router.post("/assistant/motivation", response_model=Dict[str, str])
-async def assistant_motivation(req: MotivationRequest):
+def assistant_motivation(req: MotivationRequest):
 	try:
 		assistant_service = get_assistant_service()
 		text = assistant_service.motivational_message(
@@ -109,7 +108,7 @@ async def assistant_motivation(req: MotivationRequest):
 
 
 @router.post("/assistant/hint", response_model=Dict[str, str])
-async def assistant_hint(req: HintRequest):
+def assistant_hint(req: HintRequest):
 	try:
 		assistant_service = get_assistant_service()
 		text = assistant_service.hint(task_text=req.task_text, student_level=req.student_level)
@@ -119,7 +118,7 @@ async def assistant_hint(req: HintRequest):
 
 
 @router.post("/assistant/documents/upload", response_model=Dict[str, str])
-async def upload_document(doc: DocumentUpload):
+def upload_document(doc: DocumentUpload):
 	try:
 		assistant_service = get_assistant_service()
 		assistant_service.add_document(title=doc.title, content=doc.content)
@@ -27,6 +27,13 @@ def get_current_user(authorization: str = Header(None)) -> dict:
     return user
 
 
+def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Пропускает только администраторов"""
+    if current_user.get("role") != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
 @router.post("/auth/register", response_model=User)
 async def register(user_data: UserRegistration):
     """
@@ -1,22 +1,23 @@
 """
 API маршруты для домашних заданий
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import json
 import re
-from agents.orchestrator import AgentOrchestrator
+from agents.orchestrator import get_orchestrator
 from services.assistant import get_assistant_service
-from utils.db import get_db, has_db
-from sqlalchemy.orm import Session
-from models.homework import Homework, HomeworkSubmission as HomeworkSubmissionORM
+from services.mastery import get_mastery_engine
+from utils.db import get_db_session, get_async_db_session, fetch_all, has_db
+from utils.persistent_storage import persistent_storage
+from sqlalchemy.orm import Session, joinedload
+from models.homework import HomeworkTemplate, Homework, HomeworkSubmission as HomeworkSubmissionORM
 from utils.db import Base
 from sqlalchemy import select
 
 router = APIRouter()
-orchestrator = AgentOrchestrator()
 assistant_service = None  # будет создан по запросу
 
 def _assistant():
@@ -70,6 +71,17 @@ class HomeworkCreate(BaseModel):
     created_by: Optional[str] = None
 
 
+class HomeworkBulkAssign(BaseModel):
+    """Назначение одного ДЗ списку учеников или целому классу"""
+    title: str
+    description: Optional[str] = None
+    subject: Optional[str] = None
+    due_date: Optional[datetime] = None
+    student_ids: Optional[List[str]] = None
+    class_id: Optional[str] = None
+    created_by: Optional[str] = None
+
+
 class HomeworkOut(BaseModel):
     id: int
     title: str
@@ -93,24 +105,41 @@ class HomeworkSubmitDB(BaseModel):
 # ====== Новые эндпоинты на Postgres ======
 
 @router.get("/homeworks", response_model=List[HomeworkOut])
-async def list_homeworks(user_id: Optional[str] = None, db: Session = Depends(get_db)):
+async def list_homeworks(
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_db_session),
+    adb=Depends(get_async_db_session),
+):
+    """Список ДЗ. Keyset-пагинация: limit + after_id (id последнего ДЗ предыдущей страницы)."""
     if not has_db() or db is None:
         raise HTTPException(status_code=503, detail="Database is not configured")
-    stmt = select(Homework)
+    stmt = select(Homework).options(joinedload(Homework.template)).order_by(Homework.id)
     if user_id:
         stmt = stmt.where(Homework.assigned_to == user_id)
-    rows = db.execute(stmt).scalars().all()
-    return rows
+    if status:
+        stmt = stmt.where(Homework.status == status)
+    if after_id is not None:
+        stmt = stmt.where(Homework.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return await fetch_all(stmt, db, adb)
 
 
 @router.post("/homeworks", response_model=HomeworkOut)
-async def create_homework(payload: HomeworkCreate, db: Session = Depends(get_db)):
+def create_homework(payload: HomeworkCreate, db: Session = Depends(get_db_session)):
     if not has_db() or db is None:
         raise HTTPException(status_code=503, detail="Database is not configured")
-    hw = Homework(
+    template = HomeworkTemplate(
         title=payload.title,
         description=payload.description,
         subject=payload.subject,
+        created_by=payload.created_by,
+    )
+    hw = Homework(
+        template=template,
         due_date=payload.due_date,
         assigned_to=payload.assigned_to,
         created_by=payload.created_by,
@@ -122,12 +151,70 @@ async def create_homework(payload: HomeworkCreate, db: Session = Depends(get_db)
     return hw
 
 
+def _class_student_ids(class_id: str) -> List[str]:
+    """ID активных учеников класса из хранилища пользователей"""
+    users = persistent_storage.get("users", {})
+    return [
+        user_id for user_id, user in users.items()
+        if user.get("role") == "student" and user.get("class_id") == class_id and user.get("is_active", True)
+    ]
+
+
+@router.post("/homeworks/bulk", response_model=Dict[str, Any])
+def bulk_assign_homework(payload: HomeworkBulkAssign, db: Session = Depends(get_db_session)):
+    """
+    Назначение ДЗ сразу нескольким ученикам (или всему классу) одной транзакцией
+    """
+    if not has_db() or db is None:
+        raise HTTPException(status_code=503, detail="Database is not configured")
+    if not payload.student_ids and not payload.class_id:
+        raise HTTPException(status_code=400, detail="Укажите student_ids или class_id")
+
+    student_ids = list(payload.student_ids or [])
+    if payload.class_id:
+        student_ids.extend(_class_student_ids(payload.class_id))
+    # Убираем дубликаты, сохраняя порядок
+    student_ids = list(dict.fromkeys(student_ids))
+    if not student_ids:
+        raise HTTPException(status_code=404, detail="No students found for assignment")
+
+    # Текст задания хранится один раз в шаблоне, на ученика — только строка назначения
+    template = HomeworkTemplate(
+        title=payload.title,
+        description=payload.description,
+        subject=payload.subject,
+        created_by=payload.created_by,
+    )
+    rows = [
+        Homework(
+            template=template,
+            due_date=payload.due_date,
+            assigned_to=student_id,
+            created_by=payload.created_by,
+            status="new",
+        )
+        for student_id in student_ids
+    ]
+    # Один flush — многострочный INSERT (insertmanyvalues), id проставляются сразу
+    db.add_all(rows)
+    try:
+        db.flush()
+        template_id = template.id
+        assignments = [{"user_id": hw.assigned_to, "homework_id": hw.id} for hw in rows]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {"created": len(assignments), "template_id": template_id, "assignments": assignments}
+
+
 @router.post("/homeworks/{homework_id}/submit", response_model=Dict[str, Any])
-async def submit_homework_db(homework_id: int, payload: HomeworkSubmitDB, db: Session = Depends(get_db)):
+def submit_homework_db(homework_id: int, payload: HomeworkSubmitDB, db: Session = Depends(get_db_session)):
     if not has_db() or db is None:
         raise HTTPException(status_code=503, detail="Database is not configured")
 
-    hw = db.get(Homework, homework_id)
+    hw = db.get(Homework, homework_id, options=[joinedload(Homework.template)])
     if not hw:
         raise HTTPException(status_code=404, detail="Homework not found")
     if hw.assigned_to != payload.user_id:
@@ -151,6 +238,8 @@ async def submit_homework_db(homework_id: int, payload: HomeworkSubmitDB, db: Se
             f"Описание: {hw.description or ''}\n"
             f"Ответ ученика: {payload.answer_text or ''}\n"
         )
+        # Запрос к LLM идёт секунды — не держим на это время соединение из пула
+        db.close()
         feedback = assist._generate(prompt, max_new_tokens=300)
     except Exception:
         feedback = None
@@ -168,7 +257,7 @@ async def submit_homework_db(homework_id: int, payload: HomeworkSubmitDB, db: Se
 
     return {
         "status": "submitted",
-        "homework": hw,
+        "homework": HomeworkOut.model_validate(hw).model_dump(),
         "submission": {
             "id": submission.id,
             "user_id": submission.user_id,
@@ -180,14 +269,17 @@ async def submit_homework_db(homework_id: int, payload: HomeworkSubmitDB, db: Se
 
 
 @router.get("/homeworks/{homework_id}/submissions", response_model=List[Dict[str, Any]])
-async def list_submissions(homework_id: int, db: Session = Depends(get_db)):
+async def list_submissions(homework_id: int, db: Session = Depends(get_db_session), adb=Depends(get_async_db_session)):
     if not has_db() or db is None:
         raise HTTPException(status_code=503, detail="Database is not configured")
-    hw = db.get(Homework, homework_id)
-    if not hw:
+    if not await fetch_all(select(Homework.id).where(Homework.id == homework_id), db, adb):
         raise HTTPException(status_code=404, detail="Homework not found")
-    stmt = select(HomeworkSubmissionORM).where(HomeworkSubmissionORM.homework_id == homework_id)
-    rows = db.execute(stmt).scalars().all()
+    stmt = (
+        select(HomeworkSubmissionORM)
+        .where(HomeworkSubmissionORM.homework_id == homework_id)
+        .order_by(HomeworkSubmissionORM.id)
+    )
+    rows = await fetch_all(stmt, db, adb)
     return [
         {
             "id": s.id,
@@ -202,7 +294,7 @@ async def list_submissions(homework_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/homework/submit", response_model=Dict[str, Any])
-async def submit_homework(submission: HomeworkSubmissionPayload):
+def submit_homework(submission: HomeworkSubmissionPayload):
     """
     Сдача домашнего задания с анализом решения
     """
@@ -222,19 +314,14 @@ async def submit_homework(submission: HomeworkSubmissionPayload):
         analysis = _assistant()._generate(analysis_prompt, max_new_tokens=400)
         
         # Обновляем профиль ученика
-        profile = orchestrator.profiler.get_profile(submission.user_id)
+        profile = get_orchestrator().profiler.get_profile(submission.user_id)
         if profile:
-            # Добавляем информацию о слабых местах из описания
+            # Признание затруднения в описании решения учитывается как неудачная попытка по теме
             weakness_keywords = ["не понимаю", "забыл", "не помню", "не знаю", "сложно"]
             solution_lower = submission.solution_description.lower()
-            for keyword in weakness_keywords:
-                if keyword in solution_lower:
-                    # Извлекаем тему
-                    if submission.topic:
-                        if submission.topic not in profile.topic_mastery:
-                            profile.topic_mastery[submission.topic] = 0.5
-                        else:
-                            profile.topic_mastery[submission.topic] = max(0.0, profile.topic_mastery[submission.topic] - 0.1)
+            if submission.topic and any(keyword in solution_lower for keyword in weakness_keywords):
+                get_mastery_engine().update(profile, submission.topic, is_correct=False)
+            get_orchestrator().profiler.save_profile(profile)
         
         return {
             "status": "submitted",
@@ -246,13 +333,13 @@ async def submit_homework(submission: HomeworkSubmissionPayload):
 
 
 @router.post("/tests/generate", response_model=Dict[str, Any])
-async def generate_test(request: TestGenerationRequest):
+def generate_test(request: TestGenerationRequest):
     """
     Генерация персонализированного теста через нейронку
     """
     try:
         # Получаем профиль ученика
-        profile = orchestrator.profiler.get_profile(request.user_id)
+        profile = get_orchestrator().profiler.get_profile(request.user_id)
         
         # Формируем промпт для генерации теста
         weakness_context = ""
@@ -260,13 +347,17 @@ async def generate_test(request: TestGenerationRequest):
             # Добавляем информацию о слабых местах
             if profile.error_frequency:
                 top_errors = sorted(profile.error_frequency.items(), key=lambda x: x[1], reverse=True)[:2]
-                weakness_context = f"Ученик часто ошибается в: {', '.join([str(e[0].value) for e in top_errors])}. "
+                weakness_context = f"Ученик часто ошибается в: {', '.join([str(getattr(e[0], 'value', e[0])) for e in top_errors])}. "
             
             # Добавляем информацию о знаниях по теме
             if request.topic in profile.topic_mastery:
                 mastery = profile.topic_mastery[request.topic]
                 difficulty_note = "легкие" if mastery < 0.4 else "средние" if mastery < 0.7 else "сложные"
-                weakness_context += f"Знания по теме: {mastery:.1%}. "
+                weakness_context += f"Знания по теме: {mastery:.1%}"
+                state = profile.mastery.get(request.topic)
+                if state is not None:
+                    weakness_context += f" (±{state.uncertainty:.0%}, попыток: {state.attempts})"
+                weakness_context += ". "
         
         prompt = f"""Создай тест по теме "{request.topic}" для ученика 5-9 класса.
 {weakness_context}
@@ -342,7 +433,7 @@ async def submit_test(submission: TestSubmission):
         # Для упрощения считаем что тест уже есть
         
         # Анализируем результаты
-        profile = orchestrator.profiler.get_profile(submission.user_id)
+        profile = get_orchestrator().profiler.get_profile(submission.user_id)
         
         # Обновляем профиль на основе результатов теста
         # (в реальности нужно получить вопросы теста)
@@ -362,7 +453,7 @@ async def get_student_statistics(user_id: str):
     Получение статистики и слабых мест ученика
     """
     try:
-        profile = orchestrator.profiler.get_profile(user_id)
+        profile = get_orchestrator().profiler.get_profile(user_id)
         personality_profile = _assistant().get_personality_profile(user_id)
         
         if not profile:
@@ -376,9 +467,9 @@ async def get_student_statistics(user_id: str):
             top_errors = sorted(profile.error_frequency.items(), key=lambda x: x[1], reverse=True)[:3]
             weaknesses.extend([{
                 "type": "error_pattern",
-                "name": str(err[0].value),
+                "name": str(getattr(err[0], "value", err[0])),
                 "frequency": err[1],
-                "description": f"Часто встречается ошибка типа: {err[0].value}"
+                "description": f"Часто встречается ошибка типа: {getattr(err[0], 'value', err[0])}"
             } for err in top_errors])
         
         # По темам с низким мастерством
@@ -412,6 +503,7 @@ async def get_student_statistics(user_id: str):
             "strengths": [
                 topic for topic, mastery in profile.topic_mastery.items() if mastery >= 0.7
             ],
+            "topic_mastery": get_mastery_engine().snapshot(profile),
             "personality": personality_profile.dict() if personality_profile else None
         }
     except Exception as e:
@@ -0,0 +1,47 @@
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from utils.metrics import HTTP_REQUEST_DURATION, HTTP_IN_PROGRESS, render
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+	"""Метрики процесса в формате Prometheus"""
+	return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class MetricsMiddleware:
+	"""ASGI-middleware: латентность запросов по шаблону маршрута (/agents/dashboard/{user_id}, а не по URL)"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		status = {"code": 500}
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				status["code"] = message["status"]
+			await send(message)
+
+		HTTP_IN_PROGRESS.inc()
+		started = time.perf_counter()
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			HTTP_IN_PROGRESS.dec()
+			route = scope.get("route")
+			HTTP_REQUEST_DURATION.observe(
+				time.perf_counter() - started,
+				method=scope["method"],
+				route=getattr(route, "path", "unmatched"),
+				status=status["code"],
+			)
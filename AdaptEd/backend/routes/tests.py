@@ -3,16 +3,19 @@ from datetime import datetime
 import re
 import json
 
-from fastapi import APIRouter, HTTPException, Depends, Body, Request
+from fastapi import APIRouter, HTTPException, Depends, Body, Request, Query
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
 
 from models.test import Test, TestQuestion, TestSubmission
-from utils.db import get_db, has_db
+from utils.db import get_db_session, get_async_db_session, fetch_all, fetch_one, has_db
 from services.assistant import get_assistant_service
+from utils.logger import get_logger
 
 router = APIRouter()
+logger = get_logger("routes.tests")
 
 
 class ManualQuestion(BaseModel):
@@ -53,6 +56,18 @@ def _assistant():
 	return get_assistant_service()
 
 
+def _test_stmt(test_id: int, with_questions: bool = True):
+	"""SELECT теста; вопросы подтягиваются одним дополнительным запросом (selectinload)."""
+	stmt = select(Test).where(Test.id == test_id)
+	if with_questions:
+		stmt = stmt.options(selectinload(Test.questions))
+	return stmt
+
+
+def _load_test(db: Session, test_id: int, with_questions: bool = True) -> Optional[Test]:
+	return db.execute(_test_stmt(test_id, with_questions)).scalars().first()
+
+
 def _serialize_test(test: Test, include_questions: bool = False) -> Dict[str, Any]:
 	data = {
 		"id": test.id,
@@ -78,7 +93,7 @@ def _serialize_test(test: Test, include_questions: bool = False) -> Dict[str, An
 
 
 @router.post("/tests/manual", response_model=Dict[str, Any])
-async def create_manual_test(payload: ManualTestCreate, db: Session = Depends(get_db)):
+def create_manual_test(payload: ManualTestCreate, db: Session = Depends(get_db_session)):
 	if not has_db() or db is None:
 		raise HTTPException(status_code=503, detail="Database is not configured")
 	if not payload.questions:
@@ -109,12 +124,53 @@ async def create_manual_test(payload: ManualTestCreate, db: Session = Depends(ge
 		)
 
 	db.commit()
-	db.refresh(test)
+	test = _load_test(db, test.id)
+	return {"test": _serialize_test(test, include_questions=True)}
+
+
+def _save_generated_test(db: Session, title: str, topic: str, diff: str, creator_id: Optional[str], questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+	"""Сохраняет сгенерированный тест (синхронно, вызывается из threadpool)"""
+	test = Test(
+		title=title,
+		topic=topic,
+		difficulty=diff,
+		source="ai",
+		creator_id=creator_id,
+		created_at=datetime.utcnow(),
+	)
+	db.add(test)
+	db.flush()
+
+	for q in questions:
+		opts = q.get("options") or []
+		# поддерживаем оба ключа: correct_index и correct_answer
+		correct_index = q.get("correct_index")
+		if correct_index is None:
+			correct_index = q.get("correct_answer", 0)
+		if not isinstance(correct_index, int):
+			correct_index = 0
+		db.add(
+			TestQuestion(
+				test_id=test.id,
+				question=q.get("question", ""),
+				options=opts,
+				correct_index=correct_index,
+				explanation=q.get("explanation"),
+			)
+		)
+
+	try:
+		db.commit()
+	except Exception:
+		db.rollback()
+		raise
+	test = _load_test(db, test.id)
+	logger.info("saved test id=%s questions=%d topic=%s", test.id, len(questions), topic)
 	return {"test": _serialize_test(test, include_questions=True)}
 
 
 @router.post("/tests/generate", response_model=Dict[str, Any])
-async def generate_test(request: Request, db: Session = Depends(get_db)):
+async def generate_test(request: Request, db: Session = Depends(get_db_session)):
 	if not has_db() or db is None:
 		raise HTTPException(status_code=503, detail="Database is not configured")
 	try:
@@ -137,7 +193,7 @@ async def generate_test(request: Request, db: Session = Depends(get_db)):
 		raise HTTPException(status_code=400, detail="Укажите тему для генерации теста (topic)")
 
 	assist = _assistant()
-	print(f"[Tests] generate start topic='{topic}' diff='{difficulty}' count={question_count} creator={creator_id} db={getattr(getattr(db, 'bind', None), 'url', None)}")
+	logger.info("generate start topic=%r diff=%r count=%s creator=%s", topic, difficulty, question_count, creator_id)
 	prompt = f"""Создай тест по теме "{topic}".
 Сложность: {difficulty}.
 Количество вопросов: {question_count}.
@@ -157,97 +213,74 @@ async def generate_test(request: Request, db: Session = Depends(get_db)):
   ]
 }}
 """
-	raw = assist._generate(prompt, max_new_tokens=800)
-	print(f"[Tests] raw response len={len(raw)}")
+	# LLM и запись в БД — блокирующие вызовы, уводим их из event loop
+	raw = await run_in_threadpool(assist._generate, prompt, 800)
+	logger.debug("raw response len=%d", len(raw))
 
 	# Пытаемся вытащить JSON
 	json_match = re.search(r"\{.*\}", raw, re.DOTALL)
 	if not json_match:
-		print("[Tests] JSON not found in raw response")
+		logger.warning("JSON not found in raw response")
 		raise HTTPException(status_code=500, detail="Failed to parse generated test")
 	try:
 		data = json.loads(json_match.group())
 	except Exception as e:
-		print(f"[Tests] JSON parse error: {e}")
+		logger.warning("JSON parse error: %s", e)
 		raise HTTPException(status_code=500, detail="Failed to parse generated test JSON")
 
 	questions = data.get("questions") or []
 	if not questions:
-		print("[Tests] No questions in generated test")
+		logger.warning("No questions in generated test")
 		raise HTTPException(status_code=500, detail="No questions in generated test")
 
 	title = data.get("title") or f"Тест по теме {topic}"
 	topic = data.get("topic") or topic
 	diff = data.get("difficulty") or difficulty
-	print(f"[Tests] parsed title='{title}' topic='{topic}' diff='{diff}' questions={len(questions)}")
+	logger.debug("parsed title=%r topic=%r diff=%r questions=%d", title, topic, diff, len(questions))
 
-	test = Test(
-		title=title,
-		topic=topic,
-		difficulty=diff,
-		source="ai",
-		creator_id=creator_id,
-		created_at=datetime.utcnow(),
-	)
-	db.add(test)
-	db.flush()
-
-	for q in questions:
-		opts = q.get("options") or []
-		# поддерживаем оба ключа: correct_index и correct_answer
-		correct_index = q.get("correct_index")
-		if correct_index is None:
-			correct_index = q.get("correct_answer", 0)
-		if not isinstance(correct_index, int):
-			correct_index = 0
-		db.add(
-			TestQuestion(
-				test_id=test.id,
-				question=q.get("question", ""),
-				options=opts,
-				correct_index=correct_index,
-				explanation=q.get("explanation"),
-			)
-		)
-
-	try:
-		db.commit()
-	except Exception:
-		db.rollback()
-		raise
-	db.refresh(test)
-	print(f"[Tests] saved test id={test.id} title={title} questions={len(questions)} topic={topic}")
-	return {"test": _serialize_test(test, include_questions=True)}
+	return await run_in_threadpool(_save_generated_test, db, title, topic, diff, creator_id, questions)
 
 
 @router.get("/tests", response_model=List[Dict[str, Any]])
-async def list_tests(topic: Optional[str] = None, creator_id: Optional[str] = None, db: Session = Depends(get_db)):
+async def list_tests(
+	topic: Optional[str] = None,
+	creator_id: Optional[str] = None,
+	limit: Optional[int] = Query(None, ge=1, le=500),
+	after_id: Optional[int] = None,
+	db: Session = Depends(get_db_session),
+	adb=Depends(get_async_db_session),
+):
+	"""Список тестов. Keyset-пагинация: limit + after_id (id последнего теста предыдущей страницы)."""
 	if not has_db() or db is None:
 		raise HTTPException(status_code=503, detail="Database is not configured")
-	stmt = select(Test)
+	stmt = select(Test).order_by(Test.id)
 	if topic:
 		stmt = stmt.where(Test.topic == topic)
 	if creator_id:
 		stmt = stmt.where(Test.creator_id == creator_id)
-	rows = db.execute(stmt).scalars().all()
+	if after_id is not None:
+		stmt = stmt.where(Test.id > after_id)
+	if limit is not None:
+		stmt = stmt.limit(limit)
+	rows = await fetch_all(stmt, db, adb)
 	return [_serialize_test(t, include_questions=False) for t in rows]
 
 
 @router.get("/tests/{test_id}", response_model=Dict[str, Any])
-async def get_test(test_id: int, db: Session = Depends(get_db)):
+async def get_test(test_id: int, db: Session = Depends(get_db_session), adb=Depends(get_async_db_session)):
 	if not has_db() or db is None:
 		raise HTTPException(status_code=503, detail="Database is not configured")
-	test = db.get(Test, test_id)
+	test = await fetch_one(_test_stmt(test_id), db, adb)
 	if not test:
 		raise HTTPException(status_code=404, detail="Test not found")
 	return _serialize_test(test, include_questions=True)
 
 
 @router.put("/tests/{test_id}", response_model=Dict[str, Any])
-async def update_test(test_id: int, payload: ManualTestUpdate, db: Session = Depends(get_db)):
+def update_test(test_id: int, payload: ManualTestUpdate, db: Session = Depends(get_db_session)):
 	if not has_db() or db is None:
 		raise HTTPException(status_code=503, detail="Database is not configured")
-	test = db.get(Test, test_id)
+	test = _load_test(db, test_id, with_questions=payload.questions is not None)
 	if not test:
 		raise HTTPException(status_code=404, detail="Test not found")
 
@@ -278,12 +311,12 @@ async def update_test(test_id: int, payload: ManualTestUpdate, db: Session = Dep
 			)
 
 	db.commit()
-	db.refresh(test)
+	test = _load_test(db, test_id)
 	return _serialize_test(test, include_questions=True)
 
 
 @router.delete("/tests/{test_id}", response_model=Dict[str, Any])
-async def delete_test(test_id: int, db: Session = Depends(get_db)):
+def delete_test(test_id: int, db: Session = Depends(get_db_session)):
 	if not has_db() or db is None:
 		raise HTTPException(status_code=503, detail="Database is not configured")
 	test = db.get(Test, test_id)
@@ -295,10 +328,10 @@ async def delete_test(test_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/tests/{test_id}/submit", response_model=Dict[str, Any])
-async def submit_test(test_id: int, payload: TestSubmitRequest, db: Session = Depends(get_db)):
+def submit_test(test_id: int, payload: TestSubmitRequest, db: Session = Depends(get_db_session)):
 	if not has_db() or db is None:
 		raise HTTPException(status_code=503, detail="Database is not configured")
-	test = db.get(Test, test_id)
+	test = _load_test(db, test_id)
 	if not test:
 		raise HTTPException(status_code=404, detail="Test not found")
 
@@ -317,6 +350,8 @@ async def submit_test(test_id: int, payload: TestSubmitRequest, db: Session = De
 		assist = _assistant()
 		qtext = "\n".join([f"Вопрос: {q.question}\nТвой ответ: {a}, правильный: {q.correct_index}" for q, a in zip(questions, payload.answers)])
 		prompt = f"Оцени результаты теста. Правильных ответов: {correct} из {len(questions)} ({score_pct}%). Дай 2-3 рекомендации кратко. \n{qtext}"
+		# Запрос к LLM идёт секунды — не держим на это время соединение из пула
+		db.close()
 		feedback = assist._generate(prompt, max_new_tokens=200)
 	except Exception:
 		feedback = None
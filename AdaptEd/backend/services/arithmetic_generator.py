@@ -0,0 +1,315 @@
+"""
+Процедурный генератор арифметических заданий для банка заданий (services/task_bank.py).
+
+Задание строится как дерево выражения (число или кортеж (операция, левое, правое)) по шаблону
+категории: addition, subtraction, multiplication, division, mixed (без скобок, на порядок действий),
+expression (со скобками). Значение считается по дереву в целых числах — деление всегда нацело,
+отрицательных промежуточных результатов нет. Границы чисел задаются уровнем (LEVEL_DIFFICULTY)
+или явно через Difficulty.
+
+К каждому заданию строятся дистракторы — неверные ответы, которые получаются при конкретной
+ошибке (сложение без переноса, вычитание меньшей цифры из большей, действия слева направо,
+раскрытие скобок не в том порядке), с типом ошибки ErrorTag. Запрошенный тип ошибки (error_tag)
+меняет шаблон так, чтобы задание её выявляло; теги ошибок задания — запрошенный тип и типы
+дистракторов (кроме невнимательности, которую выявляет любое задание).
+
+Генератор детерминирован: одинаковый seed даёт одинаковые задания и id.
+safe_eval вычисляет текст задания без eval — разрешены только целые числа, + - * / и скобки.
+"""
+import random
+from fractions import Fraction
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from models.cognitive_profile import ErrorTag
+from services.question_features import OP_ADD, OP_MUL, OP_SUB, fold_expression, normalize_expression
+from services.task_bank import LEVELS, BankTask, TaskBank
+
+CATEGORIES = ("addition", "subtraction", "multiplication", "division", "mixed", "expression")
+# Сгенерированные задания получают id начиная с этого, чтобы не пересекаться с заданиями из файла
+PROCEDURAL_ID_START = 100_000
+
+Node = Union[int, Tuple[str, "Node", "Node"]]
+
+_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2}
+
+
+class Difficulty(BaseModel):
+    """Параметры сложности"""
+    # Границы слагаемых, уменьшаемого и вычитаемого
+    min_value: int
+    max_value: int
+    # Наибольший множитель, делитель и частное
+    max_factor: int
+    # Доля заданий expression вида a * b ± c * d вместо заданий со скобками
+    compound: float = 0.0
+
+
+LEVEL_DIFFICULTY = {
+    "beginner": Difficulty(min_value=1, max_value=20, max_factor=10),
+    "intermediate": Difficulty(min_value=10, max_value=100, max_factor=12, compound=0.3),
+    "advanced": Difficulty(min_value=100, max_value=1000, max_factor=25, compound=0.6),
+}
+
+
+def evaluate(node: Node) -> int:
+    if isinstance(node, int):
+        return node
+    op, left, right = node
+    a, b = evaluate(left), evaluate(right)
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    return a // b
+
+
+def render(node: Node, parent: int = 0, right_side: bool = False) -> str:
+    """Текст выражения с минимумом скобок"""
+    if isinstance(node, int):
+        return str(node)
+    op, left, right = node
+    precedence = _PRECEDENCE[op]
+    text = f"{render(left, precedence)} {op} {render(right, precedence, True)}"
+    # Скобки нужны, если операция слабее внешней или стоит справа от "-" / "/" с тем же приоритетом
+    if precedence < parent or (right_side and precedence == parent):
+        return f"({text})"
+    return text
+
+
+def safe_eval(expression: str) -> Fraction:
+    """Значение арифметического выражения; ValueError для всего, кроме чисел, + - * / и скобок"""
+    return fold_expression(normalize_expression(expression), Fraction, _apply, lambda value: -value)
+
+
+def _apply(op: int, a: Fraction, b: Fraction) -> Fraction:
+    if op == OP_ADD:
+        return a + b
+    if op == OP_SUB:
+        return a - b
+    if op == OP_MUL:
+        return a * b
+    if b == 0:
+        raise ValueError("Division by zero")
+    return a / b
+
+
+def _left_to_right(node: Node) -> Optional[int]:
+    """Ответ при вычислении по порядку записи без учёта приоритета и скобок"""
+    tokens = render(node).replace("(", "").replace(")", "").split()
+    value = Fraction(int(tokens[0]))
+    for op, operand in zip(tokens[1::2], tokens[2::2]):
+        b = int(operand)
+        if op == "+":
+            value += b
+        elif op == "-":
+            value -= b
+        elif op == "*":
+            value *= b
+        elif b:
+            value /= b
+        else:
+            return None
+    return int(value) if value.denominator == 1 else None
+
+
+def _without_parentheses(node: Node) -> Optional[int]:
+    """Ответ, если скобки проигнорировать (но порядок действий соблюсти)"""
+    text = render(node)
+    if "(" not in text:
+        return None
+    try:
+        value = safe_eval(text.replace("(", "").replace(")", ""))
+    except ValueError:
+        return None
+    return int(value) if value.denominator == 1 else None
+
+
+def _digitwise(a: int, b: int, op) -> int:
+    """Поразрядная операция без переносов и заёмов: 47 + 56 -> 93, 52 - 38 -> 26"""
+    result, place = 0, 1
+    while a or b:
+        result += op(a % 10, b % 10) % 10 * place
+        a, b, place = a // 10, b // 10, place * 10
+    return result
+
+
+class ArithmeticGenerator:
+    """Детерминированный генератор заданий; уникальность вопросов — в пределах экземпляра"""
+
+    def __init__(self, seed: Optional[int] = None, start_id: int = PROCEDURAL_ID_START):
+        self.rng = random.Random(seed)
+        self.next_id = start_id
+        self._seen: set = set()
+
+    def generate(self, category: str, level: str = "beginner", count: int = 1,
+                 error_tag: Optional[str] = None, difficulty: Optional[Difficulty] = None) -> List[BankTask]:
+        """
+        До count новых заданий. error_tag (значение ErrorTag) выбирает шаблон, выявляющий эту ошибку;
+        если категория такую ошибку не выявляет, тег игнорируется. Меньше count — только когда
+        различных вопросов с такими параметрами не хватает.
+        """
+        if category not in CATEGORIES:
+            raise ValueError(f"Unknown category: {category}")
+        difficulty = difficulty or LEVEL_DIFFICULTY.get(level) or LEVEL_DIFFICULTY["beginner"]
+        build = getattr(self, f"_{category}")
+        tasks: List[BankTask] = []
+        for _ in range(count * 20):
+            if len(tasks) == count:
+                break
+            node = build(difficulty, error_tag)
+            question = render(node)
+            if question in self._seen:
+                continue
+            self._seen.add(question)
+            answer = evaluate(node)
+            distractors = self._distractors(category, node, answer)
+            tags = {tag for tag in distractors.values() if tag != ErrorTag.CARELESSNESS.value}
+            if error_tag and error_tag in self._targets(category):
+                tags.add(error_tag)
+            tasks.append(BankTask(
+                id=self.next_id, question=question, answer=answer, category=category, level=level,
+                error_tags=sorted(tags) or [ErrorTag.CARELESSNESS.value], distractors=distractors, generated=True,
+            ))
+            self.next_id += 1
+        return tasks
+
+    # --- шаблоны категорий ---
+
+    def _int(self, low: int, high: int) -> int:
+        return self.rng.randint(low, max(low, high))
+
+    def _addition(self, d: Difficulty, error_tag: Optional[str]) -> Node:
+        a, b = self._int(d.min_value, d.max_value), self._int(d.min_value, d.max_value)
+        if error_tag == ErrorTag.CALCULATION_ERROR and a % 10 + b % 10 < 10:
+            # Перенос из единиц: без него ответ совпал бы с поразрядной суммой
+            units = a % 10 or self._int(1, 9)
+            a = a - a % 10 + units
+            b = b - b % 10 + self._int(10 - units, 9)
+        return ("+", a, b)
+
+    def _subtraction(self, d: Difficulty, error_tag: Optional[str]) -> Node:
+        a, b = sorted((self._int(d.min_value, d.max_value), self._int(d.min_value, d.max_value)), reverse=True)
+        if error_tag == ErrorTag.CALCULATION_ERROR and a >= 10 and a % 10 >= b % 10:
+            # Заём в единицах: цифра единиц вычитаемого больше, чем у уменьшаемого
+            units = self._int(0, 8)
+            a = a - a % 10 + units
+            b = min(b // 10, a // 10 - 1) * 10 + self._int(units + 1, 9)
+        return ("-", a, b)
+
+    def _factors(self, d: Difficulty, error_tag: Optional[str]) -> Tuple[int, int]:
+        low = 6 if error_tag == ErrorTag.CALCULATION_ERROR and d.max_factor > 6 else 2
+        return self._int(low, d.max_factor), self._int(low, d.max_factor)
+
+    def _multiplication(self, d: Difficulty, error_tag: Optional[str]) -> Node:
+        a, b = self._factors(d, error_tag)
+        if d.max_value >= 1000 and self.rng.random() < 0.5:
+            a = self._int(d.max_factor, d.max_value // d.max_factor)
+        return ("*", a, b)
+
+    def _division(self, d: Difficulty, error_tag: Optional[str]) -> Node:
+        divisor, quotient = self._factors(d, error_tag)
+        if d.max_value >= 1000 and self.rng.random() < 0.5:
+            quotient = self._int(d.max_factor, d.max_value // d.max_factor)
+        return ("/", divisor * quotient, divisor)
+
+    def _product(self, d: Difficulty, divide: Optional[bool] = None) -> Node:
+        """Произведение или частное с целым результатом"""
+        a, b = self._int(2, d.max_factor), self._int(2, d.max_factor)
+        if divide is None:
+            divide = self.rng.random() < 0.5
+        return ("/", a * b, b) if divide else ("*", a, b)
+
+    def _mixed(self, d: Difficulty, error_tag: Optional[str]) -> Node:
+        """Два действия разного приоритета без скобок"""
+        # На порядок действий — слабая операция первой и умножение: "a + b * c" слева направо
+        # даёт другой целый ответ
+        order = error_tag == ErrorTag.MISSING_FORMULA
+        high = self._product(d, divide=False if order else None)
+        value = evaluate(high)
+        first = order or self.rng.random() < 0.5
+        if self.rng.random() < 0.5:
+            other = self._int(d.min_value, d.max_value)
+            return ("+", other, high) if first else ("+", high, other)
+        if first:
+            return ("-", value + self._int(d.min_value, d.max_value), high)
+        return ("-", high, self._int(1, value - 1))
+
+    def _expression(self, d: Difficulty, error_tag: Optional[str]) -> Node:
+        """Скобки или два произведения"""
+        if self.rng.random() < d.compound and error_tag != ErrorTag.MISSING_FORMULA:
+            # a * b ± c * d — порядок действий без скобок
+            left, right = self._product(d), self._product(d)
+            if evaluate(left) < evaluate(right):
+                left, right = right, left
+            return (self.rng.choice("+-"), left, right)
+        factor = self._int(2, d.max_factor)
+        if self.rng.random() < 0.5:
+            # (a ± b) / c: сначала частное, потом делимое раскладывается на a и b
+            value = factor * self._int(2, max(2, d.max_value // factor))
+            if self.rng.random() < 0.5:
+                a = self._int(1, value - 1)
+                return ("/", ("+", a, value - a), factor)
+            b = self._int(d.min_value, d.max_value)
+            return ("/", ("-", value + b, b), factor)
+        a, b = self._int(d.min_value, d.max_value), self._int(d.min_value, d.max_value)
+        inner = ("+", a, b) if self.rng.random() < 0.5 else ("-", max(a, b), min(a, b))
+        return ("*", inner, factor) if self.rng.random() < 0.5 else ("*", factor, inner)
+
+    # --- дистракторы ---
+
+    def _distractors(self, category: str, node: Node, answer: int) -> Dict[int, str]:
+        """Неверный ответ -> тип ошибки, которая к нему приводит; сначала — специфичные для категории"""
+        candidates: List[Tuple[Optional[int], ErrorTag]] = []
+        if category in ("mixed", "expression"):
+            candidates.append((_without_parentheses(node), ErrorTag.MISSING_FORMULA))
+            candidates.append((_left_to_right(node), ErrorTag.MISSING_FORMULA))
+        else:
+            op, a, b = node
+            if op == "+":
+                candidates.append((_digitwise(a, b, lambda x, y: x + y), ErrorTag.CALCULATION_ERROR))
+            elif op == "-":
+                candidates.append((_digitwise(a, b, lambda x, y: abs(x - y)), ErrorTag.CALCULATION_ERROR))
+                candidates.append((a + b, ErrorTag.CONCEPT_CONFUSION))
+            elif op == "*":
+                candidates.append((a * (b - 1), ErrorTag.CALCULATION_ERROR))
+                candidates.append((a + b, ErrorTag.CONCEPT_CONFUSION))
+            else:
+                candidates.append((answer + 1, ErrorTag.CALCULATION_ERROR))
+                candidates.append((a - b, ErrorTag.CONCEPT_CONFUSION))
+        candidates.append((answer + 1, ErrorTag.CARELESSNESS))
+        candidates.append((answer - 1, ErrorTag.CARELESSNESS))
+        if answer >= 10:
+            candidates.append((answer + 10, ErrorTag.CARELESSNESS))
+        distractors: Dict[int, str] = {}
+        for value, tag in candidates:
+            if value is not None and value != answer and value >= 0 and value not in distractors:
+                distractors[value] = tag.value
+        return distractors
+
+    def fill(self, per_pool: int, categories: Iterable[str] = CATEGORIES,
+             levels: Iterable[str] = LEVELS) -> List[BankTask]:
+        """per_pool заданий на каждую пару (категория, уровень), поровну по выявляемым ошибкам"""
+        tasks: List[BankTask] = []
+        for category in categories:
+            for level in levels:
+                targets = self._targets(category)
+                for i, error_tag in enumerate(targets):
+                    share = per_pool // len(targets) + (1 if i < per_pool % len(targets) else 0)
+                    tasks.extend(self.generate(category, level, share, error_tag))
+        return tasks
+
+    @staticmethod
+    def _targets(category: str) -> List[Optional[str]]:
+        if category in ("mixed", "expression"):
+            return [None, ErrorTag.MISSING_FORMULA.value]
+        return [None, ErrorTag.CALCULATION_ERROR.value]
+
+
+def extend_bank(bank: TaskBank, per_pool: int, seed: int = 0) -> int:
+    """Добавляет в банк per_pool сгенерированных заданий на (категория, уровень); возвращает их число"""
+    start_id = max(PROCEDURAL_ID_START, max((task.id for task in bank.tasks()), default=0) + 1)
+    return bank.add(ArithmeticGenerator(seed, start_id).fill(per_pool))
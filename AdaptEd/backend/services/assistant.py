@@ -1,19 +1,22 @@
 from typing import List, Dict, Optional
 import os
 import json
+import time
 from datetime import datetime
 
-try:
-	from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM  # type: ignore
-	external_available = True
-except Exception:
-	external_available = False
-
 from utils.persistent_storage import persistent_storage
-import requests
+from utils.state_store import StateMap
 from utils.db import has_db, get_db
+from utils.logger import get_logger
+from utils.tracing import traced
+from utils.metrics import (
+	LLM_REQUEST_DURATION, LLM_QUEUE_WAIT, LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS_PER_SECOND,
+	LLM_GENERATED_TOKENS, LLM_FAILURES, record_cache,
+)
 from models.personality_profile import PersonalityProfile, PersonalityTrait, CommunicationStyle
 
+logger = get_logger("assistant")
+
 
 class AssistantService:
 	"""AI Assistant wrapper with provider selection: hf_api or local pipeline."""
@@ -27,13 +30,23 @@ class AssistantService:
 		self._pipe = None
 		self._tokenizer = None
 		self._model = None
-		self._documents: List[Dict] = self._load_documents()
-		self._personality_profiles: Dict[str, PersonalityProfile] = {}
+		self._documents_cache: Optional[List[Dict]] = None  # загружаются при первом обращении
+		self._personality_profiles: Dict[str, PersonalityProfile] = StateMap("personality_profiles", PersonalityProfile)
 		
 		# Логируем настройки при инициализации
-		print(f"[AssistantService] Провайдер: {self.provider}")
-		print(f"[AssistantService] Ollama URL: {self.ollama_url}")
-		print(f"[AssistantService] Ollama модель: {self.ollama_model}")
+		logger.info("provider=%s ollama_url=%s ollama_model=%s", self.provider, self.ollama_url, self.ollama_model)
+
+	@property
+	def _documents(self) -> List[Dict]:
+		record_cache("assistant_documents", self._documents_cache is not None)
+		if self._documents_cache is None:
+			self._documents_cache = self._load_documents()
+		return self._documents_cache
+
+	def warm_up(self):
+		"""Прогрев после старта (в фоне): документы и, для provider=local, модель"""
+		_ = self._documents
+		self._ensure_pipe()
 
 	def _load_documents(self) -> List[Dict]:
 		if has_db():
@@ -55,7 +68,12 @@ class AssistantService:
 		persistent_storage.set("documents", self._documents)
 
 	def _ensure_pipe(self):
-		if self.provider == "local" and self._pipe is None and external_available:
+		if self.provider == "local" and self._pipe is None:
+			try:
+				# transformers грузится несколько секунд — импортируем только при первом использовании
+				from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM  # type: ignore
+			except Exception:
+				return
 			try:
 				# Используем более легкую модель для чата
 				model_name = os.getenv("HF_MODEL", "microsoft/DialoGPT-medium")
@@ -68,6 +86,7 @@ class AssistantService:
 				except Exception:
 					self._pipe = None
 
+	@traced("llm.ollama", "llm")
 	def _generate_ollama(self, prompt: str, messages: Optional[List[Dict[str, str]]] = None, max_new_tokens: int = 512) -> Optional[str]:
 		"""Генерация через Ollama API (локальная нейросеть)"""
 		url = f"{self.ollama_url}/api/chat"
@@ -95,35 +114,58 @@ class AssistantService:
 			}
 		}
 		
+		import requests
+
+		started = time.perf_counter()
 		try:
-			print(f"[Ollama] Подключение к {url}, модель: {self.ollama_model}")
 			# Отключаем прокси для локальных запросов
 			resp = requests.post(url, json=payload, timeout=120, proxies={"http": None, "https": None})
-			print(f"[Ollama] Статус ответа: {resp.status_code}")
+			elapsed = time.perf_counter() - started
+			LLM_REQUEST_DURATION.observe(elapsed, provider="ollama")
 			
 			if resp.status_code == 200:
 				data = resp.json()
+				self._record_ollama_timings(data, elapsed)
 				message = data.get("message", {})
 				content = message.get("content", "")
 				result = content.strip() if content else None
-				if result:
-					print(f"[Ollama] Успешно получен ответ (длина: {len(result)})")
+				if not result:
+					LLM_FAILURES.inc(provider="ollama", reason="empty")
+					logger.warning("ollama: empty response", extra={"model": self.ollama_model})
 				else:
-					print(f"[Ollama] Пустой ответ от модели")
+					logger.debug("ollama: ok", extra={"model": self.ollama_model, "chars": len(result)})
 				return result
 			else:
-				print(f"[Ollama] Ошибка HTTP {resp.status_code}: {resp.text}")
+				LLM_FAILURES.inc(provider="ollama", reason=f"http_{resp.status_code}")
+				logger.warning("ollama: HTTP %s: %s", resp.status_code, resp.text[:500])
 				return None
 		except requests.exceptions.ConnectionError as e:
 			# Ollama не запущен
-			print(f"[Ollama] Ошибка подключения: {e}")
+			LLM_FAILURES.inc(provider="ollama", reason="connection")
+			logger.warning("ollama: connection error to %s: %s", url, e)
 			return None
 		except Exception as e:
-			print(f"[Ollama] Ошибка: {type(e).__name__}: {e}")
-			import traceback
-			traceback.print_exc()
+			LLM_FAILURES.inc(provider="ollama", reason=type(e).__name__)
+			logger.exception("ollama: request failed")
 			return None
 
+	@staticmethod
+	def _record_ollama_timings(data: Dict, elapsed: float) -> None:
+		"""Ollama возвращает серверные тайминги в наносекундах: из них — ожидание, TTFT и токены/с"""
+		ns = 1e9
+		total = data.get("total_duration")
+		if total:
+			LLM_QUEUE_WAIT.observe(max(0.0, elapsed - total / ns), provider="ollama")
+		ttft = (data.get("load_duration") or 0) + (data.get("prompt_eval_duration") or 0)
+		if ttft:
+			LLM_TIME_TO_FIRST_TOKEN.observe(ttft / ns, provider="ollama")
+		tokens, eval_duration = data.get("eval_count") or 0, data.get("eval_duration") or 0
+		if tokens:
+			LLM_GENERATED_TOKENS.inc(tokens, provider="ollama")
+			if eval_duration:
+				LLM_TOKENS_PER_SECOND.observe(tokens / (eval_duration / ns), provider="ollama")
+
+	@traced("llm.hf_api", "llm")
 	def _generate_hf_api(self, prompt: str, max_new_tokens: int = 256) -> Optional[str]:
 		"""Генерация через Hugging Face API"""
 		# Пробуем с токеном, если нет - используем публичный API
@@ -141,8 +183,14 @@ class AssistantService:
 				"return_full_text": False
 			}
 		}
+		import requests
+
+		started = time.perf_counter()
 		try:
 			resp = requests.post(url, headers=headers, json=payload, timeout=60)
+			LLM_REQUEST_DURATION.observe(time.perf_counter() - started, provider="hf_api")
+			if resp.status_code != 200:
+				LLM_FAILURES.inc(provider="hf_api", reason=f"http_{resp.status_code}")
 			if resp.status_code == 200:
 				data = resp.json()
 				if isinstance(data, list) and data and isinstance(data[0], dict):
@@ -162,8 +210,10 @@ class AssistantService:
 				return None
 			return None
 		except Exception as e:
+			LLM_FAILURES.inc(provider="hf_api", reason=type(e).__name__)
 			return None
 
+	@traced("llm.generate", "llm")
 	def _generate(self, prompt: str, max_new_tokens: int = 256, messages: Optional[List[Dict[str, str]]] = None) -> str:
 		# Пробуем Ollama первым (локальная нейросеть)
 		ollama_text = None
@@ -172,7 +222,7 @@ class AssistantService:
 			if ollama_text:
 				return ollama_text
 			# Fallback на другие провайдеры если Ollama недоступна
-			print("Ollama недоступна, пробуем другие провайдеры...")
+			logger.info("ollama unavailable, falling back to other providers")
 		
 		if self.provider == "hf_api" or (self.provider == "ollama" and not ollama_text):
 			api_text = self._generate_hf_api(prompt, max_new_tokens)
@@ -183,12 +233,13 @@ class AssistantService:
 		self._ensure_pipe()
 		if self._pipe is not None:
 			try:
-				result = self._pipe(prompt, max_new_tokens=max_new_tokens)
+				with LLM_REQUEST_DURATION.time(provider="local"):
+					result = self._pipe(prompt, max_new_tokens=max_new_tokens)
 				if isinstance(result, list) and result:
 					text = result[0].get("generated_text") or result[0].get("summary_text") or ""
 					return text if isinstance(text, str) else str(text)
-			except Exception:
-				pass
+			except Exception as e:
+				LLM_FAILURES.inc(provider="local", reason=type(e).__name__)
 		
 		return "Извините, модель временно недоступна. Убедитесь, что Ollama запущена (ollama serve) или проверьте настройки провайдера."
 
@@ -201,8 +252,10 @@ class AssistantService:
 			return ""
 		try:
 			from models.homework import Homework  # type: ignore
+			from sqlalchemy.orm import joinedload  # type: ignore
 			rows = (
 				sess.query(Homework)
+				.options(joinedload(Homework.template))
 				.filter(Homework.assigned_to == user_id)
 				.filter(Homework.status.in_(["new", "in_progress", "submitted"]))
 				.order_by(Homework.due_date.asc().nulls_last())
@@ -339,9 +392,11 @@ class AssistantService:
 	
 	def get_personality_profile(self, user_id: str) -> Optional[PersonalityProfile]:
 		"""Получить профиль личности ученика"""
-		if user_id not in self._personality_profiles:
-			self._personality_profiles[user_id] = PersonalityProfile(user_id=user_id)
-		return self._personality_profiles.get(user_id)
+		profile = self._personality_profiles.get(user_id)
+		if profile is None:
+			profile = PersonalityProfile(user_id=user_id)
+			self._personality_profiles[user_id] = profile
+		return profile
 	
 	def update_personality_from_chat(self, user_id: str, messages: List[Dict[str, str]]):
 		"""Обновляет профиль личности на основе диалога"""
@@ -427,6 +482,7 @@ class AssistantService:
 						profile.traits[trait_name] = PersonalityTrait(trait_name=trait_name, score=float(score))
 					else:
 						profile.traits[trait_name].score = (profile.traits[trait_name].score + float(score)) / 2
+				self._personality_profiles[user_id] = profile
 				return traits
 		except Exception:
 			pass
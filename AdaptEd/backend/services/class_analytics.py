@@ -0,0 +1,300 @@
+"""
+Материализованная аналитика классов для отчётов учителя (agents/teacher_analytics_agent.py).
+
+Отчёт не собирается из профилей при каждом запросе. Вместо этого хранятся три вида данных, которые
+обновляются потоком попыток (record — из оркестратора после каждой отправки):
+- строка ученика (StudentSummary): точность, уровень, ошибки, освоение тем — всё, что нужно отчётам;
+- недельные агрегаты класса (ClassWeek): попытки, верные ответы и время по (тема, тип ошибки)
+  за неделю (с понедельника);
+- метаданные класса (ClassMeta): версия, время изменения, список учеников и недель.
+
+Каждый ученик попадает в вид своего класса (class_id из пользователей; "" — без класса) и в общий
+вид ALL_STUDENTS. Версия класса растёт при каждом изменении — по ней строятся ETag и Last-Modified
+отчётов, а готовые отчёты кэшируются до следующего изменения.
+
+Запись — чтение-изменение-запись без блокировок между воркерами, а класс ученика запоминается
+в процессе при первой попытке (ученики, зарегистрированные позже, дочитываются из пользователей). Расхождения (гонки воркеров, смена класса, пакетные пересчёты
+профилей) исправляет полная пересборка rebuild по истории попыток — по расписанию
+(CLASS_ANALYTICS_REBUILD_AT) или POST /admin/rebuild-class-analytics.
+"""
+import hashlib
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from models.attempt_log import error_tag, text_codes
+from models.cognitive_profile import CognitiveProfile, TaskAttempt
+from services.mastery import get_mastery_engine
+from utils.logger import get_logger
+from utils.state_store import StateMap
+
+logger = get_logger("class_analytics")
+
+# Время ежедневной полной пересборки ("HH:MM", локальное); пусто — выключено
+CLASS_ANALYTICS_REBUILD_AT = os.getenv("CLASS_ANALYTICS_REBUILD_AT", "")
+
+ALL_STUDENTS = "*"  # вид по всем ученикам (отчёт без class_id)
+NO_CLASS = ""  # ученики без класса
+
+_DAY_US = 86_400_000_000
+_EPOCH = datetime(1970, 1, 1)
+_NEVER = datetime(2000, 1, 1)  # Last-Modified вида, в который ещё ничего не записано
+
+
+class StudentSummary(BaseModel):
+    """Строка ученика в аналитике класса — поля профиля, которые нужны отчётам"""
+    user_id: str
+    class_id: str = NO_CLASS
+    accuracy_rate: float = 0.0
+    total_tasks_completed: int = 0
+    history_length: int = 0
+    level: int = 1
+    points: int = 0
+    achievements: List[str] = Field(default_factory=list)
+    error_frequency: Dict[str, int] = Field(default_factory=dict)
+    # Снимок оценок освоения тем (MasteryEngine.snapshot)
+    mastery: Dict[str, Dict[str, float]] = Field(default_factory=dict)
+    current_emotional_state: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+class AggregateCell(BaseModel):
+    """Попытки за неделю по одной паре (тема, тип ошибки)"""
+    attempts: int = 0
+    correct: int = 0
+    time_spent_seconds: int = 0  # сумма по попыткам с известным временем
+    timed: int = 0
+
+
+class ClassWeek(BaseModel):
+    """Недельные агрегаты класса"""
+    class_id: str
+    week: date  # понедельник
+    # "тема|тип ошибки" -> агрегат; пустая тема — неизвестна, пустой тип — ошибки нет
+    cells: Dict[str, AggregateCell] = Field(default_factory=dict)
+
+
+class ClassMeta(BaseModel):
+    """Версия и состав вида класса"""
+    class_id: str
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+    rebuilt_at: Optional[datetime] = None
+    # Ученики класса; у ALL_STUDENTS пусто — это все строки учеников
+    students: List[str] = Field(default_factory=list)
+    weeks: List[date] = Field(default_factory=list)
+
+
+def week_start(moment: datetime) -> date:
+    """Понедельник недели"""
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+
+def cell_key(topic: Optional[str], error_type: Optional[str]) -> str:
+    return f"{topic or ''}|{getattr(error_type, 'value', error_type) or ''}"
+
+
+def split_cell_key(key: str) -> Tuple[str, str]:
+    topic, error_type = key.rsplit("|", 1)
+    return topic, error_type
+
+
+def _week_key(class_id: str, week: date) -> str:
+    return f"{class_id}/{week.isoformat()}"
+
+
+class ClassAnalytics:
+    """Материализованные виды классов: инкрементальное обновление и полная пересборка"""
+
+    def __init__(self):
+        # Общие для всех воркеров (см. utils/state_store.py)
+        self.students: Dict[str, StudentSummary] = StateMap("class_analytics_students", StudentSummary)
+        self.weeks: Dict[str, ClassWeek] = StateMap("class_analytics_weeks", ClassWeek)
+        self.meta: Dict[str, ClassMeta] = StateMap("class_analytics_meta", ClassMeta)
+        # Класс ученика (из пользователей), запоминается в процессе до пересборки
+        self._class_of: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    # --- состав классов ---
+
+    @staticmethod
+    def _users() -> Dict[str, dict]:
+        from utils.persistent_storage import persistent_storage
+        return persistent_storage.get("users", {}) or {}
+
+    @classmethod
+    def _load_classes(cls) -> Dict[str, str]:
+        return {user_id: user.get("class_id") or NO_CLASS for user_id, user in cls._users().items()}
+
+    def class_of(self, user_id: str) -> str:
+        if self._class_of is None:
+            self._class_of = self._load_classes()
+        class_id = self._class_of.get(user_id)
+        if class_id is None:
+            # Ученик мог зарегистрироваться после загрузки карты — перечитываем пользователей.
+            # Неизвестный id не запоминается: класс найдётся, когда пользователь появится
+            user = self._users().get(user_id)
+            if user is None:
+                return NO_CLASS
+            class_id = self._class_of[user_id] = user.get("class_id") or NO_CLASS
+        return class_id
+
+    @staticmethod
+    def view_key(class_id: Optional[str]) -> str:
+        return ALL_STUDENTS if class_id is None else class_id
+
+    # --- инкрементальное обновление ---
+
+    @staticmethod
+    def summarize(profile: CognitiveProfile, class_id: str) -> StudentSummary:
+        return StudentSummary(
+            user_id=profile.user_id,
+            class_id=class_id,
+            accuracy_rate=profile.accuracy_rate,
+            total_tasks_completed=profile.total_tasks_completed,
+            history_length=len(profile.task_history),
+            level=profile.level,
+            points=profile.points,
+            achievements=list(profile.achievements),
+            error_frequency={getattr(tag, "value", tag): count for tag, count in profile.error_frequency.items()},
+            mastery=get_mastery_engine().snapshot(profile),
+            current_emotional_state=getattr(profile.current_emotional_state, "value", profile.current_emotional_state),
+        )
+
+    def record(self, profile: CognitiveProfile, attempts: Iterable[TaskAttempt]):
+        """Учитывает новые попытки ученика (профиль — уже обновлённый) в виде его класса и общем виде"""
+        class_id = self.class_of(profile.user_id)
+        self.students[profile.user_id] = self.summarize(profile, class_id)
+        by_week: Dict[date, List[TaskAttempt]] = {}
+        for attempt in attempts:
+            by_week.setdefault(week_start(attempt.timestamp), []).append(attempt)
+        now = datetime.now()
+        with self._lock:
+            for view in {class_id, ALL_STUDENTS}:
+                for week, week_attempts in by_week.items():
+                    stored = self.weeks.get(_week_key(view, week)) or ClassWeek(class_id=view, week=week)
+                    for attempt in week_attempts:
+                        error_type = attempt.error_analysis.error_type if attempt.error_analysis else None
+                        cell = stored.cells.setdefault(cell_key(attempt.topic, error_type), AggregateCell())
+                        cell.attempts += 1
+                        cell.correct += int(attempt.is_correct)
+                        if attempt.time_spent_seconds is not None:
+                            cell.time_spent_seconds += attempt.time_spent_seconds
+                            cell.timed += 1
+                    self.weeks[_week_key(view, week)] = stored
+                meta = self.meta.get(view) or ClassMeta(class_id=view)
+                meta.version += 1
+                meta.updated_at = now
+                if view != ALL_STUDENTS and profile.user_id not in meta.students:
+                    meta.students.append(profile.user_id)
+                meta.weeks = sorted(set(meta.weeks) | set(by_week))
+                self.meta[view] = meta
+
+    # --- полная пересборка ---
+
+    @staticmethod
+    def _aggregate(profiles: List[CognitiveProfile]) -> Dict[Tuple[date, str], AggregateCell]:
+        """Агрегаты (неделя, "тема|тип ошибки") по истории попыток — группировка колонок через np.unique"""
+        logs = [profile.task_history for profile in profiles if len(profile.task_history)]
+        if not logs:
+            return {}
+        timestamps = np.concatenate([log.column("timestamp") for log in logs])
+        days = timestamps // _DAY_US
+        monday = days - (days + 3) % 7  # 1970-01-01 — четверг
+        topics, topic_text = text_codes(logs, "topic")
+        errors = np.concatenate([log.column("error_type") for log in logs]).astype(np.int64)
+        correct = np.concatenate([log.column("is_correct") for log in logs]).astype(np.int64)
+        time_spent = np.concatenate([log.column("time_spent_seconds") for log in logs]).astype(np.int64)
+        timed = time_spent > np.iinfo(np.int32).min + 1
+
+        groups, inverse = np.unique(np.stack([monday, topics, errors]), axis=1, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        attempts = np.bincount(inverse)
+        correct_sums = np.bincount(inverse, weights=correct)
+        time_sums = np.bincount(inverse, weights=np.where(timed, time_spent, 0))
+        timed_counts = np.bincount(inverse, weights=timed)
+
+        result = {}
+        for i, (day, topic, code) in enumerate(groups.T.tolist()):
+            tag = error_tag(code)
+            key = (_EPOCH.date() + timedelta(days=day), cell_key(topic_text(topic), tag))
+            result[key] = AggregateCell(
+                attempts=int(attempts[i]), correct=int(correct_sums[i]),
+                time_spent_seconds=int(time_sums[i]), timed=int(timed_counts[i]),
+            )
+        return result
+
+    def rebuild(self, profiles: List[CognitiveProfile]) -> Dict:
+        """Пересобирает все виды по профилям учеников; версии растут, устаревшие записи удаляются"""
+        with self._lock:
+            self._class_of = self._load_classes()
+            by_class: Dict[str, List[CognitiveProfile]] = {ALL_STUDENTS: list(profiles)}
+            for profile in profiles:
+                class_id = self.class_of(profile.user_id)
+                by_class.setdefault(class_id, []).append(profile)
+                self.students[profile.user_id] = self.summarize(profile, class_id)
+
+            now = datetime.now()
+            week_keys = set()
+            for view, members in by_class.items():
+                weeks: Dict[date, ClassWeek] = {}
+                for (week, key), cell in self._aggregate(members).items():
+                    weeks.setdefault(week, ClassWeek(class_id=view, week=week)).cells[key] = cell
+                for week, stored in weeks.items():
+                    self.weeks[_week_key(view, week)] = stored
+                    week_keys.add(_week_key(view, week))
+                previous = self.meta.get(view)
+                self.meta[view] = ClassMeta(
+                    class_id=view, version=(previous.version if previous else 0) + 1, updated_at=now, rebuilt_at=now,
+                    students=[] if view == ALL_STUDENTS else [profile.user_id for profile in members], weeks=sorted(weeks),
+                )
+
+            known = {profile.user_id for profile in profiles}
+            for user_id in [user_id for user_id in self.students if user_id not in known]:
+                del self.students[user_id]
+            for key in [key for key in self.weeks if key not in week_keys]:
+                del self.weeks[key]
+            for view in [view for view in self.meta if view not in by_class]:
+                del self.meta[view]
+        cells = sum(len(self.weeks[key].cells) for key in week_keys)
+        logger.info("class analytics rebuilt: %d students, %d classes, %d cells", len(profiles), len(by_class) - 1, cells)
+        return {"students": len(profiles), "classes": len(by_class) - 1, "weeks": len(week_keys), "cells": cells}
+
+    # --- чтение ---
+
+    def get_meta(self, class_id: Optional[str]) -> ClassMeta:
+        view = self.view_key(class_id)
+        return self.meta.get(view) or ClassMeta(class_id=view, updated_at=_NEVER)
+
+    def validators(self, class_id: Optional[str], variant: str = "") -> Tuple[str, datetime]:
+        """ETag и Last-Modified (UTC) вида класса; variant — тип отчёта или другой вид ответа"""
+        meta = self.get_meta(class_id)
+        digest = hashlib.sha1(f"{meta.class_id}|{meta.version}|{meta.updated_at.isoformat()}|{variant}".encode()).hexdigest()
+        return f'"{digest[:20]}"', meta.updated_at.astimezone(timezone.utc)
+
+    def class_students(self, class_id: Optional[str]) -> List[StudentSummary]:
+        """Строки учеников вида по user_id"""
+        user_ids = list(self.students) if class_id is None else self.get_meta(class_id).students
+        return [row for row in (self.students.get(user_id) for user_id in sorted(user_ids)) if row is not None]
+
+    def class_weeks(self, class_id: Optional[str], last: Optional[int] = None) -> List[ClassWeek]:
+        """Недельные агрегаты вида по возрастанию недели (последние last недель)"""
+        meta = self.get_meta(class_id)
+        weeks = meta.weeks[-last:] if last else meta.weeks
+        return [stored for stored in (self.weeks.get(_week_key(meta.class_id, week)) for week in weeks) if stored is not None]
+
+
+_analytics: Optional[ClassAnalytics] = None
+
+
+def get_class_analytics() -> ClassAnalytics:
+    """Общий экземпляр ClassAnalytics; создаётся при первом обращении"""
+    global _analytics
+    if _analytics is None:
+        _analytics = ClassAnalytics()
+    return _analytics
@@ -0,0 +1,247 @@
+"""
+Оценка освоения тем — Bayesian Knowledge Tracing (BKT).
+
+Для каждой пары (ученик, тема) хранится вероятность того, что тема освоена (CognitiveProfile.mastery).
+Каждая попытка обновляет её за O(1) по формуле Байеса с параметрами темы:
+    p_init    — вероятность, что тема освоена до первой попытки
+    p_transit — вероятность освоить тему после очередной попытки
+    p_slip    — вероятность ошибиться, зная тему
+    p_guess   — вероятность угадать, не зная темы
+Неопределённость оценки — стандартное отклонение бинарного "освоено / не освоено": sqrt(p * (1 - p)).
+
+Параметры подбираются пакетно (refit) по всей истории попыток: перебором сетки с векторным
+прямым проходом NumPy сразу по всем наборам параметров и всем ученикам. Параметры темы хранятся
+в общем хранилище ("mastery_params"); для тем с малым числом попыток используются общие ("*"),
+до первого подбора — значения по умолчанию.
+"""
+import itertools
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from models.attempt_log import text_codes
+from models.cognitive_profile import CognitiveProfile, TopicMastery
+from utils.logger import get_logger
+from utils.state_store import StateMap
+
+logger = get_logger("mastery")
+
+# Тема попыток без явной темы (совпадает с темой по умолчанию генератора заданий)
+DEFAULT_TOPIC = "general"
+GLOBAL_PARAMS_KEY = "*"
+
+# Сетка перебора при подборе параметров; p_slip и p_guess < 0.5 — иначе модель неидентифицируема
+GRID = {
+    "p_init": (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9),
+    "p_transit": (0.02, 0.05, 0.1, 0.15, 0.2, 0.3),
+    "p_slip": (0.05, 0.1, 0.15, 0.2, 0.3),
+    "p_guess": (0.1, 0.15, 0.2, 0.25, 0.3, 0.4),
+}
+# Размер блока (наборов параметров x последовательностей) при переборе: промежуточные массивы
+# помещаются в кэш процессора — так перебор в 2-3 раза быстрее, чем одним большим блоком
+_MAX_CELLS = 100_000
+
+
+class BKTParams(BaseModel):
+    """Параметры BKT для темы"""
+    p_init: float = 0.3
+    p_transit: float = 0.1
+    p_slip: float = 0.1
+    p_guess: float = 0.2
+    # Метаданные подбора
+    fitted_attempts: int = 0
+    log_likelihood: Optional[float] = None
+    fitted_at: Optional[datetime] = None
+
+
+def bkt_step(known: float, is_correct: bool, params: BKTParams) -> float:
+    """Одно наблюдение: апостериорная вероятность освоения с учётом перехода"""
+    if is_correct:
+        evidence = known * (1 - params.p_slip)
+        posterior = evidence / (evidence + (1 - known) * params.p_guess)
+    else:
+        evidence = known * params.p_slip
+        posterior = evidence / (evidence + (1 - known) * (1 - params.p_guess))
+    return posterior + (1 - posterior) * params.p_transit
+
+
+def uncertainty(known: float) -> float:
+    return math.sqrt(max(0.0, known * (1 - known)))
+
+
+def bkt_forward(correct: np.ndarray, lengths: np.ndarray, p_init: np.ndarray, p_transit: np.ndarray,
+                p_slip: np.ndarray, p_guess: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Прямой проход BKT сразу для P наборов параметров и S последовательностей.
+
+    correct — (S, T) 0/1, последовательности выровнены влево и отсортированы по убыванию длины;
+    lengths — (S,) длины. Параметры — массивы (P,).
+    Возвращает логарифм правдоподобия ответов (P,) и вероятность освоения после последней попытки (P, S).
+    """
+    known = np.repeat(p_init[:, None], len(lengths), axis=1)
+    loglik = np.zeros(len(p_init))
+    slip, guess, transit = p_slip[:, None], p_guess[:, None], p_transit[:, None]
+    for t in range(correct.shape[1]):
+        # Последовательности отсортированы по длине: на шаге t активны первые active
+        active = int(np.searchsorted(-lengths, -t, side="left"))
+        if active == 0:
+            break
+        k = known[:, :active]
+        obs = correct[:active, t].astype(bool)[None, :]
+        p_correct = k * (1 - slip) + (1 - k) * guess
+        likelihood = np.where(obs, p_correct, 1 - p_correct)
+        loglik += np.log(np.maximum(likelihood, 1e-12)).sum(axis=1)
+        posterior = np.where(obs, k * (1 - slip), k * slip) / likelihood
+        known[:, :active] = posterior + (1 - posterior) * transit
+    return loglik, known
+
+
+def _pack(sequences: Sequence[np.ndarray], max_len: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Последовательности -> матрица (S, T) по убыванию длины, длины и порядок (индексы исходных)"""
+    if max_len is not None:
+        sequences = [seq[-max_len:] for seq in sequences]
+    lengths = np.fromiter((len(seq) for seq in sequences), dtype=np.int64, count=len(sequences))
+    order = np.argsort(-lengths, kind="stable")
+    matrix = np.zeros((len(sequences), int(lengths.max()) if len(sequences) else 0), dtype=np.int8)
+    for row, idx in enumerate(order):
+        matrix[row, :lengths[idx]] = sequences[idx]
+    return matrix, lengths[order], order
+
+
+def fit_params(sequences: Sequence[np.ndarray], max_len: int = 200) -> BKTParams:
+    """Подбор параметров по максимуму правдоподобия перебором сетки GRID"""
+    correct, lengths, _ = _pack(sequences, max_len)
+    grid = np.array(list(itertools.product(*GRID.values())), dtype=np.float64)
+    chunk = max(1, _MAX_CELLS // max(1, len(lengths)))
+    loglik = np.concatenate([
+        bkt_forward(correct, lengths, *grid[start:start + chunk].T)[0]
+        for start in range(0, len(grid), chunk)
+    ])
+    best = int(np.argmax(loglik))
+    return BKTParams(
+        **dict(zip(GRID, grid[best].tolist())),
+        fitted_attempts=int(lengths.sum()), log_likelihood=float(loglik[best]), fitted_at=datetime.now(),
+    )
+
+
+class MasteryEngine:
+    """Обновление и пакетный пересчёт оценок освоения тем"""
+
+    def __init__(self):
+        # Общие для всех воркеров (см. utils/state_store.py)
+        self.params: Dict[str, BKTParams] = StateMap("mastery_params", BKTParams)
+
+    def params_for(self, topic: str) -> BKTParams:
+        return self.params.get(topic) or self.params.get(GLOBAL_PARAMS_KEY) or BKTParams()
+
+    def update(self, profile: CognitiveProfile, topic: Optional[str], is_correct: bool) -> TopicMastery:
+        """Учитывает одну попытку по теме (O(1)); профиль нужно сохранить вызывающему"""
+        topic = topic or DEFAULT_TOPIC
+        params = self.params_for(topic)
+        state = profile.mastery.get(topic)
+        known = bkt_step(state.mastery if state else params.p_init, is_correct, params)
+        state = TopicMastery(
+            mastery=known,
+            uncertainty=uncertainty(known),
+            attempts=(state.attempts if state else 0) + 1,
+            correct=(state.correct if state else 0) + (1 if is_correct else 0),
+        )
+        profile.mastery[topic] = state
+        profile.topic_mastery[topic] = round(known, 4)
+        return state
+
+    def estimate(self, profile: CognitiveProfile, topic: Optional[str]) -> TopicMastery:
+        """Текущая оценка по теме; для темы без попыток — априорная p_init"""
+        topic = topic or DEFAULT_TOPIC
+        state = profile.mastery.get(topic)
+        if state is not None:
+            return state
+        known = self.params_for(topic).p_init
+        return TopicMastery(mastery=known, uncertainty=uncertainty(known))
+
+    def snapshot(self, profile: CognitiveProfile) -> Dict[str, Dict[str, float]]:
+        """Оценки по всем темам ученика — для API и аналитики"""
+        return {
+            topic: {
+                "mastery": round(state.mastery, 4),
+                "uncertainty": round(state.uncertainty, 4),
+                "attempts": state.attempts,
+                "correct": state.correct,
+            }
+            for topic, state in sorted(profile.mastery.items())
+        }
+
+    def refit(self, profiles: List[CognitiveProfile], min_attempts: int = 200, max_len: int = 200) -> Dict:
+        """
+        Подбирает параметры по истории попыток всех profiles и пересчитывает по ним их оценки.
+
+        Общие параметры ("*") — по всем темам сразу; собственные — для тем, где не меньше
+        min_attempts попыток. Для подбора берутся последние max_len попыток каждой пары
+        ученик-тема, оценки пересчитываются по полной истории. Профили изменяются на месте.
+        """
+        # topic -> [(номер профиля, ответы по теме в порядке попыток)]
+        by_topic: Dict[str, List[Tuple[int, np.ndarray]]] = {}
+        for idx, profile in enumerate(profiles):
+            topics, topic_text = text_codes([profile.task_history], "topic")
+            correct = profile.task_history.column("is_correct")
+            # Попытки без темы и с темой "general" — одна последовательность: коды тем собираются
+            # по названию, и ответы берутся одной маской, в исходном порядке попыток
+            codes: Dict[str, List[int]] = {}
+            for topic_id in np.unique(topics).tolist():
+                codes.setdefault(topic_text(topic_id) or DEFAULT_TOPIC, []).append(topic_id)
+            for topic, topic_ids in codes.items():
+                by_topic.setdefault(topic, []).append((idx, correct[np.isin(topics, topic_ids)]))
+
+        all_sequences = [seq for items in by_topic.values() for _, seq in items]
+        if not all_sequences:
+            return {"profiles": len(profiles), "topics": {}}
+
+        fitted = {GLOBAL_PARAMS_KEY: fit_params(all_sequences, max_len)}
+        self.params[GLOBAL_PARAMS_KEY] = fitted[GLOBAL_PARAMS_KEY]
+        for topic, items in by_topic.items():
+            if sum(len(seq) for _, seq in items) >= min_attempts:
+                fitted[topic] = fit_params([seq for _, seq in items], max_len)
+                self.params[topic] = fitted[topic]
+
+        for topic, items in by_topic.items():
+            params = self.params_for(topic)
+            correct, lengths, order = _pack([seq for _, seq in items])
+            _, known = bkt_forward(
+                correct, lengths, *(np.array([getattr(params, name)]) for name in GRID),
+            )
+            for row, item in enumerate(order):
+                idx, seq = items[item]
+                value = float(known[0, row])
+                profiles[idx].mastery[topic] = TopicMastery(
+                    mastery=value, uncertainty=uncertainty(value), attempts=len(seq), correct=int(seq.sum()),
+                )
+                profiles[idx].topic_mastery[topic] = round(value, 4)
+
+        logger.info("mastery refit: %d profiles, %d topics, %d with own params",
+                    len(profiles), len(by_topic), len(fitted) - 1)
+        return {
+            "profiles": len(profiles),
+            "topics": {
+                topic: {
+                    "students": len(items),
+                    "attempts": int(sum(len(seq) for _, seq in items)),
+                    "params": topic if topic in fitted else GLOBAL_PARAMS_KEY,
+                }
+                for topic, items in by_topic.items()
+            },
+            "params": {key: params.dict(exclude={"fitted_at"}) for key, params in fitted.items()},
+        }
+
+
+_engine: Optional[MasteryEngine] = None
+
+
+def get_mastery_engine() -> MasteryEngine:
+    """Общий экземпляр MasteryEngine; создаётся при первом обращении"""
+    global _engine
+    if _engine is None:
+        _engine = MasteryEngine()
+    return _engine
@@ -0,0 +1,139 @@
+"""
+Признаки текста задания, которые нужны агентам: какие операции есть в выражении, величина
+операндов, глубина дерева выражения и скобки.
+
+Признаки считаются один раз — когда задание попадает в банк (services/task_bank.py хранит их
+по id задания, TaskBank.features_for) — а не при каждом неверном ответе. Для вопросов не из банка
+(тесты, задания учителя) question_features кэширует разбор по тексту.
+
+Разбор — ast без eval: разрешены целые числа, + - * / (и × ÷ − :) и скобки. Если текст не
+выражение (текстовая задача), операции ищутся по символам, операнды — по числам в тексте,
+depth = 0 и parsed = False. Тот же обход дерева (fold_expression) вычисляет выражения в
+services/arithmetic_generator.py (safe_eval).
+"""
+import ast
+import re
+from functools import lru_cache
+from typing import Callable, List, Optional, TypeVar
+
+# Битовые флаги операций
+OP_ADD, OP_SUB, OP_MUL, OP_DIV = 1, 2, 4, 8
+OPERATOR_FLAGS = {"+": OP_ADD, "-": OP_SUB, "−": OP_SUB, "*": OP_MUL, "×": OP_MUL, "/": OP_DIV, "÷": OP_DIV}
+_AST_FLAGS = {ast.Add: OP_ADD, ast.Sub: OP_SUB, ast.Mult: OP_MUL, ast.Div: OP_DIV}
+_NUMBER = re.compile(r"\d+")
+_MAX_EXPRESSION_LENGTH = 200
+
+T = TypeVar("T")
+
+
+def normalize_expression(text: str) -> str:
+    """Знаки × ÷ − : заменяются на * / - / — текст можно разобрать ast"""
+    return text.replace("×", "*").replace("÷", "/").replace("−", "-").replace(":", "/")
+
+
+def operator_flags(question: Optional[str]) -> int:
+    """Битовая маска операций, встречающихся в тексте (0 — ни одной)"""
+    flags = 0
+    for symbol, flag in OPERATOR_FLAGS.items():
+        if symbol in (question or ""):
+            flags |= flag
+    return flags
+
+
+class QuestionFeatures:
+    """Признаки задания (неизменяемые; одна запись на задание банка)"""
+
+    __slots__ = ("operators", "operand_count", "min_operand", "max_operand", "max_digits", "depth", "parentheses", "parsed")
+
+    def __init__(self, operators: int = 0, operands: List[int] = (), depth: int = 0, parentheses: int = 0,
+                 parsed: bool = False):
+        magnitudes = [abs(value) for value in operands]
+        self.operators = operators
+        self.operand_count = len(magnitudes)
+        self.min_operand = min(magnitudes) if magnitudes else 0
+        self.max_operand = max(magnitudes) if magnitudes else 0
+        self.max_digits = len(str(self.max_operand)) if magnitudes else 0
+        # Глубина дерева выражения: 0 — одно число, 1 — a + b, 2 — (a + b) * c или a + b * c
+        self.depth = depth
+        # Пар скобок в тексте
+        self.parentheses = parentheses
+        self.parsed = parsed
+
+    def has(self, flag: int) -> bool:
+        return bool(self.operators & flag)
+
+    @property
+    def mixed_precedence(self) -> bool:
+        """Есть и сложение/вычитание, и умножение/деление — важен порядок действий"""
+        return bool(self.operators & (OP_ADD | OP_SUB)) and bool(self.operators & (OP_MUL | OP_DIV))
+
+    def dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, QuestionFeatures) and self.dict() == other.dict()
+
+    def __repr__(self) -> str:
+        return f"QuestionFeatures({', '.join(f'{key}={value}' for key, value in self.dict().items())})"
+
+
+def fold_expression(
+    expression: str,
+    number: Callable[[int], T],
+    binary: Callable[[int, T, T], T],
+    negate: Callable[[T], T],
+) -> T:
+    """
+    Свёртка дерева арифметического выражения (текст после normalize_expression): number(значение)
+    для числа, binary(флаг OP_*, левое, правое) для операции, negate(x) для унарного минуса.
+    ValueError — выражение слишком длинное, не разбирается или содержит что-то кроме целых чисел и + - * /
+    """
+    if len(expression) > _MAX_EXPRESSION_LENGTH:
+        raise ValueError("Expression is too long")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {expression!r}") from e
+
+    def fold(node: ast.AST) -> T:
+        if isinstance(node, ast.Constant) and type(node.value) is int:
+            return number(node.value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = fold(node.operand)
+            return negate(value) if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp) and type(node.op) in _AST_FLAGS:
+            return binary(_AST_FLAGS[type(node.op)], fold(node.left), fold(node.right))
+        raise ValueError(f"Unsupported element: {type(node).__name__}")
+    return fold(tree.body)
+
+
+def parse_question(question: str) -> QuestionFeatures:
+    """Признаки текста задания (без кэша — см. question_features)"""
+    text = normalize_expression(question or "").replace("?", "").split("=")[0].strip()
+    parentheses = text.count("(")
+    if text:
+        operands: List[int] = []
+
+        def number(value: int) -> tuple:
+            operands.append(value)
+            return 0, 0
+
+        def binary(flag: int, left: tuple, right: tuple) -> tuple:
+            # (флаги операций, глубина)
+            return left[0] | right[0] | flag, 1 + max(left[1], right[1])
+        try:
+            flags, depth = fold_expression(text, number, binary, lambda value: value)
+        except ValueError:
+            pass
+        else:
+            return QuestionFeatures(flags, operands, depth, parentheses, parsed=True)
+    return QuestionFeatures(
+        operator_flags(question), [int(number) for number in _NUMBER.findall(question or "")],
+        parentheses=parentheses,
+    )
+
+
+@lru_cache(maxsize=4096)
+def question_features(question: str) -> QuestionFeatures:
+    """Признаки вопроса не из банка; разбор кэшируется по тексту"""
+    return parse_question(question)
@@ -1,5 +1,9 @@
 from typing import List, Dict
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from services.timeseries import get_time_series
+
+TREND_DAYS = 14
 
 class RecommendationService:
     def __init__(self):
@@ -106,13 +110,10 @@ class RecommendationService:
             "areas_to_improve": []
         }
         
-        # Calculate trend from recent history
-        if len(history) >= 3:
-            recent_results = [entry.get('results', []) for entry in history[-3:]]
-            trend = []
-            for session_results in recent_results:
-                session_correct = sum(1 for r in session_results if r.get('is_correct', False))
-                trend.append(session_correct / len(session_results) if session_results else 0)
-            stats["performance_trend"] = trend
+        # Trend: daily accuracy over the last TREND_DAYS days from the pre-bucketed time series
+        series = get_time_series().query(
+            "student", user_id, start=datetime.now() - timedelta(days=TREND_DAYS), resolution="day"
+        )
+        stats["performance_trend"] = [point["accuracy"] / 100 for point in series["points"]]
         
         return stats
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+Интервальное повторение заданий (SM-2).
+
+Для каждой пары (ученик, задание) хранится карточка: коэффициент лёгкости, число успешных
+повторений подряд, интервал и дата следующего повторения. Каждая попытка (TaskAttempt) — оценка
+по шкале SM-2 (0-5): верный ответ — GRADE_CORRECT, ошибка по невнимательности — GRADE_CARELESS,
+остальные ошибки — GRADE_WRONG. После ошибки задание возвращается через день, после верных
+ответов интервал растёт: 1 день, 6 дней, дальше — умножением на коэффициент лёгкости.
+
+Очередь ученика — двоичная куча (срок, id задания) с ленивым удалением: при новой попытке в кучу
+кладётся новая запись, а старая считается устаревшей (её срок не совпадает со сроком карточки).
+Обновление в памяти — O(log n); k ближайших сроков — O(k log k) обходом кучи без её изменения.
+Куча пересобирается, когда устаревших записей становится больше, чем карточек.
+
+Расписания хранятся в общем хранилище ("review_schedules") отдельно от профиля, одной записью на
+ученика. Поэтому при сериализующем хранилище (STATE_BACKEND=sqlite) каждая попытка читает и
+перезаписывает расписание целиком — O(n) по числу карточек ученика (~3 мс на 100 карточек, ~20 мс
+на 1000). Пакетная отправка (record_many) платит эту цену один раз на ученика.
+
+recompute пересобирает расписания по истории попыток профилей — POST /admin/recompute-reviews или
+ежедневно в REVIEW_RECOMPUTE_AT (задание заводит app._scheduled_jobs).
+"""
+import heapq
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from models.attempt_log import error_tag
+from models.cognitive_profile import CognitiveProfile, ErrorTag, TaskAttempt
+from utils.logger import get_logger
+from utils.state_store import StateMap
+
+logger = get_logger("review_scheduler")
+
+# Время ночного пересчёта расписаний ("HH:MM", локальное); пусто — выключено
+REVIEW_RECOMPUTE_AT = os.getenv("REVIEW_RECOMPUTE_AT", "")
+
+GRADE_CORRECT = 4
+GRADE_CARELESS = 2
+GRADE_WRONG = 1
+# Оценка, начиная с которой ответ считается успешным повторением
+PASSING_GRADE = 3
+MIN_EASINESS = 1.3
+MAX_INTERVAL_DAYS = 365
+
+
+class ReviewItem(BaseModel):
+    """Карточка повторения задания"""
+    task_id: int
+    topic: Optional[str] = None
+    question: Optional[str] = None
+    easiness: float = 2.5
+    repetitions: int = 0  # успешных повторений подряд
+    interval_days: float = 0.0
+    due: datetime = Field(default_factory=datetime.now)
+    reviews: int = 0
+    lapses: int = 0  # ошибок после хотя бы одного успешного повторения
+    last_reviewed: Optional[datetime] = None
+
+
+class ReviewSchedule(BaseModel):
+    """Расписание повторений ученика"""
+    user_id: str
+    items: Dict[int, ReviewItem] = Field(default_factory=dict)
+    # Куча (срок в секундах epoch, id задания); может содержать устаревшие записи
+    heap: List[Tuple[float, int]] = Field(default_factory=list)
+
+
+def grade(is_correct: bool, error_type: Optional[str] = None) -> int:
+    if is_correct:
+        return GRADE_CORRECT
+    if getattr(error_type, "value", error_type) == ErrorTag.CARELESSNESS.value:
+        return GRADE_CARELESS
+    return GRADE_WRONG
+
+
+def sm2_step(item: ReviewItem, quality: int, when: datetime) -> ReviewItem:
+    """Одна оценка по SM-2; карточка изменяется на месте"""
+    if quality >= PASSING_GRADE:
+        item.repetitions += 1
+        if item.repetitions == 1:
+            item.interval_days = 1.0
+        elif item.repetitions == 2:
+            item.interval_days = 6.0
+        else:
+            item.interval_days = min(MAX_INTERVAL_DAYS, round(item.interval_days * item.easiness, 2))
+    else:
+        if item.repetitions > 0:
+            item.lapses += 1
+        item.repetitions = 0
+        item.interval_days = 1.0
+    item.easiness = max(MIN_EASINESS, item.easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    item.reviews += 1
+    item.last_reviewed = when
+    item.due = when + timedelta(days=item.interval_days)
+    return item
+
+
+def seconds_until(at: str, now: Optional[datetime] = None) -> float:
+    """Секунд до ближайшего наступления времени "HH:MM" (сегодня или завтра)"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class ReviewScheduler:
+    """Расписания повторений всех учеников"""
+
+    def __init__(self):
+        # Общие для всех воркеров (см. utils/state_store.py)
+        self.schedules: Dict[str, ReviewSchedule] = StateMap("review_schedules", ReviewSchedule)
+
+    def get_schedule(self, user_id: str) -> ReviewSchedule:
+        return self.schedules.get(user_id) or ReviewSchedule(user_id=user_id)
+
+    @staticmethod
+    def _apply(schedule: ReviewSchedule, task_id: int, topic: Optional[str], question: Optional[str],
+               quality: int, when: datetime) -> ReviewItem:
+        item = schedule.items.get(task_id)
+        if item is None:
+            item = schedule.items[task_id] = ReviewItem(task_id=task_id)
+        item.topic = topic or item.topic
+        item.question = question or item.question
+        sm2_step(item, quality, when)
+        heapq.heappush(schedule.heap, (item.due.timestamp(), task_id))
+        return item
+
+    @staticmethod
+    def _is_current(schedule: ReviewSchedule, entry: Tuple[float, int]) -> bool:
+        item = schedule.items.get(entry[1])
+        return item is not None and item.due.timestamp() == entry[0]
+
+    def _compact(self, schedule: ReviewSchedule):
+        """Убирает устаревшие записи с вершины; пересобирает кучу, если их слишком много"""
+        while schedule.heap and not self._is_current(schedule, schedule.heap[0]):
+            heapq.heappop(schedule.heap)
+        if len(schedule.heap) > 2 * len(schedule.items) + 16:
+            schedule.heap = [(item.due.timestamp(), task_id) for task_id, item in schedule.items.items()]
+            heapq.heapify(schedule.heap)
+
+    def record(self, user_id: str, task_id: int, is_correct: bool, topic: Optional[str] = None,
+               question: Optional[str] = None, error_type: Optional[str] = None,
+               when: Optional[datetime] = None) -> ReviewItem:
+        """Учитывает попытку и сохраняет расписание (перезапись целиком — см. описание модуля)"""
+        schedule = self.get_schedule(user_id)
+        item = self._apply(schedule, task_id, topic, question, grade(is_correct, error_type), when or datetime.now())
+        self._compact(schedule)
+        self.schedules[user_id] = schedule
+        return item
+
+    def record_many(self, user_id: str, attempts: List[Tuple[TaskAttempt, Optional[str]]]) -> List[datetime]:
+        """
+        Учитывает попытки одного ученика (попытка, тип ошибки) по порядку и сохраняет расписание
+        один раз; возвращает срок следующего повторения после каждой попытки
+        """
+        schedule = self.get_schedule(user_id)
+        dues = []
+        for attempt, error_type in attempts:
+            item = self._apply(schedule, attempt.task_id, attempt.topic, attempt.question,
+                               grade(attempt.is_correct, error_type), attempt.timestamp)
+            dues.append(item.due)
+        self._compact(schedule)
+        self.schedules[user_id] = schedule
+        return dues
+
+    def _in_due_order(self, schedule: ReviewSchedule) -> Iterator[ReviewItem]:
+        """Карточки по возрастанию срока: обход кучи по индексам, O(log k) на карточку, куча не меняется"""
+        heap = schedule.heap
+        frontier = [(heap[0], 0)] if heap else []
+        seen = set()
+        while frontier:
+            entry, idx = heapq.heappop(frontier)
+            for child in (2 * idx + 1, 2 * idx + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+            if entry[1] not in seen and self._is_current(schedule, entry):
+                seen.add(entry[1])
+                yield schedule.items[entry[1]]
+
+    def queue(self, user_id: str, limit: int = 20, now: Optional[datetime] = None) -> Dict:
+        """До limit заданий, срок повторения которых наступил (самые просроченные первыми)"""
+        now = now or datetime.now()
+        schedule = self.get_schedule(user_id)
+        due: List[ReviewItem] = []
+        next_due = None
+        for item in self._in_due_order(schedule):
+            if item.due > now:
+                next_due = item.due
+                break
+            if len(due) == limit:
+                break
+            due.append(item)
+        return {
+            "user_id": user_id,
+            "due": [
+                {
+                    **item.dict(exclude={"last_reviewed", "reviews"}),
+                    "overdue_days": round((now - item.due).total_seconds() / 86400, 2),
+                }
+                for item in due
+            ],
+            "next_due": next_due,
+            "total_items": len(schedule.items),
+        }
+
+    def rebuild(self, profile: CognitiveProfile) -> ReviewSchedule:
+        """Расписание ученика по всей истории попыток"""
+        history = profile.task_history
+        schedule = ReviewSchedule(user_id=profile.user_id)
+        task_ids = history.task_ids()
+        topics = history.texts("topic")
+        questions = history.texts("question")
+        correct = history.column("is_correct").tolist()
+        errors = history.column("error_type").tolist()
+        for i, attempt in enumerate(history.timestamps()):
+            quality = grade(bool(correct[i]), error_tag(errors[i]))
+            self._apply(schedule, task_ids[i], topics[i], questions[i], quality, attempt)
+        schedule.heap = [(item.due.timestamp(), task_id) for task_id, item in schedule.items.items()]
+        heapq.heapify(schedule.heap)
+        return schedule
+
+    def recompute(self, profiles: List[CognitiveProfile]) -> Dict:
+        """Пересобирает расписания учеников по истории попыток и сохраняет их"""
+        items = 0
+        for profile in profiles:
+            schedule = self.rebuild(profile)
+            self.schedules[profile.user_id] = schedule
+            items += len(schedule.items)
+        logger.info("review schedules recomputed: %d students, %d items", len(profiles), items)
+        return {"students": len(profiles), "items": items}
+
+
+_scheduler: Optional[ReviewScheduler] = None
+
+
+def get_review_scheduler() -> ReviewScheduler:
+    """Общий экземпляр ReviewScheduler; создаётся при первом обращении"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReviewScheduler()
+    return _scheduler
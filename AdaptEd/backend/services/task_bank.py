@@ -0,0 +1,221 @@
+"""
+Банк заданий — общий для генератора заданий (agents/task_generator_agent.py) и /tasks (routes/lessons.py).
+
+Задания загружаются из JSON-файла (TASK_BANK_PATH, по умолчанию data/task_bank.json), дополняются
+сгенерированными (services/arithmetic_generator.py, TASK_BANK_GENERATED) и индексируются
+при добавлении: по id и по пулам (категория, уровень, тег ошибки), где любое поле может быть None
+("любой"). Поиск задания и пула — O(1). Там же один раз разбирается текст задания в признаки
+(services/question_features.py): агенты берут их по id, а не разбирают вопрос заново.
+
+Выборка для ученика идёт без повторов: на каждую пару (ученик, пул) заводится "колода" — ленивая
+перестановка Фишера-Йетса, O(1) на задание и память только под уже выданные. Когда пул исчерпан,
+колода начинается заново. Колоды живут в памяти процесса (последние TASK_BANK_DECKS штук).
+"""
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from models.attempt_log import QUESTIONS, TOPICS
+from services.question_features import QuestionFeatures, parse_question, question_features
+from utils.logger import get_logger
+
+logger = get_logger("task_bank")
+
+LEVELS = ("beginner", "intermediate", "advanced")
+TASK_BANK_PATH = os.getenv("TASK_BANK_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "task_bank.json"
+)
+TASK_BANK_DECKS = int(os.getenv("TASK_BANK_DECKS", "50000") or 50000)
+# Сколько сгенерированных заданий добавить на каждую пару (категория, уровень); seed общий для всех
+# воркеров, поэтому id сгенерированных заданий у них совпадают
+TASK_BANK_GENERATED = int(os.getenv("TASK_BANK_GENERATED", "200") or 0)
+TASK_BANK_SEED = int(os.getenv("TASK_BANK_SEED", "0") or 0)
+
+PoolKey = Tuple[Optional[str], Optional[str], Optional[str]]  # (категория, уровень, тег ошибки)
+
+
+class BankTask(BaseModel):
+    """Задание банка"""
+    id: int
+    question: str
+    answer: int
+    category: str
+    level: str
+    # Типы ошибок (ErrorTag), которые задание помогает отработать
+    error_tags: List[str] = Field(default_factory=list)
+    # Неверный ответ -> тип ошибки, к которой он приводит (у сгенерированных заданий)
+    distractors: Dict[int, str] = Field(default_factory=dict)
+    # Создано процедурным генератором (services/arithmetic_generator.py), а не взято из файла
+    generated: bool = False
+
+    def public(self) -> Dict:
+        """Без ответа — для выдачи ученику"""
+        return {"id": self.id, "question": self.question, "category": self.category, "difficulty": self.level}
+
+
+class _Deck:
+    """Ленивая перестановка позиций пула: swaps хранит только переставленные позиции"""
+
+    __slots__ = ("size", "remaining", "swaps")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.remaining = size
+        self.swaps: Dict[int, int] = {}
+
+    def draw(self, rng) -> int:
+        if self.remaining == 0:
+            self.remaining = self.size
+            self.swaps.clear()
+        j = rng.randrange(self.remaining)
+        last = self.remaining - 1
+        position = self.swaps.get(j, j)
+        self.swaps[j] = self.swaps.pop(last, last)
+        self.remaining = last
+        return position
+
+
+class TaskBank:
+    """Индексированный банк заданий с выборкой без повторов"""
+
+    def __init__(self, tasks: Iterable[BankTask] = ()):
+        self._by_id: Dict[int, BankTask] = {}
+        self._features: Dict[int, QuestionFeatures] = {}
+        self._pools: Dict[PoolKey, List[int]] = {}
+        self._decks: "OrderedDict[Tuple[str, PoolKey], _Deck]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.add(tasks)
+
+    @classmethod
+    def load(cls, path: str = TASK_BANK_PATH) -> "TaskBank":
+        with open(path, encoding="utf-8") as f:
+            items = json.load(f)
+        bank = cls(BankTask(**item) for item in items)
+        logger.info("task bank loaded: %d tasks from %s", len(bank), path)
+        return bank
+
+    def add(self, tasks: Iterable[BankTask]) -> int:
+        """Добавляет задания (задание с существующим id заменяет прежнее только в индексе по id)"""
+        added = 0
+        with self._lock:
+            for task in tasks:
+                known = task.id in self._by_id
+                self._by_id[task.id] = task
+                self._features[task.id] = parse_question(task.question)
+                # Вопросы и категории банка — в пулах строк журналов попыток вне лимита
+                QUESTIONS.intern(task.question, pin=True)
+                TOPICS.intern(task.category, pin=True)
+                if known:
+                    continue
+                for key in self._keys(task):
+                    self._pools.setdefault(key, []).append(task.id)
+                added += 1
+        return added
+
+    @staticmethod
+    def _keys(task: BankTask) -> List[PoolKey]:
+        keys = [
+            (None, None, None), (task.category, None, None), (None, task.level, None), (task.category, task.level, None),
+        ]
+        keys.extend((task.category, task.level, tag) for tag in task.error_tags)
+        return keys
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, task_id: int) -> Optional[BankTask]:
+        return self._by_id.get(task_id)
+
+    def features(self, task_id: int) -> Optional[QuestionFeatures]:
+        """Признаки задания, разобранные при добавлении в банк"""
+        return self._features.get(task_id)
+
+    def features_for(self, task_id: Optional[int], question: Optional[str]) -> QuestionFeatures:
+        """Признаки задания банка, если id и текст совпадают; иначе — разбор текста (с кэшем)"""
+        task = self._by_id.get(task_id) if task_id is not None else None
+        if task is not None and (question is None or task.question == question):
+            return self._features[task.id]
+        return question_features(question or "")
+
+    def distractor_task_ids(self) -> List[int]:
+        """id заданий, у которых есть дистракторы"""
+        return [task_id for task_id, task in self._by_id.items() if task.distractors]
+
+    def categories(self) -> List[str]:
+        return sorted(category for category, level, tag in self._pools if category and level is None and tag is None)
+
+    def tasks(self, category: Optional[str] = None, level: Optional[str] = None,
+              generated: Optional[bool] = None) -> List[BankTask]:
+        tasks = [self._by_id[task_id] for task_id in self._pools.get((category, level, None), [])]
+        if generated is None:
+            return tasks
+        return [task for task in tasks if task.generated == generated]
+
+    def random_task(self, category: Optional[str] = None, level: Optional[str] = None, rng=random) -> Optional[BankTask]:
+        pool = self._pools.get((category, level, None))
+        return self._by_id[pool[rng.randrange(len(pool))]] if pool else None
+
+    def _draw(self, user_id: str, key: PoolKey, count: int, exclude: set, rng) -> List[BankTask]:
+        pool = self._pools.get(key) or []
+        result: List[BankTask] = []
+        with self._lock:
+            deck = self._decks.get((user_id, key))
+            if deck is None or deck.size != len(pool):  # пул пополнился — новая колода
+                deck = _Deck(len(pool))
+            self._decks[(user_id, key)] = deck
+            self._decks.move_to_end((user_id, key))
+            while len(self._decks) > TASK_BANK_DECKS:
+                self._decks.popitem(last=False)
+            # Не больше одного круга колоды: в одной выдаче задания не повторяются
+            for _ in range(min(len(pool), count + len(exclude))):
+                if len(result) == count:
+                    break
+                task_id = pool[deck.draw(rng)]
+                if task_id not in exclude:
+                    exclude.add(task_id)
+                    result.append(self._by_id[task_id])
+        return result
+
+    def sample(self, user_id: str, category: Optional[str], level: str, count: int,
+               error_tags: Sequence[str] = (), rng=random) -> List[BankTask]:
+        """
+        До count заданий категории и уровня без повторов для ученика. Сначала — задания на первый
+        из error_tags, для которого они есть, остальное — из общего пула уровня. Если заданий
+        уровня нет совсем, берётся ближайший уровень.
+        """
+        levels = sorted(LEVELS, key=lambda lvl: abs(LEVELS.index(lvl) - LEVELS.index(level))) if level in LEVELS else list(LEVELS)
+        level = next((lvl for lvl in levels if self._pools.get((category, lvl, None))), None)
+        if level is None:
+            return []
+        chosen: set = set()
+        result: List[BankTask] = []
+        tag_key = next((key for key in ((category, level, tag) for tag in error_tags) if self._pools.get(key)), None)
+        if tag_key is not None:
+            result.extend(self._draw(user_id, tag_key, count, chosen, rng))
+        if len(result) < count:
+            result.extend(self._draw(user_id, (category, level, None), count - len(result), chosen, rng))
+        return result
+
+
+_bank: Optional[TaskBank] = None
+_bank_lock = threading.Lock()
+
+
+def get_task_bank() -> TaskBank:
+    """Общий банк заданий: TASK_BANK_PATH и TASK_BANK_GENERATED сгенерированных; создаётся при первом обращении"""
+    global _bank
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                bank = TaskBank.load()
+                if TASK_BANK_GENERATED > 0:
+                    from services.arithmetic_generator import extend_bank
+                    added = extend_bank(bank, TASK_BANK_GENERATED, TASK_BANK_SEED)
+                    logger.info("task bank extended: %d generated tasks (seed %d)", added, TASK_BANK_SEED)
+                _bank = bank
+    return _bank
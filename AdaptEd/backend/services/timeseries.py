@@ -0,0 +1,306 @@
+"""
+Временные ряды успеваемости: попытки, верные ответы, точность и очки по времени — для ученика,
+класса и школы (все ученики).
+
+Ряды не считаются по истории попыток при запросе. Каждая отправка (record — из оркестратора)
+добавляет попытки в заранее разбитые по корзинам счётчики трёх разрешений: час, день, неделя
+(с понедельника). Счётчики лежат партициями: часовые — по месяцам, дневные и недельные — по годам,
+так что при любой длине истории запрос читает несколько записей.
+
+Запрос (query) выбирает самое мелкое разрешение, при котором в диапазоне не больше MAX_BUCKETS
+корзин, и прореживает ряд до points точек алгоритмом LTTB (Largest-Triangle-Three-Buckets):
+остаются точки, сильнее всего меняющие форму графика, — пики и провалы не сглаживаются.
+Прореживание выбирает корзины, а не усредняет их; итоги за диапазон считаются по всем корзинам.
+
+Как и аналитика классов (services/class_analytics.py), запись — чтение-изменение-запись без
+блокировок между воркерами; полная пересборка rebuild по истории попыток — по расписанию
+(TIMESERIES_REBUILD_AT) или POST /admin/rebuild-timeseries.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from models.cognitive_profile import POINTS_PER_CORRECT, CognitiveProfile, TaskAttempt
+from services.class_analytics import get_class_analytics
+from utils.logger import get_logger
+from utils.state_store import StateMap
+
+logger = get_logger("timeseries")
+
+# Время ежедневной полной пересборки ("HH:MM", локальное); пусто — выключено
+TIMESERIES_REBUILD_AT = os.getenv("TIMESERIES_REBUILD_AT", "")
+
+SCOPES = ("student", "class", "school")
+SCHOOL = "*"  # ключ ряда школы
+# Разрешение -> длина корзины в секундах (от мелкого к крупному)
+RESOLUTIONS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+METRICS = ("accuracy", "attempts", "correct", "points")
+MAX_BUCKETS = 1000  # корзин в диапазоне запроса при автоматическом выборе разрешения
+DEFAULT_POINTS = 200
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class RollupPartition(BaseModel):
+    """Счётчики ряда за месяц (часовые корзины) или за год (дневные и недельные)"""
+    # Начало корзины (секунды от 1970-01-01, локальное время) -> [попытки, верные]
+    hour: Dict[int, List[int]] = Field(default_factory=dict)
+    day: Dict[int, List[int]] = Field(default_factory=dict)
+    week: Dict[int, List[int]] = Field(default_factory=dict)
+
+
+class SeriesMeta(BaseModel):
+    """Начало ряда — диапазон запроса по умолчанию"""
+    first: datetime
+
+
+def _seconds(moment: datetime) -> int:
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return int((moment - _EPOCH).total_seconds())
+
+
+def _moment(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def bucket_start(resolution: str, seconds):
+    """Начало корзины (секунды; работает и для numpy-массивов); неделя — с понедельника"""
+    if resolution != "week":
+        return seconds - seconds % RESOLUTIONS[resolution]
+    day = seconds // RESOLUTIONS["day"]
+    return (day - (day + 3) % 7) * RESOLUTIONS["day"]  # 1970-01-01 — четверг
+
+
+def _period(resolution: str, start: int) -> str:
+    """Партиция корзины: месяц для часовых, год для дневных и недельных (год понедельника)"""
+    moment = _moment(start)
+    return f"{moment.year:04d}-{moment.month:02d}" if resolution == "hour" else f"{moment.year:04d}"
+
+
+def _periods(resolution: str, start: int, end: int) -> List[str]:
+    """Партиции, в которые попадают корзины [start, end]"""
+    first, last = _moment(start), _moment(end)
+    if resolution != "hour":
+        return [f"{year:04d}" for year in range(first.year, last.year + 1)]
+    months = range(first.year * 12 + first.month - 1, last.year * 12 + last.month)
+    return [f"{month // 12:04d}-{month % 12 + 1:02d}" for month in months]
+
+
+def _series_key(scope: str, key: str) -> str:
+    return f"{scope}/{key}"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Индексы threshold точек ряда по Largest-Triangle-Three-Buckets (первая и последняя — всегда).
+
+    Точки между крайними делятся на threshold - 2 корзины; из каждой берётся точка, образующая
+    наибольший треугольник с выбранной точкой предыдущей корзины и средним следующей.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+class TimeSeries:
+    """Предагрегированные ряды ученика, класса и школы: запись, пересборка, запрос с прореживанием"""
+
+    def __init__(self):
+        # Общие для всех воркеров (см. utils/state_store.py); ключ партиции — "scope/key/период"
+        self.rollups: Dict[str, RollupPartition] = StateMap("timeseries_rollups", RollupPartition)
+        self.series: Dict[str, SeriesMeta] = StateMap("timeseries_series", SeriesMeta)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def series_of(user_id: str) -> List[Tuple[str, str]]:
+        """Ряды, в которые попадают попытки ученика"""
+        return [("student", user_id), ("class", get_class_analytics().class_of(user_id)), ("school", SCHOOL)]
+
+    # --- инкрементальное обновление ---
+
+    def record(self, user_id: str, attempts: Iterable[TaskAttempt]):
+        """Добавляет новые попытки ученика в его ряд, ряд класса и ряд школы"""
+        rows = [(_seconds(attempt.timestamp), int(attempt.is_correct)) for attempt in attempts]
+        if not rows:
+            return
+        # период -> разрешение -> корзина -> [попытки, верные]
+        changes: Dict[str, Dict[str, Dict[int, List[int]]]] = {}
+        for seconds, correct in rows:
+            for resolution in RESOLUTIONS:
+                start = bucket_start(resolution, seconds)
+                cell = changes.setdefault(_period(resolution, start), {}).setdefault(resolution, {}).setdefault(start, [0, 0])
+                cell[0] += 1
+                cell[1] += correct
+        first = _moment(bucket_start("hour", min(seconds for seconds, _ in rows)))
+        with self._lock:
+            for scope, key in self.series_of(user_id):
+                for period, by_resolution in changes.items():
+                    partition_key = f"{_series_key(scope, key)}/{period}"
+                    stored = self.rollups.get(partition_key) or RollupPartition()
+                    for resolution, cells in by_resolution.items():
+                        buckets = getattr(stored, resolution)
+                        for start, (attempts_count, correct_count) in cells.items():
+                            cell = buckets.setdefault(start, [0, 0])
+                            cell[0] += attempts_count
+                            cell[1] += correct_count
+                    self.rollups[partition_key] = stored
+                meta = self.series.get(_series_key(scope, key))
+                if meta is None or first < meta.first:
+                    self.series[_series_key(scope, key)] = SeriesMeta(first=first)
+
+    # --- полная пересборка ---
+
+    @staticmethod
+    def _partitions(profiles: List[CognitiveProfile]) -> Dict[str, RollupPartition]:
+        """Партиции одного ряда по истории попыток — группировка колонок через np.unique"""
+        logs = [profile.task_history for profile in profiles if len(profile.task_history)]
+        if not logs:
+            return {}
+        seconds = np.concatenate([log.column("timestamp") for log in logs]) // 1_000_000
+        correct = np.concatenate([log.column("is_correct") for log in logs]).astype(np.int64)
+        partitions: Dict[str, RollupPartition] = {}
+        for resolution in RESOLUTIONS:
+            starts, inverse = np.unique(bucket_start(resolution, seconds), return_inverse=True)
+            inverse = inverse.reshape(-1)
+            attempts = np.bincount(inverse).tolist()
+            correct_sums = np.bincount(inverse, weights=correct).astype(np.int64).tolist()
+            for start, attempts_count, correct_count in zip(starts.tolist(), attempts, correct_sums):
+                partition = partitions.setdefault(_period(resolution, start), RollupPartition())
+                getattr(partition, resolution)[start] = [attempts_count, correct_count]
+        return partitions
+
+    def rebuild(self, profiles: List[CognitiveProfile]) -> Dict:
+        """Пересобирает все ряды по профилям учеников; устаревшие партиции удаляются"""
+        analytics = get_class_analytics()
+        with self._lock:
+            groups: Dict[Tuple[str, str], List[CognitiveProfile]] = {("school", SCHOOL): list(profiles)}
+            for profile in profiles:
+                groups[("student", profile.user_id)] = [profile]
+                groups.setdefault(("class", analytics.class_of(profile.user_id)), []).append(profile)
+
+            partition_keys, series_keys = set(), set()
+            for (scope, key), members in groups.items():
+                partitions = self._partitions(members)
+                if not partitions:
+                    continue
+                for period, partition in partitions.items():
+                    self.rollups[f"{_series_key(scope, key)}/{period}"] = partition
+                    partition_keys.add(f"{_series_key(scope, key)}/{period}")
+                first = min(min(partition.hour) for partition in partitions.values() if partition.hour)
+                self.series[_series_key(scope, key)] = SeriesMeta(first=_moment(first))
+                series_keys.add(_series_key(scope, key))
+
+            for key in [key for key in self.rollups if key not in partition_keys]:
+                del self.rollups[key]
+            for key in [key for key in self.series if key not in series_keys]:
+                del self.series[key]
+        logger.info("time series rebuilt: %d series, %d partitions", len(series_keys), len(partition_keys))
+        return {"students": len(profiles), "series": len(series_keys), "partitions": len(partition_keys)}
+
+    # --- чтение ---
+
+    @staticmethod
+    def pick_resolution(start: datetime, end: datetime) -> str:
+        """Самое мелкое разрешение, при котором в [start, end] не больше MAX_BUCKETS корзин"""
+        span = max(_seconds(end) - _seconds(start), 0)
+        for resolution, step in RESOLUTIONS.items():
+            if span // step + 1 <= MAX_BUCKETS:
+                return resolution
+        return "week"
+
+    def buckets(self, scope: str, key: str, resolution: str, start: datetime, end: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(начала корзин в секундах, попытки, верные) ряда за [start, end] по возрастанию времени"""
+        first, last = bucket_start(resolution, _seconds(start)), _seconds(end)
+        merged: Dict[int, List[int]] = {}
+        for period in _periods(resolution, first, last):
+            stored = self.rollups.get(f"{_series_key(scope, key)}/{period}")
+            if stored is not None:
+                merged.update(getattr(stored, resolution))
+        starts = np.array(sorted(bucket for bucket in merged if first <= bucket <= last), dtype=np.int64)
+        counts = np.array([merged[bucket] for bucket in starts.tolist()], dtype=np.int64).reshape(-1, 2)
+        return starts, counts[:, 0], counts[:, 1]
+
+    def query(self, scope: str, key: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              resolution: str = "auto", points: int = DEFAULT_POINTS, metric: str = "accuracy") -> Dict:
+        """
+        Ряд за [start, end] (по умолчанию — от начала ряда до текущего момента), прореженный до points
+        точек по метрике metric. Явное разрешение с числом корзин больше MAX_BUCKETS — ValueError.
+        """
+        if scope not in SCOPES:
+            raise ValueError(f"scope: одно из {', '.join(SCOPES)}")
+        if metric not in METRICS:
+            raise ValueError(f"metric: одна из {', '.join(METRICS)}")
+        key = SCHOOL if scope == "school" else key
+        end = end or datetime.now()
+        if start is None:
+            meta = self.series.get(_series_key(scope, key))
+            start = meta.first if meta else end
+        if _seconds(start) > _seconds(end):
+            raise ValueError("start позже end")
+        if resolution == "auto":
+            resolution = self.pick_resolution(start, end)
+        elif resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution: auto или одно из {', '.join(RESOLUTIONS)}")
+        elif (_seconds(end) - _seconds(start)) // RESOLUTIONS[resolution] + 1 > MAX_BUCKETS:
+            raise ValueError(f"больше {MAX_BUCKETS} корзин: сузьте диапазон или укажите resolution=auto")
+
+        starts, attempts, correct = self.buckets(scope, key, resolution, start, end)
+        accuracy = np.round(correct * 100.0 / np.maximum(attempts, 1), 1)
+        values = {"accuracy": accuracy, "attempts": attempts, "correct": correct, "points": correct * POINTS_PER_CORRECT}
+        selected = lttb(starts, values[metric], points)
+        total_attempts, total_correct = int(attempts.sum()), int(correct.sum())
+        return {
+            "scope": scope,
+            "id": key,
+            "resolution": resolution,
+            "metric": metric,
+            "start": start,
+            "end": end,
+            "buckets": len(starts),
+            "totals": {
+                "attempts": total_attempts,
+                "correct": total_correct,
+                "accuracy": round(total_correct * 100.0 / total_attempts, 1) if total_attempts else 0.0,
+                "points": total_correct * POINTS_PER_CORRECT,
+            },
+            "points": [
+                {
+                    "t": _moment(bucket),
+                    "attempts": int(attempts[i]),
+                    "correct": int(correct[i]),
+                    "accuracy": float(accuracy[i]),
+                    "points": int(correct[i]) * POINTS_PER_CORRECT,
+                }
+                for i, bucket in zip(selected.tolist(), starts[selected].tolist())
+            ],
+        }
+
+
+_series: Optional[TimeSeries] = None
+
+
+def get_time_series() -> TimeSeries:
+    """Общий экземпляр TimeSeries; создаётся при первом обращении"""
+    global _series
+    if _series is None:
+        _series = TimeSeries()
+    return _series
@@ -0,0 +1,58 @@
+"""
+Общие фикстуры тестов бэкенда. Запуск из папки backend: python -m pytest
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("STATE_BACKEND", "memory")
+
+
+@pytest.fixture
+def raw_db_engine(monkeypatch):
+    """In-memory SQLite вместо DATABASE_URL на время теста, без схемы (init_db() ещё не вызывался)"""
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    from sqlalchemy.orm import sessionmaker
+    from utils import db
+
+    engine = db._make_engine("sqlite://")
+    monkeypatch.delenv("DB_ASYNC", raising=False)
+    monkeypatch.setattr(db, "DATABASE_URL", "sqlite://")
+    monkeypatch.setattr(db, "_engine", engine)
+    monkeypatch.setattr(db, "_SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    monkeypatch.setattr(db, "_db_initialized", False)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_engine(raw_db_engine):
+    """Пустая in-memory SQLite со схемой вместо DATABASE_URL на время теста"""
+    from utils import db
+
+    db.init_db()
+    return raw_db_engine
+
+
+@pytest.fixture
+def count_queries(db_engine):
+    """Контекстный менеджер: список SQL-инструкций, выполненных внутри блока"""
+    from sqlalchemy import event
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def before_cursor_execute(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+
+        event.listen(db_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db_engine, "before_cursor_execute", before_cursor_execute)
+
+    return counting
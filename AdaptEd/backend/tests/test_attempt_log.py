@@ -0,0 +1,74 @@
+"""
+Пулы строк журналов попыток ограничены: сверх лимита текст хранится в самом журнале
+"""
+from datetime import datetime
+
+import pytest
+
+from models.attempt_log import INLINE, QUESTIONS, TEXTS, TOPICS, AttemptLog, ErrorLog, _ColumnarLog, text_codes
+from models.cognitive_profile import ErrorAnalysis, ErrorTag, TaskAttempt
+
+
+@pytest.fixture
+def full_pools(monkeypatch):
+    # Пулы заполнены: новые незакреплённые строки в них больше не попадают
+    for pool in (QUESTIONS, TOPICS, TEXTS):
+        monkeypatch.setattr(pool, "limit", pool._unpinned)
+
+
+def _attempt(i: int, question: str, topic: str, correct: bool = True) -> TaskAttempt:
+    analysis = None if correct else ErrorAnalysis(
+        error_type=ErrorTag.CALCULATION_ERROR, justification=f"обоснование {question}",
+        suggested_remediation=f"совет {question}", similar_errors_count=i,
+    )
+    return TaskAttempt(
+        task_id=i, question=question, topic=topic, user_answer=i, correct_answer=i if correct else i + 1,
+        is_correct=correct, error_analysis=analysis, timestamp=datetime(2026, 1, 1, 12, i),
+    )
+
+
+def test_pool_limit_keeps_text_in_log(full_pools):
+    questions = len(QUESTIONS)
+    attempts = [
+        _attempt(1, "уникальный вопрос 1", "уникальная тема"),
+        _attempt(2, "уникальный вопрос 2", "уникальная тема", correct=False),
+        _attempt(3, "уникальный вопрос 3", None, correct=False),
+    ]
+    log = AttemptLog(attempts)
+
+    assert len(QUESTIONS) == questions
+    assert log.column("question").tolist() == [INLINE] * 3
+    assert log.to_dicts() == [attempt.dict() for attempt in attempts]
+    assert log[1].dict() == attempts[1].dict()
+    assert log.texts("question") == [attempt.question for attempt in attempts]
+    assert ErrorLog.from_attempts(log).to_dicts() == [attempts[1].error_analysis.dict(), attempts[2].error_analysis.dict()]
+    assert log.topic_accuracy() == {"уникальная тема": {"attempts": 2, "accuracy": 0.5}}
+
+
+def test_pinned_strings_bypass_limit(full_pools):
+    idx = QUESTIONS.intern("вопрос банка заданий", pin=True)
+    assert idx >= 0
+    assert QUESTIONS.intern("вопрос банка заданий") == idx
+    assert QUESTIONS.intern("вопрос ученика") == INLINE
+
+
+def test_text_codes_group_inline_text_across_logs(full_pools):
+    first = AttemptLog([_attempt(1, "q", "тема вне пула"), _attempt(2, "q", None)])
+    second = AttemptLog([_attempt(3, "q", "тема вне пула")])
+
+    codes, text = text_codes([first, second], "topic")
+
+    assert codes[0] == codes[2] < -1
+    assert codes[1] == -1
+    assert [text(int(code)) for code in codes] == ["тема вне пула", None, "тема вне пула"]
+
+
+def test_incomplete_log_class_fails_on_creation():
+    class Incomplete(_ColumnarLog):
+        __slots__ = ()
+
+        def append(self, record):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
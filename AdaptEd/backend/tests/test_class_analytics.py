@@ -0,0 +1,18 @@
+"""
+Пакетные пересчёты профилей меняют версию аналитики классов — учитель не получает 304 со старыми данными
+"""
+import pytest
+
+
+@pytest.mark.parametrize("job", ["recompute_profiles", "refit_mastery"])
+def test_batch_jobs_change_class_etag(job):
+    from agents.orchestrator import get_orchestrator
+
+    orchestrator = get_orchestrator()
+    orchestrator.process_task_submission("class_etag_student", 1, "12 + 7", 20, 19)
+    etag, _ = orchestrator.class_analytics.validators(None, "summary")
+
+    result = getattr(orchestrator, job)()
+
+    assert "class_analytics" in result
+    assert orchestrator.class_analytics.validators(None, "summary")[0] != etag
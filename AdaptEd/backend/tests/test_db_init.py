@@ -0,0 +1,62 @@
+"""
+Ошибка миграции при init_db() не глотается, а инициализация повторяется при следующем вызове
+"""
+import pytest
+
+
+def test_migration_failure_is_raised_and_retried(db_engine, monkeypatch):
+    from utils import db, migrations
+    migrate = migrations.migrate_homework_templates
+
+    def broken(engine):
+        raise RuntimeError("migration failed")
+
+    monkeypatch.setattr(db, "_db_initialized", False)
+    monkeypatch.setattr(migrations, "migrate_homework_templates", broken)
+    with pytest.raises(RuntimeError, match="migration failed"):
+        db.init_db()
+    assert not db._db_initialized
+
+    monkeypatch.setattr(migrations, "migrate_homework_templates", migrate)
+    db.init_db()
+    assert db._db_initialized
+
+
+def test_homework_templates_migration_on_legacy_schema(raw_db_engine):
+    from sqlalchemy import inspect, text
+    from utils import db
+
+    # Схема homeworks до homework_templates (как в adapted.db до миграции); даты SQLite хранит строками
+    with raw_db_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE homeworks (id INTEGER NOT NULL, title VARCHAR(255) NOT NULL, description TEXT, "
+            "subject VARCHAR(100), due_date DATETIME, status VARCHAR(50), assigned_to VARCHAR(64) NOT NULL, "
+            "created_by VARCHAR(64), created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id))"
+        ))
+        conn.execute(text(
+            "INSERT INTO homeworks (id, title, description, subject, status, assigned_to, created_by, created_at) VALUES "
+            "(1, 'Дроби', 'стр. 20', 'Математика', 'new', 'student_1', 'teacher_1', '2025-12-06 19:29:35.795486'), "
+            "(2, 'Дроби', 'стр. 20', 'Математика', 'new', 'student_2', 'teacher_1', '2025-12-06 19:29:36.000000'), "
+            "(3, 'Глаголы', NULL, 'Русский', 'checked', 'student_1', 'teacher_2', NULL)"
+        ))
+
+    db.init_db()
+
+    assert db._db_initialized
+    columns = {c["name"] for c in inspect(raw_db_engine).get_columns("homeworks")}
+    assert {"title", "description", "subject"}.isdisjoint(columns)
+    assert "template_id" in columns
+    with raw_db_engine.connect() as conn:
+        templates = conn.execute(text(
+            "SELECT id, title, description, subject, created_by, created_at FROM homework_templates ORDER BY id"
+        )).all()
+        homeworks = conn.execute(text("SELECT id, template_id, assigned_to, status FROM homeworks ORDER BY id")).all()
+    assert [tuple(row[1:5]) for row in templates] == [
+        ("Дроби", "стр. 20", "Математика", "teacher_1"), ("Глаголы", None, "Русский", "teacher_2"),
+    ]
+    assert templates[0].created_at.startswith("2025-12-06 19:29:35")
+    assert templates[1].created_at is not None
+    fractions, verbs = templates[0].id, templates[1].id
+    assert [tuple(row) for row in homeworks] == [
+        (1, fractions, "student_1", "new"), (2, fractions, "student_2", "new"), (3, verbs, "student_1", "checked"),
+    ]
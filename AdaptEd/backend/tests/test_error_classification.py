@@ -0,0 +1,49 @@
+"""
+Векторная классификация ошибок (classify_batch, classify_logs) совпадает с поштучной (classify_error, process)
+"""
+import numpy as np
+
+from agents.error_analyzer_agent import ERROR_RULES, ErrorAnalyzerAgent, classify_error
+
+
+def test_classify_batch_matches_classify_error():
+    rng = np.random.default_rng(0)
+    n = 100_000
+    correct = rng.integers(-1000, 1000, n)
+    # Верные ответы, ошибки на единицу и на десятки, большие и случайные промахи
+    offsets = rng.choice([0, 1, -1, 10, -10, 20, 100, -100, 7, -3], n)
+    user = np.where(rng.random(n) < 0.3, rng.integers(-2000, 2000, n), correct + offsets)
+    operators = rng.integers(0, 16, n)
+    answered = rng.random(n) > 0.05
+
+    rules = ErrorAnalyzerAgent().classify_batch(user, correct, operators, answered=answered)
+
+    expected = [
+        classify_error(u if a else None, c, o)
+        for u, c, o, a in zip(user.tolist(), correct.tolist(), operators.tolist(), answered.tolist())
+    ]
+    assert rules.tolist() == expected
+
+
+def test_classify_logs_matches_process():
+    from agents.orchestrator import get_orchestrator
+    from services.task_bank import get_task_bank
+
+    orchestrator = get_orchestrator()
+    user_id = "classify_logs_student"
+    answers = [(1, "12 + 7", 19, 19), (2, "12 + 7", 20, 19), (3, "45 - 18", 37, 27), (4, "6 * 7", 40, 42)]
+    # Задания банка с дистракторами — тип ошибки берётся по дистрактору
+    for task in get_task_bank().tasks(generated=True)[:20]:
+        wrong = next(iter(task.distractors), task.answer + 3)
+        answers.append((task.id, task.question, wrong, task.answer))
+    for task_id, question, user_answer, correct_answer in answers:
+        orchestrator.process_task_submission(user_id, task_id, question, user_answer, correct_answer)
+
+    profile = orchestrator.profiler.get_profile(user_id)
+    rules = orchestrator.error_analyzer.classify_logs([profile.task_history])
+    tagged = [attempt.error_analysis.error_type.value if attempt.error_analysis else None for attempt in profile.task_history]
+    assert [ERROR_RULES[rule][0].value if rule >= 0 else None for rule in rules.tolist()] == tagged
+
+    result = orchestrator.retag_errors([user_id])
+    assert result["changed"] == 0 and result["skipped"] == 0
+    assert result["reviews"]["students"] == 1
@@ -0,0 +1,43 @@
+"""
+Пакетный пересчёт освоения (MasteryEngine.refit) идёт по попыткам темы в исходном порядке
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.cognitive_profile import CognitiveProfile, TaskAttempt
+from services.mastery import DEFAULT_TOPIC, BKTParams, MasteryEngine, bkt_step
+
+
+@pytest.fixture
+def engine():
+    engine = MasteryEngine()
+    saved = dict(engine.params)
+    yield engine
+    # Параметры общие для процесса (StateMap) — возвращаем как были
+    engine.params.clear()
+    engine.params.update(saved)
+
+
+def test_refit_keeps_order_of_untagged_and_general_attempts(engine):
+    # Попытки с темой "general" верные, без темы — нет, и они чередуются: если склеить их группами,
+    # последней окажется серия верных ответов и оценка будет завышена
+    answers = [i % 2 == 0 for i in range(12)]
+    start = datetime(2026, 1, 1)
+    profile = CognitiveProfile(user_id="refit_order_student")
+    for i, correct in enumerate(answers):
+        profile.task_history.append(TaskAttempt(
+            task_id=i, question="2 + 2", topic=None if i % 2 else DEFAULT_TOPIC, user_answer=4 if correct else 5,
+            correct_answer=4, is_correct=correct, timestamp=start + timedelta(minutes=i),
+        ))
+
+    engine.params[DEFAULT_TOPIC] = BKTParams(p_init=0.3, p_transit=0.05, p_slip=0.2, p_guess=0.3)
+    engine.refit([profile], min_attempts=len(answers) + 1)  # собственные параметры темы не подбираются
+
+    params = engine.params_for(DEFAULT_TOPIC)
+    known = params.p_init
+    for correct in answers:
+        known = bkt_step(known, correct, params)
+    state = profile.mastery[DEFAULT_TOPIC]
+    assert state.attempts == len(answers)
+    assert state.mastery == pytest.approx(known)
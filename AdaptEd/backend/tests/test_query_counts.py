@@ -0,0 +1,82 @@
+"""
+Число SQL-запросов эндпоинтов тестов и ДЗ не зависит от числа вопросов и строк (нет N+1)
+"""
+import pytest
+
+pytest.importorskip("sqlalchemy")
+from fastapi.testclient import TestClient  # noqa: E402
+
+from models import homework as homework_models  # noqa: E402
+from models import test as test_models  # noqa: E402
+
+
+@pytest.fixture
+def client(db_engine, monkeypatch):
+    import routes.tests
+    from app import app
+
+    class _NoLLM:
+        def _generate(self, prompt, max_new_tokens=200):
+            return "feedback"
+
+    # Отзыв к тесту пишет LLM — здесь считаются только запросы к БД
+    monkeypatch.setattr(routes.tests, "_assistant", lambda: _NoLLM())
+    return TestClient(app)
+
+
+def _make_test(db_engine, questions: int) -> int:
+    from utils.db import get_db
+    db = get_db()
+    test = test_models.Test(title="Дроби", topic="fractions", creator_id="teacher")
+    test.questions = [
+        test_models.TestQuestion(question=f"Вопрос {i}", options=["1", "2", "3"], correct_index=i % 3)
+        for i in range(questions)
+    ]
+    db.add(test)
+    db.commit()
+    test_id = test.id
+    db.close()
+    return test_id
+
+
+def _make_homeworks(db_engine, count: int):
+    from utils.db import get_db
+    db = get_db()
+    template = homework_models.HomeworkTemplate(title="Таблица умножения", subject="math", created_by="teacher")
+    db.add_all([homework_models.Homework(template=template, assigned_to=f"student_{i}") for i in range(count)])
+    db.commit()
+    db.close()
+
+
+@pytest.mark.parametrize("questions", [3, 30])
+def test_get_test_queries(client, db_engine, count_queries, questions):
+    test_id = _make_test(db_engine, questions)
+    with count_queries() as statements:
+        resp = client.get(f"/tests/{test_id}")
+    assert resp.status_code == 200
+    assert len(resp.json()["questions"]) == questions
+    # SELECT теста + один selectin-запрос вопросов
+    assert len(statements) == 2, statements
+
+
+@pytest.mark.parametrize("questions", [3, 30])
+def test_submit_test_queries(client, db_engine, count_queries, questions):
+    test_id = _make_test(db_engine, questions)
+    with count_queries() as statements:
+        resp = client.post(f"/tests/{test_id}/submit", json={"user_id": "student", "answers": [0] * questions})
+    assert resp.status_code == 200
+    assert resp.json()["total"] == questions
+    # SELECT теста, selectin вопросов, INSERT результата, SELECT после refresh
+    assert len(statements) == 4, statements
+
+
+@pytest.mark.parametrize("homeworks", [2, 20])
+def test_list_homeworks_queries(client, db_engine, count_queries, homeworks):
+    _make_homeworks(db_engine, homeworks)
+    with count_queries() as statements:
+        resp = client.get("/homeworks")
+    assert resp.status_code == 200
+    assert len(resp.json()) == homeworks
+    assert all(item["title"] == "Таблица умножения" for item in resp.json())
+    # Шаблоны подтягиваются тем же запросом (joinedload)
+    assert len(statements) == 1, statements
@@ -0,0 +1,24 @@
+"""
+Разбор задания (parse_question) и вычисление (safe_eval) принимают одни и те же выражения
+"""
+from fractions import Fraction
+
+import pytest
+
+from services.arithmetic_generator import safe_eval
+from services.question_features import parse_question
+
+
+@pytest.mark.parametrize("question, value", [
+    ("12 + 7", 19), ("(3 + 4) × 2 − 6 : 4", Fraction(25, 2)), ("-(2 * 3)", -6), ("100 ÷ 4 = ?", 25),
+])
+def test_expression_is_parsed_and_evaluated(question, value):
+    assert parse_question(question).parsed
+    assert safe_eval(question.replace("= ?", "")) == value
+
+
+@pytest.mark.parametrize("question", ["__import__('os')", "2 ** 3", "1 +", "x + 1", "1 + " * 100 + "1"])
+def test_unsupported_expression_is_rejected_by_both(question):
+    assert not parse_question(question).parsed
+    with pytest.raises(ValueError):
+        safe_eval(question)
@@ -0,0 +1,66 @@
+"""
+RequestIdMiddleware переименовывает HTTP-спан по шаблону маршрута и со спанами OpenTelemetry
+"""
+from contextlib import contextmanager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils import tracing
+
+
+class _OtelLikeSpan:
+    """Как спан OpenTelemetry SDK: name только для чтения, переименование — update_name"""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def update_name(self, name: str) -> None:
+        self._name = name
+
+    def set_attribute(self, key, value) -> None:
+        pass
+
+    def is_recording(self) -> bool:
+        return True
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(tracing.RequestIdMiddleware)
+    return app
+
+
+def test_http_span_renamed_with_otel_span(monkeypatch):
+    spans = []
+
+    class _Tracer:
+        @contextmanager
+        def start_as_current_span(self, name, attributes=None):
+            span = _OtelLikeSpan(name)
+            spans.append(span)
+            yield span
+
+    monkeypatch.setattr(tracing, "get_tracer", lambda name: _Tracer())
+    resp = TestClient(_app()).get("/items/42", headers={"X-Request-ID": "abc"})
+    assert resp.status_code == 200
+    assert resp.headers["x-request-id"] == "abc"
+    assert [span.name for span in spans] == ["GET /items/{item_id}"]
+
+
+def test_http_span_renamed_with_builtin_span(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING", "console")
+    exported = []
+    monkeypatch.setattr(tracing, "_export", exported.append)
+    monkeypatch.setattr(tracing, "_tracers", {})
+    assert TestClient(_app()).get("/items/7").status_code == 200
+    assert [span.name for span in exported] == ["GET /items/{item_id}"]
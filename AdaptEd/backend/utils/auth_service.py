@@ -7,14 +7,24 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 from models.auth import User, UserRole
 from utils.persistent_storage import persistent_storage
+from utils.state_store import StateMap
+from utils.logger import get_logger
+
+logger = get_logger("auth")
 
 
 class AuthService:
     """Сервис для работы с авторизацией"""
     
     def __init__(self):
-        self.sessions: Dict[str, dict] = {}  # token -> user_data
-        self._create_default_admin()
+        self.sessions: Dict[str, dict] = StateMap("auth_sessions")  # token -> user_data
+        self._admin_checked = False  # админ создаётся при первом обращении, а не при импорте
+    
+    def ensure_default_admin(self):
+        """Один раз за процесс проверяет наличие предустановленного администратора"""
+        if not self._admin_checked:
+            self._create_default_admin()
+            self._admin_checked = True
         
     def _create_default_admin(self):
         """Создает предустановленного администратора"""
@@ -53,7 +63,7 @@ class AuthService:
         self.sessions[token] = {
             "user_id": user_id,
             "role": role.value,
-            "created_at": datetime.now()
+            "created_at": datetime.now().isoformat()
         }
         return token
     
@@ -61,6 +71,7 @@ class AuthService:
                      role: UserRole, class_id: Optional[str] = None,
                      phone: Optional[str] = None) -> Optional[User]:
         """Регистрирует нового пользователя"""
+        self.ensure_default_admin()
         # Проверяем, не существует ли уже пользователь
         users = persistent_storage.get("users", {})
         for user_id, user_data in users.items():
@@ -95,30 +106,26 @@ class AuthService:
     
     def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
         """Аутентифицирует пользователя"""
+        self.ensure_default_admin()
         hashed_password = self.hash_password(password)
-        print(f"DEBUG: Trying to authenticate email: {email}")
-        print(f"DEBUG: Password hash: {hashed_password}")
         
-        # Ищем пользователя
+        # Ищем пользователя (email и хэши паролей в лог не пишем)
         users = persistent_storage.get("users", {})
-        print(f"DEBUG: Available users: {list(users.keys())}")
         
         for user_id, user_data in users.items():
-            print(f"DEBUG: Checking user {user_id}, email: {user_data.get('email')}")
             if user_data.get("email") == email and user_data.get("password") == hashed_password:
-                print(f"DEBUG: Password match for user {user_id}")
                 if user_data.get("is_active"):
                     token = self.generate_token(user_id, UserRole(user_data["role"]))
-                    print(f"DEBUG: Generated token for user {user_id}")
+                    logger.debug("login ok", extra={"user_id": user_id})
                     return {
                         "token": token,
                         "user_id": user_id,
                         "role": user_data["role"]
                     }
                 else:
-                    print(f"DEBUG: User {user_id} is not active")
+                    logger.info("login rejected: user is not active", extra={"user_id": user_id})
         
-        print(f"DEBUG: Authentication failed for email: {email}")
+        logger.info("login failed")
         return None
     
     def get_user_from_token(self, token: str) -> Optional[Dict]:
@@ -146,14 +153,14 @@ class AuthService:
     
     def get_all_users(self) -> List[Dict]:
         """Получить всех пользователей"""
+        self.ensure_default_admin()
         users_data = persistent_storage.get("users", {})
-        print(f"DEBUG: persistent_storage users: {users_data}")
         users = []
         for user_id, user_data in users_data.items():
             # Исключаем пароль из ответа
             user_info = {k: v for k, v in user_data.items() if k != "password"}
             users.append(user_info)
-        print(f"DEBUG: returning {len(users)} users")
+        logger.debug("list users: %d", len(users))
         return users
 
 
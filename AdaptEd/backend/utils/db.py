@@ -1,20 +1,40 @@
 import os
-from typing import Optional
+import threading
+import time
+from typing import Optional, Iterator, AsyncIterator, Any
+
+from utils.logger import get_logger
+from utils.metrics import DB_QUERY_DURATION
+from utils.tracing import get_tracer
+
+logger = get_logger("db")
+_tracer = get_tracer("db")
 
 try:
-	from sqlalchemy import create_engine  # type: ignore
+	from sqlalchemy import create_engine, event  # type: ignore
 	from sqlalchemy.orm import sessionmaker, declarative_base, Session  # type: ignore
-	from sqlalchemy.pool import NullPool  # type: ignore
+	from sqlalchemy.pool import NullPool, QueuePool, StaticPool  # type: ignore
 	SQLA_AVAILABLE = True
 except Exception:
 	# SQLAlchemy not installed; operate in no-DB mode
 	create_engine = None  # type: ignore
+	event = None  # type: ignore
 	sessionmaker = None  # type: ignore
 	declarative_base = None  # type: ignore
 	Session = None  # type: ignore
-	NullPool = None  # type: ignore
+	NullPool = QueuePool = StaticPool = None  # type: ignore
 	SQLA_AVAILABLE = False
 
+try:
+	# Асинхронный путь опционален: нужен greenlet и драйвер (aiosqlite / asyncpg)
+	from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession  # type: ignore
+	ASYNC_SQLA_AVAILABLE = SQLA_AVAILABLE
+except Exception:
+	create_async_engine = None  # type: ignore
+	async_sessionmaker = None  # type: ignore
+	AsyncSession = None  # type: ignore
+	ASYNC_SQLA_AVAILABLE = False
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if SQLA_AVAILABLE:
@@ -24,16 +44,86 @@ else:
 		pass
 	Base = _Base  # type: ignore
 
+# Профиль SQLite: "tuned" (пул + WAL и PRAGMA) или "legacy" (NullPool, настройки по умолчанию)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+
+
+def _is_sqlite_memory(db_url: str) -> bool:
+	return db_url in ("sqlite://", "sqlite:///:memory:") or ":memory:" in db_url or "mode=memory" in db_url
+
+
+def _sqlite_tuned() -> bool:
+	return SQLITE_PROFILE.lower() != "legacy"
+
+
+def _apply_sqlite_pragmas(engine, db_url: str):
+	"""Настраивает каждое новое соединение SQLite: WAL, synchronous=NORMAL, mmap, busy_timeout"""
+	is_memory = _is_sqlite_memory(db_url)
+
+	@event.listens_for(engine, "connect")
+	def _on_connect(dbapi_conn, _record):
+		cur = dbapi_conn.cursor()
+		try:
+			if not is_memory:
+				# WAL: читатели не блокируют писателя; NORMAL в режиме WAL безопасен и без fsync на каждый commit
+				cur.execute("PRAGMA journal_mode=WAL")
+				cur.execute("PRAGMA synchronous=NORMAL")
+				cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+			cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+			cur.execute("PRAGMA temp_store=MEMORY")
+		finally:
+			cur.close()
+
+
+def _instrument_queries(engine):
+	"""Длительность, количество и спаны SQL-запросов по типу операции (SELECT/INSERT/UPDATE/...)"""
+	@event.listens_for(engine, "before_cursor_execute")
+	def _before(conn, _cursor, statement, _params, _context, _executemany):
+		operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+		span = _tracer.start_span(f"db.{operation}")
+		if span.is_recording():
+			span.set_attribute("db.statement", statement[:300])
+		conn.info.setdefault("_query_started", []).append((time.perf_counter(), operation, span))
+
+	@event.listens_for(engine, "after_cursor_execute")
+	def _after(conn, _cursor, _statement, _params, _context, _executemany):
+		started, operation, span = conn.info["_query_started"].pop()
+		DB_QUERY_DURATION.observe(time.perf_counter() - started, operation=operation)
+		span.end()
+
+	@event.listens_for(engine, "handle_error")
+	def _on_error(context):
+		stack = context.connection.info.get("_query_started") if context.connection is not None else None
+		if stack:
+			_started, _operation, span = stack.pop()
+			span.record_exception(context.original_exception)
+			span.end()
+
+
 def _make_engine(db_url: str):
 	connect_args = {}
 	engine_kwargs = {}
 	if db_url.startswith("sqlite"):
-		# SQLite в файле: отключаем check_same_thread и берём минимальный pool
 		connect_args = {"check_same_thread": False}
-		engine_kwargs = {"pool_pre_ping": True, "poolclass": NullPool}
+		if not _sqlite_tuned():
+			# Старое поведение: новое файловое соединение на каждый get_db()
+			engine_kwargs = {"pool_pre_ping": True, "poolclass": NullPool}
+		elif _is_sqlite_memory(db_url):
+			# In-memory БД существует только в рамках одного соединения
+			engine_kwargs = {"poolclass": StaticPool}
+		else:
+			# Небольшой постоянный пул: соединения (и кэш страниц/mmap) переиспользуются между запросами
+			engine_kwargs = {"poolclass": QueuePool, "pool_size": SQLITE_POOL_SIZE, "max_overflow": 0, "pool_timeout": 30}
 	else:
 		engine_kwargs = {"pool_pre_ping": True, "pool_size": 10, "max_overflow": 20}
-	return create_engine(db_url, connect_args=connect_args, **engine_kwargs)
+	engine = create_engine(db_url, connect_args=connect_args, **engine_kwargs)
+	if db_url.startswith("sqlite") and _sqlite_tuned():
+		_apply_sqlite_pragmas(engine, db_url)
+	_instrument_queries(engine)
+	return engine
 
 
 _engine = _make_engine(DATABASE_URL) if (SQLA_AVAILABLE and DATABASE_URL) else None
@@ -50,28 +140,156 @@ def _ensure_engine():
 			_SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
 
 
+_init_lock = threading.Lock()
+_db_initialized = False
+
+
 def init_db():
+	"""Создаёт схему и применяет миграции; повторные вызовы — no-op"""
+	global _db_initialized
 	_ensure_engine()
-	if _engine is None or not SQLA_AVAILABLE:
+	if _engine is None or not SQLA_AVAILABLE or _db_initialized:
 		return
+	with _init_lock:
+		if _db_initialized:
+			return
+		_init_schema()
+		_db_initialized = True
+
+
+def _init_schema():
 	# import models to register metadata (only when SQLAlchemy is available)
 	try:
 		from models.document import Document  # noqa: F401
-		from models.homework import Homework, HomeworkSubmission  # noqa: F401
+		from models.homework import HomeworkTemplate, Homework, HomeworkSubmission  # noqa: F401
 		from models.test import Test, TestQuestion, TestSubmission  # noqa: F401
-		Base.metadata.create_all(bind=_engine)
+		from utils.migrations import migrate_homework_templates
 	except Exception:
 		# Silently skip DB init if models import fails
 		return
+	# Ошибка схемы или миграции не глотается: иначе приложение работает со старой схемой.
+	# init_db() не помечается выполненным и повторится при следующем обращении к БД
+	try:
+		Base.metadata.create_all(bind=_engine)
+		migrate_homework_templates(_engine)
+		# create_all не трогает уже существующие таблицы — добавляем недостающие индексы отдельно
+		for table in Base.metadata.sorted_tables:
+			for index in table.indexes:
+				index.create(bind=_engine, checkfirst=True)
+	except Exception:
+		logger.exception("Не удалось создать схему БД или применить миграции")
+		raise
 
 
 def get_db() -> Optional["Session"]:
 	_ensure_engine()
 	if _SessionLocal is None:
 		return None
+	# Схема создаётся при первом обращении к БД (или заранее из lifespan в app.py)
+	init_db()
 	return _SessionLocal()
 
 
 def has_db() -> bool:
 	_ensure_engine()
 	return _engine is not None and SQLA_AVAILABLE
+
+
+def get_db_session() -> Iterator[Optional["Session"]]:
+	"""
+	FastAPI-зависимость: сессия на время запроса.
+	При исключении в обработчике — rollback, в любом случае — close.
+	"""
+	db = get_db()
+	if db is None:
+		yield None
+		return
+	try:
+		yield db
+	except Exception:
+		db.rollback()
+		raise
+	finally:
+		db.close()
+
+
+# ====== Асинхронный engine (включается через DB_ASYNC=1) ======
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def _async_url(db_url: str) -> Optional[str]:
+	"""Подбирает асинхронный драйвер для DATABASE_URL (ASYNC_DATABASE_URL имеет приоритет)."""
+	explicit = os.getenv("ASYNC_DATABASE_URL")
+	if explicit:
+		return explicit
+	if db_url.startswith("sqlite:"):
+		return "sqlite+aiosqlite:" + db_url[len("sqlite:"):]
+	if db_url.startswith("postgresql:") or db_url.startswith("postgresql+psycopg2:"):
+		return "postgresql+asyncpg:" + db_url.split(":", 1)[1]
+	return None
+
+
+def _ensure_async_engine():
+	global _async_engine, _AsyncSessionLocal
+	if _async_engine is not None or not ASYNC_SQLA_AVAILABLE:
+		return
+	if os.getenv("DB_ASYNC", "0").lower() not in ("1", "true", "yes"):
+		return
+	_ensure_engine()
+	url = _async_url(DATABASE_URL) if DATABASE_URL else None
+	if not url:
+		return
+	try:
+		kwargs = {"pool_pre_ping": True}
+		if not url.startswith("sqlite"):
+			kwargs.update({"pool_size": 10, "max_overflow": 20})
+		elif _sqlite_tuned() and not _is_sqlite_memory(url):
+			kwargs.update({"pool_size": SQLITE_POOL_SIZE, "max_overflow": 0})
+		_async_engine = create_async_engine(url, **kwargs)
+		if url.startswith("sqlite") and _sqlite_tuned():
+			_apply_sqlite_pragmas(_async_engine.sync_engine, url)
+		_instrument_queries(_async_engine.sync_engine)
+		_AsyncSessionLocal = async_sessionmaker(_async_engine, expire_on_commit=False)
+	except Exception as e:
+		# Драйвер не установлен — остаёмся на синхронном пути
+		logger.warning("Async engine недоступен (%s): %s", url.split(':', 1)[0], e)
+		_async_engine = None
+		_AsyncSessionLocal = None
+
+
+def has_async_db() -> bool:
+	_ensure_async_engine()
+	return _AsyncSessionLocal is not None
+
+
+async def get_async_db_session() -> AsyncIterator[Optional["AsyncSession"]]:
+	"""FastAPI-зависимость: AsyncSession на время запроса или None, если async-путь выключен."""
+	if not has_async_db():
+		yield None
+		return
+	init_db()
+	async with _AsyncSessionLocal() as adb:
+		try:
+			yield adb
+		except Exception:
+			await adb.rollback()
+			raise
+
+
+async def fetch_all(stmt, db: Optional["Session"], adb: Optional["AsyncSession"] = None) -> list:
+	"""
+	Выполняет SELECT и возвращает список ORM-объектов.
+	Через AsyncSession, если она есть, иначе синхронно в threadpool, не блокируя event loop.
+	"""
+	if adb is not None:
+		return list((await adb.execute(stmt)).scalars().all())
+	from starlette.concurrency import run_in_threadpool
+	return await run_in_threadpool(lambda: list(db.execute(stmt).scalars().all()))
+
+
+async def fetch_one(stmt, db: Optional["Session"], adb: Optional["AsyncSession"] = None) -> Any:
+	"""Как fetch_all, но возвращает первый объект или None."""
+	rows = await fetch_all(stmt.limit(1), db, adb)
+	return rows[0] if rows else None
@@ -0,0 +1,42 @@
+"""
+Условные GET-запросы: ETag / Last-Modified и ответ 304 Not Modified без тела.
+
+Эндпоинт считает валидаторы (дёшево — по версии данных), а тело строит только если клиент
+прислал устаревшие If-None-Match / If-Modified-Since.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict
+
+from fastapi import Request, Response
+
+
+def cache_headers(etag: str, last_modified: datetime) -> Dict[str, str]:
+	"""Заголовки валидаторов; no-cache — клиент кэширует ответ, но каждый раз переспрашивает сервер"""
+	return {
+		"ETag": etag,
+		"Last-Modified": format_datetime(last_modified.astimezone(timezone.utc).replace(microsecond=0), usegmt=True),
+		"Cache-Control": "no-cache",
+	}
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+	"""True, если у клиента актуальная версия (If-None-Match важнее If-Modified-Since)"""
+	if_none_match = request.headers.get("if-none-match")
+	if if_none_match is not None:
+		tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+		return "*" in tags or etag in tags
+	if_modified_since = request.headers.get("if-modified-since")
+	if if_modified_since:
+		try:
+			since = parsedate_to_datetime(if_modified_since)
+		except (TypeError, ValueError):
+			return False
+		if since.tzinfo is None:
+			since = since.replace(tzinfo=timezone.utc)
+		return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+	return False
+
+
+def not_modified(etag: str, last_modified: datetime) -> Response:
+	return Response(status_code=304, headers=cache_headers(etag, last_modified))
@@ -0,0 +1,135 @@
+"""
+Логирование backend: уровни, сэмплирование, неблокирующая запись через очередь и JSON-формат.
+
+Все модули получают логгер через get_logger(name) — имена вида "adapted.<name>".
+Обработчики настраиваются один раз в setup_logging() (вызывается из app.py после загрузки .env).
+
+Переменные окружения:
+	LOG_LEVEL        — общий уровень (DEBUG/INFO/WARNING/ERROR), по умолчанию INFO
+	LOG_LEVELS       — уровни отдельных логгеров: "agents=WARNING,db=DEBUG"
+	LOG_FORMAT       — text | json, по умолчанию text
+	LOG_SAMPLE_RATE  — доля записей ниже WARNING, которые попадают в лог (0..1), по умолчанию 1
+	LOG_QUEUE        — 1/0: писать через QueueHandler в фоновом потоке, по умолчанию 1
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+ROOT_LOGGER = "adapted"
+
+# Стандартные атрибуты LogRecord — всё остальное (extra=...) попадает в JSON как поля
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured = False
+
+
+def get_logger(name: str) -> logging.Logger:
+	"""Логгер подсистемы: get_logger("auth") -> "adapted.auth"."""
+	if name == ROOT_LOGGER or name.startswith(ROOT_LOGGER + "."):
+		return logging.getLogger(name)
+	return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class JsonFormatter(logging.Formatter):
+	"""Одна строка JSON на запись: ts, level, logger, msg и поля из extra."""
+
+	def format(self, record: logging.LogRecord) -> str:
+		entry = {
+			"ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+			"level": record.levelname,
+			"logger": record.name,
+			"msg": record.getMessage(),
+		}
+		for key, value in record.__dict__.items():
+			if key not in _RECORD_ATTRS and not key.startswith("_"):
+				entry[key] = value
+		if record.exc_info:
+			entry["exc"] = self.formatException(record.exc_info)
+		return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+	"""Добавляет в запись request_id текущего HTTP-запроса (см. utils/tracing.py)."""
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		from utils.tracing import current_request_id
+		request_id = current_request_id()
+		if request_id:
+			record.request_id = request_id
+		return True
+
+
+class SamplingFilter(logging.Filter):
+	"""Пропускает только долю rate записей ниже WARNING; предупреждения и ошибки не сэмплируются."""
+
+	def __init__(self, rate: float):
+		super().__init__()
+		self.rate = max(0.0, min(1.0, rate))
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		if record.levelno >= logging.WARNING or self.rate >= 1.0:
+			return True
+		return random.random() < self.rate
+
+
+def _parse_level(value: str, default: int = logging.INFO) -> int:
+	level = logging.getLevelName(str(value).strip().upper())
+	return level if isinstance(level, int) else default
+
+
+def setup_logging(force: bool = False) -> None:
+	"""Настраивает логгер "adapted" по переменным окружения. Повторный вызов ничего не делает (кроме force=True)."""
+	global _listener, _configured
+	with _setup_lock:
+		if _configured and not force:
+			return
+		_shutdown_listener()
+
+		root = logging.getLogger(ROOT_LOGGER)
+		for handler in list(root.handlers):
+			root.removeHandler(handler)
+		root.setLevel(_parse_level(os.getenv("LOG_LEVEL", "INFO")))
+		root.propagate = False
+
+		for item in filter(None, os.getenv("LOG_LEVELS", "").split(",")):
+			name, _, level = item.partition("=")
+			get_logger(name.strip()).setLevel(_parse_level(level))
+
+		stream = logging.StreamHandler(sys.stderr)
+		if os.getenv("LOG_FORMAT", "text").lower() == "json":
+			stream.setFormatter(JsonFormatter())
+		else:
+			stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+		# Фильтр стоит на стороне вызывающего потока: отброшенные записи не попадают даже в очередь
+		sampler = SamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", "1") or 1))
+		if os.getenv("LOG_QUEUE", "1") != "0":
+			handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+			_listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+			_listener.start()
+		else:
+			handler = stream
+		handler.addFilter(sampler)
+		handler.addFilter(RequestIdFilter())  # после сэмплирования — только для записей, которые будут выведены
+		root.addHandler(handler)
+		_configured = True
+
+
+def _shutdown_listener() -> None:
+	global _listener
+	if _listener is not None:
+		_listener.stop()  # дописывает оставшиеся в очереди записи
+		_listener = None
+
+
+atexit.register(_shutdown_listener)
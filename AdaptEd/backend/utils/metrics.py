@@ -0,0 +1,212 @@
+"""
+Метрики в формате Prometheus без внешних зависимостей.
+
+Счётчики и гистограммы живут в памяти процесса; GET /metrics отдаёт их в text exposition format 0.0.4.
+При нескольких воркерах каждый процесс отдаёт свои значения — Prometheus собирает их по отдельности.
+
+	from utils.metrics import histogram, counter
+	LATENCY = histogram("agent_process_duration_seconds", "...", ["agent"])
+	with LATENCY.time(agent="Profiler"):
+		...
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+
+def _escape(value: str) -> str:
+	return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+	pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+	if extra:
+		pairs.append(f'{extra[0]}="{extra[1]}"')
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self._lock = threading.Lock()
+
+	def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+		return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+	def collect(self) -> List[str]:
+		raise NotImplementedError
+
+
+class Counter(_Metric):
+	"""Монотонно растущий счётчик."""
+	kind = "counter"
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self._values: Dict[Tuple[str, ...], float] = {}
+
+	def inc(self, amount: float = 1.0, **labels) -> None:
+		if not METRICS_ENABLED:
+			return
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0.0) + amount
+
+	def value(self, **labels) -> float:
+		return self._values.get(self._key(labels), 0.0)
+
+	def collect(self) -> List[str]:
+		with self._lock:
+			items = list(self._values.items())
+		return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+	"""Значение, которое может расти и убывать."""
+	kind = "gauge"
+
+	def set(self, value: float, **labels) -> None:
+		if not METRICS_ENABLED:
+			return
+		with self._lock:
+			self._values[self._key(labels)] = float(value)
+
+	def dec(self, amount: float = 1.0, **labels) -> None:
+		self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+	"""Гистограмма с кумулятивными бакетами, суммой и количеством наблюдений."""
+	kind = "histogram"
+
+	def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+		super().__init__(name, documentation, labelnames)
+		self.buckets = tuple(sorted(buckets))
+		# key -> [счётчики по бакетам..., +Inf], sum
+		self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+	def observe(self, value: float, **labels) -> None:
+		if not METRICS_ENABLED:
+			return
+		key = self._key(labels)
+		with self._lock:
+			counts, total = self._values.get(key) or self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+			for i, bound in enumerate(self.buckets):
+				if value <= bound:
+					counts[i] += 1
+					break
+			else:
+				counts[-1] += 1
+			total[0] += value
+
+	@contextmanager
+	def time(self, **labels):
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - started, **labels)
+
+	def count(self, **labels) -> int:
+		entry = self._values.get(self._key(labels))
+		return sum(entry[0]) if entry else 0
+
+	def collect(self) -> List[str]:
+		with self._lock:
+			items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+		lines = []
+		for key, counts, total in items:
+			cumulative = 0
+			for bound, n in zip(self.buckets + (float("inf"),), counts):
+				cumulative += n
+				lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+			lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+			lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+		return lines
+
+
+_registry: Dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(cls, name: str, documentation: str, labelnames: Iterable[str] = (), **kwargs):
+	"""Повторная регистрация с тем же именем возвращает уже существующую метрику."""
+	with _registry_lock:
+		metric = _registry.get(name)
+		if metric is None:
+			metric = _registry[name] = cls(name, documentation, labelnames, **kwargs)
+		return metric
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+	return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+	return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+	return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render() -> str:
+	"""Все метрики в Prometheus text exposition format."""
+	with _registry_lock:
+		metrics = sorted(_registry.values(), key=lambda m: m.name)
+	lines = []
+	for metric in metrics:
+		lines.append(f"# HELP {metric.name} {metric.documentation}")
+		lines.append(f"# TYPE {metric.name} {metric.kind}")
+		lines.extend(metric.collect())
+	return "\n".join(lines) + "\n"
+
+
+# Общие метрики, которые пишут разные модули
+
+HTTP_REQUEST_DURATION = histogram(
+	"http_request_duration_seconds", "Время обработки HTTP-запроса по шаблону маршрута", ["method", "route", "status"]
+)
+HTTP_IN_PROGRESS = gauge("http_requests_in_progress", "Запросы, обрабатываемые прямо сейчас")
+
+AGENT_PROCESS_DURATION = histogram("agent_process_duration_seconds", "Время BaseAgent.process() по агентам", ["agent"])
+AGENT_PROCESS_ERRORS = counter("agent_process_errors_total", "Исключения в BaseAgent.process()", ["agent"])
+
+LLM_REQUEST_DURATION = histogram("llm_request_duration_seconds", "Полное время запроса к LLM", ["provider"], buckets=LLM_BUCKETS)
+LLM_QUEUE_WAIT = histogram(
+	"llm_queue_wait_seconds", "Ожидание до начала обработки (время запроса минус серверное время модели)", ["provider"], buckets=LLM_BUCKETS
+)
+LLM_TIME_TO_FIRST_TOKEN = histogram(
+	"llm_time_to_first_token_seconds", "Время до первого токена (загрузка модели + обработка промпта)", ["provider"], buckets=LLM_BUCKETS
+)
+LLM_TOKENS_PER_SECOND = histogram(
+	"llm_tokens_per_second", "Скорость генерации", ["provider"], buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 200, 500)
+)
+LLM_GENERATED_TOKENS = counter("llm_generated_tokens_total", "Сгенерированные токены", ["provider"])
+LLM_FAILURES = counter("llm_failures_total", "Неудачные запросы к LLM", ["provider", "reason"])
+
+DB_QUERY_DURATION = histogram("db_query_duration_seconds", "Время SQL-запроса по типу операции", ["operation"])
+
+CACHE_REQUESTS = counter("cache_requests_total", "Обращения к кэшам", ["cache", "result"])
+
+
+def record_cache(cache: str, hit: bool) -> None:
+	"""Учитывает попадание/промах кэша; доля попаданий = hit / (hit + miss)."""
+	CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
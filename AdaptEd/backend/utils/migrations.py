@@ -0,0 +1,68 @@
+"""
+Простые миграции схемы БД (без Alembic), выполняются из init_db()
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text, column, inspect, select, table, text  # type: ignore
+
+# Старая схема homeworks (до homework_templates): типизированные колонки, чтобы SQLite отдавал
+# created_at как datetime, а не строку
+_legacy_homeworks = table(
+	"homeworks",
+	column("id", Integer),
+	column("title", String),
+	column("description", Text),
+	column("subject", String),
+	column("created_by", String),
+	column("created_at", DateTime),
+	column("template_id", Integer),
+)
+
+
+def migrate_homework_templates(engine):
+	"""
+	Переносит title/description/subject из строк homeworks в homework_templates.
+
+	Одинаковые задания (title, description, subject, created_by) сворачиваются в один шаблон,
+	строка homeworks получает template_id, а дублирующиеся колонки удаляются.
+	"""
+	from models.homework import HomeworkTemplate  # type: ignore
+
+	insp = inspect(engine)
+	if "homeworks" not in insp.get_table_names():
+		return
+	columns = {c["name"] for c in insp.get_columns("homeworks")}
+	if "title" not in columns:
+		return  # уже нормализовано
+
+	with engine.begin() as conn:
+		if "template_id" not in columns:
+			conn.execute(text("ALTER TABLE homeworks ADD COLUMN template_id INTEGER REFERENCES homework_templates(id)"))
+
+		legacy = _legacy_homeworks.c
+		rows = conn.execute(
+			select(legacy.id, legacy.title, legacy.description, legacy.subject, legacy.created_by, legacy.created_at)
+			.where(legacy.template_id.is_(None))
+			.order_by(legacy.id)
+		).all()
+		templates = {}
+		updates = []
+		for row in rows:
+			key = (row.title, row.description, row.subject, row.created_by)
+			if key not in templates:
+				result = conn.execute(
+					HomeworkTemplate.__table__.insert().values(
+						title=row.title or "",
+						description=row.description,
+						subject=row.subject,
+						created_by=row.created_by,
+						created_at=row.created_at or datetime.utcnow(),
+					)
+				)
+				templates[key] = result.inserted_primary_key[0]
+			updates.append({"template_id": templates[key], "id": row.id})
+		if updates:
+			conn.execute(text("UPDATE homeworks SET template_id = :template_id WHERE id = :id"), updates)
+
+		for column in ("title", "description", "subject"):
+			conn.execute(text(f"ALTER TABLE homeworks DROP COLUMN {column}"))
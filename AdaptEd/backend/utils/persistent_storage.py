@@ -6,6 +6,12 @@ import os
 from datetime import datetime
 from typing import Dict, Any
 
+from utils.state_store import StateMap, get_state_store
+from utils.logger import get_logger
+from utils.tracing import traced
+
+logger = get_logger("storage")
+
 
 class PersistentStorage:
     """Класс для постоянного хранения данных"""
@@ -15,7 +21,24 @@ class PersistentStorage:
         import os
         backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.data_file = os.path.join(backend_dir, data_file)
-        self.data = self._load_data()
+        self.shared = False
+        self._data = None  # загружается при первом обращении, а не при импорте
+    
+    @property
+    def data(self):
+        if self._data is None:
+            # При общем хранилище (STATE_BACKEND=sqlite) ключи живут в нём и видны всем воркерам;
+            # JSON-файл используется только для первоначального импорта
+            self.shared = get_state_store().serializes
+            if self.shared:
+                data = StateMap("storage")
+                if len(data) == 0:
+                    for key, value in self._load_data().items():
+                        data[key] = value
+            else:
+                data = self._load_data()
+            self._data = data
+        return self._data
     
     def _load_data(self) -> Dict[str, Any]:
         """Загружает данные из файла"""
@@ -24,7 +47,7 @@ class PersistentStorage:
                 with open(self.data_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
-                print(f"Ошибка загрузки данных: {e}")
+                logger.error("Ошибка загрузки данных: %s", e)
                 return self._get_default_data()
         else:
             return self._get_default_data()
@@ -38,13 +61,16 @@ class PersistentStorage:
             "assigned_tasks": {}
         }
     
+    @traced("storage.save_data", "storage")
     def save_data(self):
         """Сохраняет данные в файл"""
+        if self.shared:
+            return  # каждая запись уже попала в общее хранилище
         try:
             with open(self.data_file, 'w', encoding='utf-8') as f:
                 json.dump(self.data, f, ensure_ascii=False, indent=2, default=str)
         except Exception as e:
-            print(f"Ошибка сохранения данных: {e}")
+            logger.error("Ошибка сохранения данных: %s", e)
     
     def get(self, key: str, default=None):
         """Получает значение по ключу"""
@@ -57,9 +83,9 @@ class PersistentStorage:
     
     def update(self, key: str, updates: Dict[str, Any]):
         """Обновляет данные по ключу"""
-        if key not in self.data:
-            self.data[key] = {}
-        self.data[key].update(updates)
+        current = self.data.get(key) or {}
+        current.update(updates)
+        self.data[key] = current
         self.save_data()
 
 
@@ -0,0 +1,182 @@
+"""
+Профилирование отдельных запросов (cProfile) с сохранением медленных в ротируемую папку.
+
+Включается только явно (PROFILING=1). Выбранный запрос профилируется целиком: асинхронная часть —
+в потоке event loop (ProfilingMiddleware), синхронный обработчик — в потоке threadpool
+(install_profiling оборачивает такие эндпоинты). Оба профиля объединяются в один .prof.
+Профиль потока event loop может захватить и асинхронную работу параллельных запросов;
+одновременно профилируется не больше одного запроса.
+
+Переменные окружения:
+	PROFILING            — 1, чтобы включить (по умолчанию выключено)
+	PROFILE_SAMPLE_RATE  — доля запросов, которые профилируются, по умолчанию 1
+	PROFILE_SLOW_MS      — сохранять профиль, только если запрос шёл дольше, по умолчанию 500
+	PROFILE_DIR          — папка для профилей, по умолчанию backend/profiles
+	PROFILE_KEEP         — сколько последних профилей хранить, по умолчанию 100
+	PROFILE_EXCLUDE      — префиксы путей, которые не профилируются, по умолчанию /admin/profiles,/metrics
+
+Профилировщик сам замедляет запрос (cProfile — в 1.5-2 раза): для продакшена разумно
+PROFILE_SAMPLE_RATE=0.05 и порог по задержке, для локальной отладки — 1 и 0.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils.logger import get_logger
+from utils.tracing import current_request_id
+
+PROFILING = os.getenv("PROFILING", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1") or 1)
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500") or 0)
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100") or 100)
+# Служебные запросы не профилируются: просмотр профилей не должен вытеснять сами профили
+PROFILE_EXCLUDE = tuple(p for p in os.getenv("PROFILE_EXCLUDE", "/admin/profiles,/metrics").split(",") if p)
+
+logger = get_logger("profiling")
+
+# Профили потоков threadpool текущего запроса (список общий для запроса, потоки добавляют свои)
+_thread_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("thread_profiles", default=None)
+_write_lock = threading.Lock()
+# В потоке event loop активен только один cProfile: параллельный профиль отключил бы предыдущий
+_loop_profile_busy = False
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _profiled_sync(func):
+	"""Синхронный эндпоинт в потоке threadpool: профилирует вызов, если запрос выбран для профилирования"""
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		profiles = _thread_profiles.get()
+		if profiles is None:
+			return func(*args, **kwargs)
+		profile = cProfile.Profile()
+		profile.enable()
+		try:
+			return func(*args, **kwargs)
+		finally:
+			profile.disable()
+			profiles.append(profile)
+	return wrapper
+
+
+def install_profiling(app) -> None:
+	"""Подключает middleware и оборачивает синхронные эндпоинты; вызывать после include_router."""
+	if not PROFILING:
+		return
+	import asyncio
+	from fastapi.routing import APIRoute
+
+	for route in app.routes:
+		if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.dependant.call):
+			route.dependant.call = _profiled_sync(route.dependant.call)
+	app.add_middleware(ProfilingMiddleware)
+	logger.info("profiling on: sample_rate=%s slow_ms=%s dir=%s", PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS, PROFILE_DIR)
+
+
+class ProfilingMiddleware:
+	"""ASGI-middleware: профилирует выбранные запросы и сохраняет те, что медленнее PROFILE_SLOW_MS"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		global _loop_profile_busy
+		if (scope["type"] != "http" or _loop_profile_busy or scope["path"].startswith(PROFILE_EXCLUDE)
+				or random.random() >= PROFILE_SAMPLE_RATE):
+			await self.app(scope, receive, send)
+			return
+
+		_loop_profile_busy = True
+		thread_profiles: List[cProfile.Profile] = []
+		token = _thread_profiles.set(thread_profiles)
+		loop_profile = cProfile.Profile()
+		started = time.perf_counter()
+		loop_profile.enable()
+		try:
+			await self.app(scope, receive, send)
+		finally:
+			loop_profile.disable()
+			_loop_profile_busy = False
+			_thread_profiles.reset(token)
+			elapsed_ms = (time.perf_counter() - started) * 1000
+			if elapsed_ms >= PROFILE_SLOW_MS:
+				route = scope.get("route")
+				_save(loop_profile, thread_profiles, scope["method"], getattr(route, "path", scope["path"]), elapsed_ms)
+
+
+def _save(loop_profile: cProfile.Profile, thread_profiles: List[cProfile.Profile], method: str, route: str, elapsed_ms: float) -> None:
+	try:
+		stats = pstats.Stats(loop_profile)
+		for profile in thread_profiles:
+			stats.add(profile)
+	except TypeError:
+		return  # пустой профиль: запрос не выполнил ни одного Python-вызова под профилировщиком
+	request_id = current_request_id() or "-"
+	name = "{}_{}_{}_{}ms_{}".format(
+		datetime.now().strftime("%Y%m%d-%H%M%S-%f"), method, _SAFE.sub("_", route).strip("_") or "root", int(elapsed_ms), request_id[:12],
+	)
+	with _write_lock:
+		os.makedirs(PROFILE_DIR, exist_ok=True)
+		stats.dump_stats(os.path.join(PROFILE_DIR, name + ".prof"))
+		_rotate()
+	logger.info("profile saved %s %s %.0f ms", method, route, elapsed_ms, extra={"profile": name})
+
+
+def _rotate() -> None:
+	files = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith(".prof"))
+	for old in files[:-PROFILE_KEEP] if len(files) > PROFILE_KEEP else []:
+		try:
+			os.remove(os.path.join(PROFILE_DIR, old))
+		except OSError:
+			pass
+
+
+def list_profiles() -> List[Dict]:
+	"""Сохранённые профили, новые первыми."""
+	if not os.path.isdir(PROFILE_DIR):
+		return []
+	result = []
+	for filename in sorted(os.listdir(PROFILE_DIR), reverse=True):
+		if not filename.endswith(".prof"):
+			continue
+		name = filename[:-len(".prof")]
+		parts = name.split("_")
+		stat = os.stat(os.path.join(PROFILE_DIR, filename))
+		result.append({
+			"name": name,
+			"method": parts[1] if len(parts) > 1 else None,
+			"route": "_".join(parts[2:-2]) if len(parts) > 4 else None,
+			"duration_ms": int(parts[-2][:-2]) if len(parts) > 3 and parts[-2].endswith("ms") else None,
+			"request_id": parts[-1] if len(parts) > 4 else None,
+			"created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+			"size_bytes": stat.st_size,
+		})
+	return result
+
+
+def profile_path(name: str) -> Optional[str]:
+	"""Путь к профилю по имени из list_profiles(); None, если такого нет."""
+	if _SAFE.search(name) or name.startswith("."):
+		return None
+	path = os.path.join(PROFILE_DIR, name + ".prof")
+	return path if os.path.isfile(path) else None
+
+
+def profile_summary(name: str, limit: int = 40, sort: str = "cumulative") -> Optional[str]:
+	"""Текстовый отчёт pstats: самые дорогие функции профиля."""
+	path = profile_path(name)
+	if path is None:
+		return None
+	out = io.StringIO()
+	pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+	return out.getvalue()
@@ -0,0 +1,211 @@
+"""
+Общее хранилище состояния (сессии, профили, persistent_storage).
+
+Бэкенд выбирается переменной STATE_BACKEND:
+- memory (по умолчанию): словари в памяти процесса, объекты хранятся как есть
+- sqlite: общий файл SQLite (STATE_DB_PATH) — все воркеры видят одно и то же состояние
+"""
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional, Type
+
+_MISSING = object()
+
+
+class StateStore(ABC):
+	"""Key-value хранилище с пространствами имён"""
+
+	# True, если значения сериализуются (нужно кодировать pydantic-модели)
+	serializes = False
+
+	@abstractmethod
+	def get(self, namespace: str, key: str, default: Any = None) -> Any:
+		pass
+
+	@abstractmethod
+	def set(self, namespace: str, key: str, value: Any):
+		pass
+
+	@abstractmethod
+	def delete(self, namespace: str, key: str) -> bool:
+		pass
+
+	@abstractmethod
+	def keys(self, namespace: str) -> list:
+		pass
+
+	@abstractmethod
+	def count(self, namespace: str) -> int:
+		pass
+
+	@abstractmethod
+	def claim(self, namespace: str, key: str, token: str) -> bool:
+		"""Атомарно записывает token, если значение ключа ещё не равно ему; True — записал этот вызов"""
+		pass
+
+
+class MemoryStateStore(StateStore):
+	"""Состояние в памяти одного процесса"""
+
+	def __init__(self):
+		self._data: Dict[str, Dict[str, Any]] = {}
+		self._lock = threading.Lock()
+
+	def get(self, namespace: str, key: str, default: Any = None) -> Any:
+		return self._data.get(namespace, {}).get(key, default)
+
+	def set(self, namespace: str, key: str, value: Any):
+		with self._lock:
+			self._data.setdefault(namespace, {})[key] = value
+
+	def delete(self, namespace: str, key: str) -> bool:
+		with self._lock:
+			return self._data.get(namespace, {}).pop(key, _MISSING) is not _MISSING
+
+	def keys(self, namespace: str) -> list:
+		return list(self._data.get(namespace, {}).keys())
+
+	def count(self, namespace: str) -> int:
+		return len(self._data.get(namespace, {}))
+
+	def claim(self, namespace: str, key: str, token: str) -> bool:
+		with self._lock:
+			values = self._data.setdefault(namespace, {})
+			if values.get(key) == token:
+				return False
+			values[key] = token
+			return True
+
+
+class SQLiteStateStore(StateStore):
+	"""Состояние в общем файле SQLite (WAL), значения — JSON"""
+
+	serializes = True
+
+	def __init__(self, path: str):
+		self.path = path
+		self._local = threading.local()
+		conn = self._conn()
+		conn.execute(
+			"CREATE TABLE IF NOT EXISTS kv ("
+			" namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+			" PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+		)
+
+	def _conn(self) -> sqlite3.Connection:
+		# Одно соединение на поток; autocommit, каждая запись — отдельная транзакция
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute("PRAGMA busy_timeout=30000")
+			self._local.conn = conn
+		return conn
+
+	def get(self, namespace: str, key: str, default: Any = None) -> Any:
+		row = self._conn().execute("SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+		return json.loads(row[0]) if row else default
+
+	def set(self, namespace: str, key: str, value: Any):
+		self._conn().execute(
+			"INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?)"
+			" ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value",
+			(namespace, key, json.dumps(value, ensure_ascii=False, default=str)),
+		)
+
+	def delete(self, namespace: str, key: str) -> bool:
+		cur = self._conn().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+		return cur.rowcount > 0
+
+	def keys(self, namespace: str) -> list:
+		return [r[0] for r in self._conn().execute("SELECT key FROM kv WHERE namespace = ?", (namespace,))]
+
+	def count(self, namespace: str) -> int:
+		return self._conn().execute("SELECT COUNT(*) FROM kv WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+	def claim(self, namespace: str, key: str, token: str) -> bool:
+		# Одна инструкция — атомарно между процессами; rowcount = 0, если значение уже равно token
+		cur = self._conn().execute(
+			"INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?)"
+			" ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value WHERE kv.value <> excluded.value",
+			(namespace, key, json.dumps(token)),
+		)
+		return cur.rowcount > 0
+
+
+class StateMap(MutableMapping):
+	"""
+	Словарь поверх пространства имён хранилища.
+	Для сериализующих бэкендов pydantic-модели кодируются через .dict() и восстанавливаются при чтении.
+	Изменённый объект нужно записать обратно (state_map[key] = obj), чтобы его увидели другие воркеры.
+	"""
+
+	def __init__(self, namespace: str, model: Optional[Type] = None, store: Optional[StateStore] = None):
+		self.namespace = namespace
+		self.model = model
+		self._store = store
+
+	@property
+	def store(self) -> StateStore:
+		return self._store or get_state_store()
+
+	def _encode(self, value: Any) -> Any:
+		if self.model is not None and self.store.serializes and hasattr(value, "dict"):
+			return value.dict()
+		return value
+
+	def _decode(self, value: Any) -> Any:
+		if self.model is not None and self.store.serializes and isinstance(value, dict):
+			return self.model(**value)
+		return value
+
+	def __getitem__(self, key: str) -> Any:
+		value = self.store.get(self.namespace, key, _MISSING)
+		if value is _MISSING:
+			raise KeyError(key)
+		return self._decode(value)
+
+	def get(self, key: str, default: Any = None) -> Any:
+		value = self.store.get(self.namespace, key, _MISSING)
+		return default if value is _MISSING else self._decode(value)
+
+	def __setitem__(self, key: str, value: Any):
+		self.store.set(self.namespace, key, self._encode(value))
+
+	def __delitem__(self, key: str):
+		if not self.store.delete(self.namespace, key):
+			raise KeyError(key)
+
+	def __contains__(self, key: object) -> bool:
+		return self.store.get(self.namespace, key, _MISSING) is not _MISSING
+
+	def __iter__(self) -> Iterator[str]:
+		return iter(self.store.keys(self.namespace))
+
+	def __len__(self) -> int:
+		return self.store.count(self.namespace)
+
+
+_state_store: Optional[StateStore] = None
+_state_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+	"""Глобальное хранилище состояния (создаётся при первом обращении)"""
+	global _state_store
+	if _state_store is None:
+		with _state_lock:
+			if _state_store is None:
+				backend = os.getenv("STATE_BACKEND", "memory").lower()
+				if backend == "sqlite":
+					backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+					path = os.getenv("STATE_DB_PATH", os.path.join(backend_dir, "state.db"))
+					_state_store = SQLiteStateStore(path)
+				else:
+					_state_store = MemoryStateStore()
+	return _state_store
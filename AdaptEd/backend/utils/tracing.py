@@ -0,0 +1,275 @@
+"""
+Лёгкие трассировочные спаны с API в стиле OpenTelemetry и локальным экспортом.
+
+	from utils.tracing import get_tracer, traced
+	tracer = get_tracer("agents")
+	with tracer.start_as_current_span("profiler.update", attributes={"user_id": user_id}) as span:
+		span.set_attribute("attempts", n)
+
+	@traced("orchestrator.process_task_submission")
+	def process_task_submission(...): ...
+
+Переменные окружения:
+	TRACING     — off (по умолчанию) | console | file | otel
+	              console — завершённые спаны пишутся в лог "adapted.trace";
+	              file    — по строке JSON на спан в TRACE_FILE;
+	              otel    — спаны создаёт opentelemetry-api (экспорт настраивается SDK приложения)
+	TRACE_FILE  — путь для TRACING=file, по умолчанию traces.jsonl
+
+Идентификатор запроса (X-Request-ID) хранится в contextvar и доступен через current_request_id()
+при любом значении TRACING: его добавляют в ответ, в логи и в атрибуты спанов.
+"""
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from utils.logger import get_logger
+
+TRACING = os.getenv("TRACING", "off").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+logger = get_logger("trace")
+
+
+def current_request_id() -> Optional[str]:
+	return _request_id.get()
+
+
+def set_request_id(request_id: Optional[str]):
+	"""Возвращает токен для reset_request_id()."""
+	return _request_id.set(request_id)
+
+
+def reset_request_id(token) -> None:
+	_request_id.reset(token)
+
+
+def new_request_id() -> str:
+	return secrets.token_hex(16)
+
+
+class Span:
+	"""Завершённый спан экспортируется одной записью: trace_id, span_id, родитель, время в наносекундах, атрибуты."""
+
+	__slots__ = ("name", "trace_id", "span_id", "parent_span_id", "start_ns", "end_ns", "attributes", "status")
+
+	def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+		self.name = name
+		self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+		self.span_id = secrets.token_hex(8)
+		self.parent_span_id = parent.span_id if parent else None
+		self.start_ns = time.time_ns()
+		self.end_ns: Optional[int] = None
+		self.attributes: Dict[str, Any] = dict(attributes or {})
+		self.status = "OK"
+		request_id = _request_id.get()
+		if request_id:
+			self.attributes.setdefault("request_id", request_id)
+
+	def set_attribute(self, key: str, value: Any) -> None:
+		self.attributes[key] = value
+
+	def update_name(self, name: str) -> None:
+		self.name = name
+
+	def record_exception(self, exc: BaseException) -> None:
+		self.status = "ERROR"
+		self.attributes["exception.type"] = type(exc).__name__
+		self.attributes["exception.message"] = str(exc)[:500]
+
+	def is_recording(self) -> bool:
+		return True
+
+	def end(self) -> None:
+		if self.end_ns is None:
+			self.end_ns = time.time_ns()
+			_export(self)
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"name": self.name,
+			"trace_id": self.trace_id,
+			"span_id": self.span_id,
+			"parent_span_id": self.parent_span_id,
+			"start_time_unix_nano": self.start_ns,
+			"end_time_unix_nano": self.end_ns,
+			"duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+			"status": self.status,
+			"attributes": self.attributes,
+		}
+
+
+class _NoopSpan:
+	"""Спан при TRACING=off: все методы ничего не делают, создание ничего не стоит."""
+
+	def set_attribute(self, key: str, value: Any) -> None:
+		pass
+
+	def update_name(self, name: str) -> None:
+		pass
+
+	def record_exception(self, exc: BaseException) -> None:
+		pass
+
+	def is_recording(self) -> bool:
+		return False
+
+	def end(self) -> None:
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+	def __init__(self, name: str):
+		self.name = name
+
+	def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+		"""Спан без установки текущего контекста; завершается вызовом end()."""
+		if TRACING == "off":
+			return _NOOP_SPAN
+		return Span(name, _current_span.get(), attributes)
+
+	@contextmanager
+	def _current(self, name: str, attributes: Optional[Dict[str, Any]]):
+		span = Span(name, _current_span.get(), attributes)
+		token = _current_span.set(span)
+		try:
+			yield span
+		except BaseException as exc:
+			span.record_exception(exc)
+			raise
+		finally:
+			_current_span.reset(token)
+			span.end()
+
+	def start_as_current_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+		if TRACING == "off":
+			return _NOOP_SPAN
+		return self._current(name, attributes)
+
+
+class _OtelTracer:
+	"""Делегирует opentelemetry-api, добавляя request_id в атрибуты."""
+
+	def __init__(self, tracer):
+		self._tracer = tracer
+
+	def _attrs(self, attributes):
+		attributes = dict(attributes or {})
+		request_id = _request_id.get()
+		if request_id:
+			attributes.setdefault("request_id", request_id)
+		return attributes
+
+	def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+		return self._tracer.start_span(name, attributes=self._attrs(attributes))
+
+	def start_as_current_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+		return self._tracer.start_as_current_span(name, attributes=self._attrs(attributes))
+
+
+_tracers: Dict[str, Any] = {}
+
+
+def get_tracer(name: str):
+	tracer = _tracers.get(name)
+	if tracer is None:
+		if TRACING == "otel":
+			try:
+				from opentelemetry import trace as otel_trace  # type: ignore
+				tracer = _OtelTracer(otel_trace.get_tracer(f"adapted.{name}"))
+			except Exception:
+				logger.warning("TRACING=otel, но opentelemetry-api не установлен — спаны отключены")
+				tracer = Tracer(name)
+		else:
+			tracer = Tracer(name)
+		_tracers[name] = tracer
+	return tracer
+
+
+def traced(name: str, tracer_name: str = "app"):
+	"""Декоратор: вызов функции — отдельный спан name."""
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if TRACING == "off":
+				return func(*args, **kwargs)
+			with get_tracer(tracer_name).start_as_current_span(name):
+				return func(*args, **kwargs)
+		return wrapper
+	return decorator
+
+
+_file_lock = threading.Lock()
+_file = None
+
+
+def _export(span: Span) -> None:
+	global _file
+	if TRACING == "console":
+		logger.info("span %s %.3f ms", span.name, (span.end_ns - span.start_ns) / 1e6, extra={"span": span.to_dict()})
+	elif TRACING == "file":
+		line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+		with _file_lock:
+			if _file is None:
+				_file = open(TRACE_FILE, "a", encoding="utf-8", buffering=1)
+			_file.write(line)
+
+
+class RequestIdMiddleware:
+	"""ASGI-middleware: X-Request-ID из запроса (или новый) в contextvar, в ответ и в корневой спан запроса"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		request_id = None
+		for key, value in scope.get("headers", ()):
+			if key == b"x-request-id":
+				request_id = value.decode("latin-1")[:128]
+				break
+		request_id = request_id or new_request_id()
+		header = (REQUEST_ID_HEADER.lower().encode(), request_id.encode("latin-1"))
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				message["headers"] = list(message.get("headers", ())) + [header]
+				if span.is_recording():
+					span.set_attribute("http.status_code", message["status"])
+			await send(message)
+
+		token = set_request_id(request_id)
+		try:
+			with get_tracer("http").start_as_current_span(
+				f"{scope['method']} {scope['path']}", attributes={"http.method": scope["method"]}
+			) as span:
+				await self.app(scope, receive, send_wrapper)
+				route = scope.get("route")
+				if span.is_recording() and route is not None:
+					# Шаблон маршрута вместо конкретного URL; update_name — API спанов OpenTelemetry (name там только для чтения)
+					span.update_name(f"{scope['method']} {route.path}")
+		finally:
+			reset_request_id(token)
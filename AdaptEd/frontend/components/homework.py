@@ -3,6 +3,8 @@
 """
 import streamlit as st
 import requests
+import pandas as pd
+from datetime import datetime, timedelta
 from typing import Dict, Any
 
 
@@ -199,6 +201,31 @@ def show_test_interface():
 				st.rerun()
 
 
+# Период графика динамики -> сколько дней назад (None — вся история)
+PROGRESS_PERIODS = {"Неделя": 7, "Месяц": 30, "Год": 365, "Всё время": None}
+
+
+def _show_progress_chart(user_id: str):
+	"""График точности и числа заданий по времени (ряд прорежен на сервере до ~200 точек)"""
+	st.subheader("📈 Динамика")
+	period = st.radio("Период", list(PROGRESS_PERIODS), horizontal=True, key="progress_period")
+	params = {"id": user_id, "points": 200}
+	if PROGRESS_PERIODS[period]:
+		params["start"] = (datetime.now() - timedelta(days=PROGRESS_PERIODS[period])).isoformat(timespec="seconds")
+	resp = _client().get("http://127.0.0.1:8000/agents/timeseries/student", params=params)
+	if resp.status_code != 200:
+		st.caption("Динамика недоступна")
+		return
+	points = resp.json().get("points", [])
+	if not points:
+		st.info("За этот период заданий нет")
+		return
+	df = pd.DataFrame(points)
+	df["t"] = pd.to_datetime(df["t"])
+	df = df.set_index("t").rename(columns={"accuracy": "Точность (%)", "attempts": "Заданий"})
+	st.line_chart(df[["Точность (%)", "Заданий"]])
+
+
 def show_statistics():
 	"""Показывает статистику и слабые места ученика"""
 	st.header("📊 Статистика и анализ")
@@ -228,6 +255,8 @@ def show_statistics():
 			with col4:
 				st.metric("🏆 Очки", stats.get('points', 0))
 			
+			_show_progress_chart(user_id)
+			
 			# Слабые места
 			weaknesses = data.get("weaknesses", [])
 			if weaknesses:
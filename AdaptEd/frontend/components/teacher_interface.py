@@ -24,13 +24,23 @@ def show_teacher_dashboard():
             session = requests.Session()
             session.trust_env = False  # Отключаем прокси
             
+            # Отчёт, полученный ранее, и его ETag: если класс не менялся, сервер ответит 304 без тела
+            cached_reports = st.session_state.setdefault("teacher_reports", {})
+            cached = cached_reports.get(report_type)
+            headers = {"If-None-Match": cached["etag"]} if cached else {}
+            
             response = session.get(
                 f"http://127.0.0.1:8000/agents/teacher-report",
-                params={"report_type": report_type}
+                params={"report_type": report_type},
+                headers=headers
             )
             
-            if response.status_code == 200:
+            if response.status_code == 304 and cached:
+                display_teacher_report(cached["report"], report_type)
+            elif response.status_code == 200:
                 report = response.json()
+                if response.headers.get("ETag"):
+                    cached_reports[report_type] = {"etag": response.headers["ETag"], "report": report}
                 display_teacher_report(report, report_type)
             else:
                 st.error(f"Ошибка загрузки отчета: {response.status_code}")
@@ -1,5 +1,7 @@
+import { useEffect, useState } from 'react';
 import { BarChart, Bar, LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, PieChart, Pie, Cell } from 'recharts';
 import { TrendingUp, AlertTriangle, Clock } from 'lucide-react';
+import { fetchTimeSeries } from '../services/analytics';
 
 interface ProgressData {
   totalTopics: number;
@@ -21,16 +23,27 @@ interface ProgressData {
 }
 
 export function ProgressStats({ progress }: { progress: ProgressData }) {
-  // Weekly progress data
-  const weeklyData = [
-    { day: 'Пн', score: 85, tasks: 12 },
-    { day: 'Вт', score: 78, tasks: 15 },
-    { day: 'Ср', score: 92, tasks: 10 },
-    { day: 'Чт', score: 88, tasks: 14 },
-    { day: 'Пт', score: 90, tasks: 11 },
-    { day: 'Сб', score: 87, tasks: 9 },
-    { day: 'Вс', score: 94, tasks: 8 }
-  ];
+  // Weekly progress data: daily buckets of the student's time series for the last 7 days
+  const [weeklyData, setWeeklyData] = useState<Array<{ day: string; score: number; tasks: number }>>([]);
+
+  useEffect(() => {
+    const userId = localStorage.getItem('user_id');
+    if (!userId) return;
+    const start = new Date();
+    start.setDate(start.getDate() - 6);
+    start.setHours(0, 0, 0, 0);
+    fetchTimeSeries('student', { id: userId, start: start.toISOString(), resolution: 'day' })
+      .then((series) =>
+        setWeeklyData(
+          series.points.map((point) => ({
+            day: new Date(point.t).toLocaleDateString('ru-RU', { weekday: 'short' }),
+            score: point.accuracy,
+            tasks: point.attempts,
+          }))
+        )
+      )
+      .catch(() => setWeeklyData([]));
+  }, []);
 
   // Topic distribution
   const topicDistribution = [
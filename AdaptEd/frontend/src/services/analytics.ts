@@ -0,0 +1,38 @@
+import api from './api';
+
+export type TimeSeriesScope = 'student' | 'class' | 'school';
+export type TimeSeriesMetric = 'accuracy' | 'attempts' | 'correct' | 'points';
+
+export interface TimeSeriesPoint {
+  t: string; // начало корзины (ISO, локальное время сервера)
+  attempts: number;
+  correct: number;
+  accuracy: number; // %
+  points: number;
+}
+
+export interface TimeSeries {
+  scope: TimeSeriesScope;
+  id: string;
+  resolution: 'hour' | 'day' | 'week';
+  metric: TimeSeriesMetric;
+  start: string;
+  end: string;
+  buckets: number;
+  totals: Omit<TimeSeriesPoint, 't'>;
+  points: TimeSeriesPoint[];
+}
+
+export interface TimeSeriesQuery {
+  id?: string;
+  metric?: TimeSeriesMetric;
+  start?: string; // ISO
+  end?: string; // ISO
+  resolution?: 'auto' | 'hour' | 'day' | 'week';
+  points?: number; // максимум точек: ряд прореживается на сервере (LTTB)
+}
+
+export async function fetchTimeSeries(scope: TimeSeriesScope, query: TimeSeriesQuery = {}) {
+  const resp = await api.get<TimeSeries>(`/agents/timeseries/${scope}`, { params: query });
+  return resp.data;
+}
@@ -26,6 +26,21 @@ export interface HomeworkCreatePayload {
   created_by?: string;
 }
 
+export interface HomeworkBulkAssignPayload {
+  title: string;
+  description?: string;
+  subject?: string;
+  due_date?: string; // ISO string
+  student_ids?: string[];
+  class_id?: string;
+  created_by?: string;
+}
+
+export interface HomeworkBulkAssignResult {
+  created: number;
+  assignments: { user_id: string; homework_id: number }[];
+}
+
 export async function fetchHomeworks(userId?: string) {
   const resp = await api.get<Homework[]>('/homeworks', {
     params: userId ? { user_id: userId } : undefined,
@@ -43,3 +58,8 @@ export async function createHomework(payload: HomeworkCreatePayload) {
   return resp.data;
 }
 
+
+export async function bulkAssignHomework(payload: HomeworkBulkAssignPayload) {
+  const resp = await api.post<HomeworkBulkAssignResult>('/homeworks/bulk', payload);
+  return resp.data;
+}
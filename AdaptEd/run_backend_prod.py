@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the AdaptEd backend: several worker processes, no reload.
+
+Workers share sessions, profiles and storage through the SQLite state store
+(STATE_BACKEND=sqlite, see backend/utils/state_store.py).
+
+Usage:
+    python run_backend_prod.py --workers 4
+    python run_backend_prod.py --gunicorn --workers 4   # Linux/macOS, needs gunicorn
+"""
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run AdaptEd backend with multiple workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--gunicorn", action="store_true", help="run under gunicorn with uvicorn workers")
+    args = parser.parse_args()
+
+    # Workers must share state; an explicit STATE_BACKEND from the environment wins
+    os.environ.setdefault("STATE_BACKEND", "sqlite")
+    os.environ.setdefault("STATE_DB_PATH", os.path.join(BACKEND_DIR, "state.db"))
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    print(f"Starting AdaptEd Backend: {args.workers} worker(s) on http://{args.host}:{args.port}")
+    print(f"Shared state: {os.environ['STATE_BACKEND']} ({os.environ.get('STATE_DB_PATH')})")
+
+    if args.gunicorn:
+        os.execvp("gunicorn", [
+            "gunicorn", "app:app",
+            "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+            "--bind", f"{args.host}:{args.port}",
+            "--workers", str(args.workers),
+        ])
+
+    import uvicorn
+    uvicorn.run(
+        "app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=False,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()